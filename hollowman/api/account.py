@@ -1,23 +1,26 @@
 
-import json
+from hollowman import codec
 from flask import request, Blueprint, make_response
 
 from hollowman.decorators import auth_required
 from hollowman.auth.jwt import jwt_auth, jwt_generate_user_info
+from hollowman import request_handlers
+from hollowman.api.responses import json_response
+from hollowman.marathon.usage import namespace_usages
 
 account_blueprint = Blueprint(__name__, __name__)
 
 
 def _generate_repsonse(user_info, new_jwt_token):
     user_info["jwt_token"] = new_jwt_token
-    response_body = json.dumps(user_info)
+    response_body = codec.dumps(user_info)
     response = make_response(response_body, 200)
     return response
 
 @account_blueprint.route("/me", methods=["GET"])
 @auth_required()
 def me():
-    return json.dumps(jwt_generate_user_info(request.user, request.user.current_account))
+    return codec.dumps(jwt_generate_user_info(request.user, request.user.current_account))
 
 @account_blueprint.route("/change/<int:acc_id>", methods=["POST"])
 @auth_required()
@@ -30,7 +33,7 @@ def change_account(acc_id):
     except ValueError:
         pass
 
-    return make_response(json.dumps({"msg": "Not associated with account"}), 401)
+    return make_response(codec.dumps({"msg": "Not associated with account"}), 401)
 
 @account_blueprint.route("/next", methods=["POST"])
 @auth_required()
@@ -41,3 +44,18 @@ def next_account():
         return change_account(request.user.accounts[current_account_position + 1].id)
     return change_account(request.user.accounts[0].id)
 
+
+@account_blueprint.route("/suspend", methods=["POST"])
+@auth_required()
+def suspend():
+    return request_handlers.SuspendNamespace(request).handle()
+
+@account_blueprint.route("/resume", methods=["POST"])
+@auth_required()
+def resume():
+    return request_handlers.ResumeNamespace(request).handle()
+
+@account_blueprint.route("/usage", methods=["GET"])
+@auth_required()
+def usage():
+    return json_response(namespace_usages.get(request.user.current_account.namespace))
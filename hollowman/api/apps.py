@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from flask import request, Blueprint, current_app
+
+from hollowman.decorators import auth_required
+from hollowman import request_handlers, conf
+from hollowman.api.responses import json_response
+from hollowman.api.tasks import list_app_task_ids, list_tasks_files, read_task_file
+from hollowman.mesos.files import encoded_length
+from hollowman.marathon.index import namespace_indexes, LABEL, IMAGE, CONSTRAINT, ENV
+
+apps_blueprint = Blueprint(__name__, __name__)
+
+SEARCH_FIELDS = (LABEL, IMAGE, CONSTRAINT, ENV)
+
+
+@apps_blueprint.route("/scale", methods=["PUT"])
+@auth_required()
+def bulk_scale():
+    return request_handlers.BulkScale(request).handle()
+
+
+@apps_blueprint.route("/search", methods=["GET"])
+@auth_required()
+def search():
+    """
+    Busca as apps do namespace atual pelo índice. Ex:
+        ?label=traefik.frontend.rule=Host:app.com&image=nginx:1.13
+    Quando mais de um termo é passado, retorna apenas as apps que possuem todos eles.
+    """
+    terms = [(field, value) for field in SEARCH_FIELDS for value in request.args.getlist(field)]
+    if not terms:
+        return json_response({"msg": "At least one of {} is required".format(", ".join(SEARCH_FIELDS))}, HTTPStatus.BAD_REQUEST)
+
+    namespace = request.user.current_account.namespace
+    app_ids = namespace_indexes.get(namespace).search(terms)
+    return json_response({"apps": [app_id[len(namespace) + 1:] for app_id in app_ids]})
+
+
+def _parse_task_offsets(values):
+    """
+    ["<task-id>:<offset>", ...] -> {"<task-id>": <offset>}
+    """
+    offsets = {}
+    for value in values:
+        task_id, _, offset = value.rpartition(":")
+        offsets[task_id] = int(offset)
+    return offsets
+
+
+@apps_blueprint.route("/<path:app_id>/files/read", methods=["GET"])
+@auth_required()
+def app_files_read(app_id):
+    """
+    Lê o mesmo arquivo do sandbox de todas as tasks da app, em paralelo. Parâmetros:
+        path: arquivo a ser lido, default /stdout
+        length: quantos bytes ler de cada task, default 4096
+        offset: "<task-id>:<offset>", pode ser repetido. Tasks sem offset começam pelos últimos `length` bytes.
+
+    O campo "offsets" do response pode ser usado como `offset` do próximo request para continuar a leitura.
+    """
+    path = request.args.get("path", "/stdout")
+    try:
+        length = int(request.args.get("length", 4096))
+        offsets = _parse_task_offsets(request.args.getlist("offset"))
+    except ValueError:
+        return json_response({"msg": "length and offsets must be integers"}, HTTPStatus.BAD_REQUEST)
+
+    namespace = request.user.current_account.namespace
+    try:
+        task_ids = list_app_task_ids(namespace, app_id)
+    except ValueError as e:
+        return json_response({"msg": str(e)}, HTTPStatus.BAD_REQUEST)
+    if task_ids is None:
+        return json_response({"msg": "App not found"}, HTTPStatus.NOT_FOUND)
+
+    task_prefix = f"{namespace}_"
+    app = current_app._get_current_object()
+
+    def _read(task_id):
+        # O cache usado para resolver as tasks precisa do app context, que não existe nas threads do pool.
+        with app.app_context():
+            result = read_task_file(task_id, path, offsets.get(task_id[len(task_prefix):]), length)
+        return dict(result, task_id=task_id[len(task_prefix):])
+
+    results = []
+    if task_ids:
+        with ThreadPoolExecutor(max_workers=min(conf.ASGARD_APP_FILES_READ_WORKERS, len(task_ids))) as executor:
+            results = list(executor.map(_read, task_ids))
+
+    return json_response({
+        "path": path,
+        "tasks": results,
+        "offsets": ["{}:{}".format(result["task_id"], result["offset"] + encoded_length(result["data"]))
+                    for result in results if result["offset"] is not None],
+    })
+
+
+@apps_blueprint.route("/<path:app_id>/files", methods=["GET"])
+@auth_required()
+def app_files_list(app_id):
+    """
+    Arquivos dos sandboxes de todas as tasks da app, em um único request.
+    """
+    namespace = request.user.current_account.namespace
+    try:
+        task_ids = list_app_task_ids(namespace, app_id)
+    except ValueError as e:
+        return json_response({"msg": str(e)}, HTTPStatus.BAD_REQUEST)
+    if task_ids is None:
+        return json_response({"msg": "App not found"}, HTTPStatus.NOT_FOUND)
+    return json_response({"tasks": list_tasks_files(task_ids, namespace)})
@@ -0,0 +1,9 @@
+from http import HTTPStatus
+
+from flask import Response
+
+from hollowman import codec
+
+
+def json_response(data, status=HTTPStatus.OK) -> Response:
+    return Response(response=codec.dumps(data), status=status, mimetype="application/json")
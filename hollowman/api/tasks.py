@@ -1,113 +1,561 @@
 
-import json
-import requests
+import re
+import sre_parse
+import threading
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from hollowman import codec
 from http import HTTPStatus
+from sre_constants import BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN
 from uuid import uuid4
 
-from flask import Blueprint, Response, redirect, request, url_for
+from flask import Blueprint, Response, redirect, request, url_for, current_app, stream_with_context
+from marathon.exceptions import NotFoundError
+
 from hollowman.decorators import auth_required
-from hollowman.conf import MESOS_ADDRESSES
-from hollowman import cache
+from hollowman.api.responses import json_response
+from hollowman.log import logger
+from hollowman import cache, conf
+from hollowman.mesos.client import mesos_client
+from hollowman.mesos.files import FileTail, encoded_length, read_file, download_file, grep_chunks
+from hollowman.mesos.sandbox import sandbox_resolver
+
+try:
+    import re2
+except ImportError:  # pragma: no cover
+    re2 = None
 
 tasks_blueprint = Blueprint(__name__, __name__)
 
+_tails_lock = threading.Lock()
+_tails_per_account = Counter()
+
+
+def _task_data_cache_key(task_id):
+    return f"tasks/{task_id}/data"
+
+
+def invalidate_task_data(task_id):
+    cache.delete(_task_data_cache_key(task_id))
+
 
 def get_task_data(task_id):
+    """
+    Descobre em qual agent a task está rodando (como "hostname:porta") e qual é o sandbox dela.
+    O resultado fica no cache por ASGARD_TASK_DATA_CACHE_TIMEOUT segundos, já que não muda durante a
+    vida da task. Quando o agent responde 404, a entrada é removida (ver `invalidate_task_data()`).
+    """
+    task_data = cache.get(_task_data_cache_key(task_id))
+    if task_data:
+        return (task_data['agent_address'], task_data['sandbox_directory'])
+
+    task_data = _resolve_task_data(task_id)
+    if not task_data:
+        return None, None
+
+    cache.set(_task_data_cache_key(task_id), task_data, timeout=conf.ASGARD_TASK_DATA_CACHE_TIMEOUT)
+    return (task_data['agent_address'], task_data['sandbox_directory'])
 
-    task_id_with_namespace = task_id
-    task_info = requests.get(f"{MESOS_ADDRESSES[0]}/tasks?task_id={task_id_with_namespace}").json()['tasks']
 
+def _resolve_task_data(task_id):
+    task_info = mesos_client.get("/tasks", params={"task_id": task_id}).json()['tasks']
     if not task_info:
-        return None, None
+        return None
+
     task_info = task_info[0]
+    agent, sandbox_directory = sandbox_resolver.resolve(task_info)
+    if not agent or not sandbox_directory:
+        return None
+
+    return {
+        'agent_address': agent.address,
+        'framework_id': task_info['framework_id'],
+        'sandbox_directory': sandbox_directory,
+    }
+
+
+def list_app_task_ids(namespace, app_id):
+    """
+    Ids (com namespace) das tasks de uma app do namespace. Retorna None se a app não existe.
 
-    framework_id = task_info['framework_id']
-    slave_id = task_info['slave_id']
+    Assim como nos outros endpoints de tasks, só são retornadas tasks com o prefixo do namespace.
+    Lança ValueError se o app_id tem segmentos vazios, "." ou "..", que poderiam sair do namespace.
+    """
+    segments = app_id.strip("/").split("/")
+    if any(segment in ("", ".", "..") for segment in segments):
+        raise ValueError("Invalid app id")
+    try:
+        tasks = conf.marathon_client.list_tasks(app_id=f"/{namespace}/{'/'.join(segments)}")
+    except NotFoundError:
+        return None
+    task_prefix = f"{namespace}_"
+    return sorted(task.id for task in tasks if task.id.startswith(task_prefix))
 
-    slave_info = requests.get(f"{MESOS_ADDRESSES[0]}/slaves?slave_id={slave_id}").json()['slaves'][0]
-    slave_ip = slave_info['hostname']
 
-    slave_state = requests.get(f"http://{slave_ip}:5051/state").json()
-    framework_info = [fwk for fwk in slave_state['frameworks'] if fwk['id'] == framework_id][0]
-    execuor_info = [executor for executor in framework_info['executors'] if executor['id'] == task_id_with_namespace]
-    if not execuor_info:
-        execuor_info = [executor for executor in framework_info['completed_executors'] if executor['id'] == task_id_with_namespace]
+def read_task_file(task_id, path, offset, length):
+    """
+    Lê um pedaço de um arquivo do sandbox de uma task (id com namespace). Com offset None lemos os
+    últimos `length` bytes do arquivo.
 
-    if execuor_info:
-        execuor_info = execuor_info[0]
-    sandbox_directory = execuor_info['directory']
-    return (slave_ip, sandbox_directory)
+    Feita para ser chamada para várias tasks ao mesmo tempo, por isso nunca lança exception: task que
+    não existe mais, agent que não responde, etc, vêm no campo "error" e as outras tasks não são afetadas.
+    """
+    result = {"offset": offset, "data": "", "error": None}
+    try:
+        agent_address, sandbox_directory = get_task_data(task_id)
+        if not agent_address:
+            result["error"] = "Task not found"
+            return result
+
+        if offset is None:
+            files_info = read_file(agent_address, sandbox_directory, path, -1, 0)
+            if files_info.status_code != HTTPStatus.NOT_FOUND:
+                offset = result["offset"] = max(0, files_info.json()["offset"] - length)
+                files_info = read_file(agent_address, sandbox_directory, path, offset, length)
+        else:
+            files_info = read_file(agent_address, sandbox_directory, path, offset, length)
+
+        if files_info.status_code == HTTPStatus.NOT_FOUND:
+            invalidate_task_data(task_id)
+            result["error"] = "File not found"
+            return result
+        result.update(files_info.json())
+    except Exception as e:
+        logger.error({"action": "read-task-file", "state": "error", "task_id": task_id, "path": path, "error": str(e)})
+        result["error"] = str(e)
+    return result
+
+
+def browse_task_files(task_id, agent_address, sandbox_directory):
+    """
+    Arquivos do sandbox da task (id com namespace), com os paths relativos ao sandbox.
+    Retorna None se o agent não conhece mais o sandbox.
+    """
+    files_info = mesos_client.get_agent(agent_address, f"/files/browse?path={sandbox_directory}")
+    if files_info.status_code == HTTPStatus.NOT_FOUND:
+        invalidate_task_data(task_id)
+        return None
+    files_info = files_info.json()
+    for file_data in files_info:
+        file_data['path'] = file_data['path'].replace(sandbox_directory, "", 1)
+    return files_info
+
+
+def list_tasks_files(task_ids, namespace):
+    """
+    Lista os arquivos dos sandboxes de várias tasks (ids com namespace).
+
+    As tasks são resolvidas em paralelo e depois agrupadas por agent: cada agent é acessado por uma única
+    thread, que lista os sandboxes das suas tasks em sequência reaproveitando a mesma conexão, enquanto
+    agents diferentes são acessados em paralelo. Problemas com uma task vêm no campo "error" dela.
+    Tasks que não são do namespace são ignoradas.
+    """
+    task_prefix = f"{namespace}_"
+    task_ids = [task_id for task_id in task_ids if task_id.startswith(task_prefix)]
+    results = {task_id: {"task_id": task_id[len(task_prefix):], "files": [], "error": None} for task_id in task_ids}
+    if not task_ids:
+        return []
+
+    app = current_app._get_current_object()
+
+    def _resolve(task_id):
+        # O cache usado para resolver as tasks precisa do app context, que não existe nas threads do pool.
+        with app.app_context():
+            try:
+                return task_id, get_task_data(task_id)
+            except Exception as e:
+                results[task_id]["error"] = str(e)
+                return task_id, (None, None)
+
+    def _browse_agent(agent_address, agent_tasks):
+        with app.app_context():
+            for task_id, sandbox_directory in agent_tasks:
+                try:
+                    files = browse_task_files(task_id, agent_address, sandbox_directory)
+                except Exception as e:
+                    results[task_id]["error"] = str(e)
+                    continue
+                if files is None:
+                    results[task_id]["error"] = "Sandbox not found"
+                else:
+                    results[task_id]["files"] = files
+
+    with ThreadPoolExecutor(max_workers=min(conf.ASGARD_TASKS_FILES_WORKERS, len(task_ids))) as executor:
+        tasks_by_agent = defaultdict(list)
+        for task_id, (agent_address, sandbox_directory) in executor.map(_resolve, task_ids):
+            if agent_address:
+                tasks_by_agent[agent_address].append((task_id, sandbox_directory))
+            elif not results[task_id]["error"]:
+                results[task_id]["error"] = "Task not found"
+        list(executor.map(_browse_agent, tasks_by_agent.keys(), tasks_by_agent.values()))
+
+    return [results[task_id] for task_id in task_ids]
+
+
+@tasks_blueprint.route("/files")
+@auth_required(pass_user=True)
+def tasks_files_list(user):
+    """
+    Versão em lote do /tasks/<task-id>/files: ?task_id=<id>&task_id=<id>...
+    """
+    task_ids = request.args.getlist("task_id")
+    if not task_ids:
+        return Response(response=codec.dumps({"msg": "At least one task_id is required"}), status=HTTPStatus.BAD_REQUEST)
+    namespace = user.current_account.namespace
+    tasks = list_tasks_files([f"{namespace}_{task_id}" for task_id in task_ids], namespace)
+    return Response(response=codec.dumps({"tasks": tasks}), status=200, mimetype="application/json")
 
 
 @tasks_blueprint.route("/<string:task_id>/files")
 @auth_required(pass_user=True)
 def task_files_list(task_id, user):
     namespace = user.current_account.namespace
-    slave_ip, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
-    if not slave_ip:
-        return Response(response=json.dumps({}), status=404)
-    files_info = requests.get(f"http://{slave_ip}:5051/files/browse?path={sandbox_directory}").json()
-    for file_data in files_info:
-        file_data['path'] = file_data['path'].replace(sandbox_directory, "", 1)
+    agent_address, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
+    if not agent_address:
+        return Response(response=codec.dumps({}), status=404)
+    files_info = browse_task_files(f"{namespace}_{task_id}", agent_address, sandbox_directory)
+    if files_info is None:
+        return Response(response=codec.dumps({}), status=404)
 
-    return Response(response=json.dumps(files_info), status=200, mimetype="application/json")
+    return Response(response=codec.dumps(files_info), status=200, mimetype="application/json")
 
 @tasks_blueprint.route("/<string:task_id>/files/read")
 @auth_required(pass_user=True)
 def task_files_read(task_id, user):
     namespace = user.current_account.namespace
-    slave_ip, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
-    if not slave_ip:
-        return Response(response=json.dumps({}), status=404)
+    agent_address, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
+    if not agent_address:
+        return Response(response=codec.dumps({}), status=404)
 
     offset = request.args.get("offset", 0)
     length = request.args.get("length", 1024)
     path = request.args.get("path", "")
-    files_info = requests.get(f"http://{slave_ip}:5051/files/read?path={sandbox_directory}{path}&offset={offset}&length={length}")
+    files_info = read_file(agent_address, sandbox_directory, path, offset, length)
 
     if files_info.status_code == HTTPStatus.NOT_FOUND:
-        return Response(response=json.dumps({}), status=404)
+        invalidate_task_data(f"{namespace}_{task_id}")
+        return Response(response=codec.dumps({}), status=404)
     file_info_data = files_info.json()
 
-    return Response(response=json.dumps(file_info_data), status=200, mimetype="application/json")
+    return Response(response=codec.dumps(file_info_data), status=200, mimetype="application/json")
+
+def _acquire_tail_slot(account_id) -> bool:
+    with _tails_lock:
+        if _tails_per_account[account_id] >= conf.ASGARD_TASK_TAIL_MAX_PER_ACCOUNT:
+            return False
+        _tails_per_account[account_id] += 1
+        return True
+
+
+def _release_tail_slot(account_id):
+    with _tails_lock:
+        _tails_per_account[account_id] -= 1
+        if _tails_per_account[account_id] <= 0:
+            del _tails_per_account[account_id]
+
+
+def _sse_event(event, data, event_id=None):
+    event_id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{event_id_line}event: {event}\ndata: {codec.dumps(data)}\n\n"
+
+
+def _tail_events(file_tail: FileTail, on_gone):
+    """
+    Converte o FileTail em eventos SSE. O id de cada evento é o offset do final do pedaço enviado,
+    assim o cliente pode continuar de onde parou mandando o header `Last-Event-ID`.
+    """
+    for chunk in file_tail:
+        if chunk is None:
+            # Comentário SSE: mantém a conexão viva e é como descobrimos que o cliente foi embora.
+            yield ": keepalive\n\n"
+            continue
+        yield _sse_event("data", chunk, event_id=chunk['offset'] + encoded_length(chunk['data']))
+    if file_tail.gone:
+        on_gone()
+    yield _sse_event("end", {"offset": file_tail.offset, "error": file_tail.error})
+
+
+@tasks_blueprint.route("/<string:task_id>/files/tail")
+@auth_required(pass_user=True)
+def task_files_tail(task_id, user):
+    """
+    Envia (via Server-Sent Events) os dados novos de um arquivo do sandbox da task conforme eles
+    são escritos. A task é resolvida uma única vez, no início do stream.
+
+    Parâmetros: path (default /stdout), offset (default: final do arquivo) e backlog (quantos bytes antes
+    do final do arquivo enviar quando não há offset, default 0). O header `Last-Event-ID` tem precedência
+    sobre o offset.
+    """
+    namespace = user.current_account.namespace
+    account_id = user.current_account.id
+    namespaced_task_id = f"{namespace}_{task_id}"
+    agent_address, sandbox_directory = get_task_data(namespaced_task_id)
+    if not agent_address:
+        return Response(response=codec.dumps({}), status=404)
+
+    path = request.args.get("path", "/stdout")
+    offset = request.headers.get("Last-Event-ID", request.args.get("offset", -1))
+    try:
+        offset = int(offset)
+        backlog = int(request.args.get("backlog", 0))
+    except ValueError:
+        return Response(response=codec.dumps({"msg": "offset and backlog must be integers"}), status=HTTPStatus.BAD_REQUEST)
+
+    if not _acquire_tail_slot(account_id):
+        return Response(response=codec.dumps({"msg": "Too many concurrent tails for this account"}),
+                        status=HTTPStatus.TOO_MANY_REQUESTS)
+
+    logger.info({"action": "task-file-tail", "state": "started", "task_id": namespaced_task_id, "path": path, "offset": offset})
+    file_tail = FileTail(agent_address, sandbox_directory, path, offset=offset, backlog=backlog,
+                         chunk_size=conf.ASGARD_TASK_TAIL_CHUNK_SIZE,
+                         min_interval=conf.ASGARD_TASK_TAIL_MIN_INTERVAL,
+                         max_interval=conf.ASGARD_TASK_TAIL_MAX_INTERVAL)
+    # O stream continua depois que a view retorna; o request context é mantido para o
+    # `invalidate_task_data()` (o cache precisa do app context).
+    events = stream_with_context(_tail_events(file_tail, lambda: invalidate_task_data(namespaced_task_id)))
+    response = Response(response=events,
+                        status=HTTPStatus.OK,
+                        mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: _release_tail_slot(account_id))
+    return response
+
+def _subpatterns(value):
+    if isinstance(value, sre_parse.SubPattern):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _subpatterns(item)
+
+
+def _first_chars(items, ignore_case):
+    """
+    Conjunto dos caracteres com que `items` (uma alternativa de um `|`) pode começar, ou None quando não
+    dá pra saber (ex: \\w, ".", alternativa vazia), que é tratado como "qualquer caractere".
+    """
+    if not items:
+        return None
+    op, av = items[0]
+    if op is LITERAL:
+        return {chr(av).lower() if ignore_case else chr(av)}
+    if op is SUBPATTERN:
+        return _first_chars(av[-1], ignore_case)
+    return None
+
+
+def _has_overlapping_branches(branches, ignore_case) -> bool:
+    seen = set()
+    for branch in branches:
+        first_chars = _first_chars(branch, ignore_case)
+        if first_chars is None or seen & first_chars:
+            return True
+        seen |= first_chars
+    return False
+
+
+def _is_unsafe_regex(parsed, ignore_case, inside_repeat=False) -> bool:
+    """
+    Procura as construções que causam backtracking exponencial (e o `re` não tem timeout), dentro de uma
+    repetição (*, +, {n,m}):
+        - outra repetição, com ou sem limite, ex: (a+)+, (\\w+\\s?)* ou (.*,){12}
+        - alternativas que podem começar com o mesmo caractere, ex: (a|a)* ou (a|aa)+
+    """
+    for op, av in parsed:
+        if op in (MAX_REPEAT, MIN_REPEAT):
+            _min, _max, subpattern = av
+            repeats = _max > 1
+            if repeats and inside_repeat:
+                return True
+            if _is_unsafe_regex(subpattern, ignore_case, inside_repeat or repeats):
+                return True
+        elif op is BRANCH and inside_repeat and _has_overlapping_branches(av[1], ignore_case):
+            return True
+        elif any(_is_unsafe_regex(sub, ignore_case, inside_repeat) for sub in _subpatterns(av)):
+            return True
+    return False
+
+
+def _build_line_matcher(pattern, use_regex, ignore_case):
+    """
+    Lança ValueError para padrões que não podem ser usados.
+
+    Regex só é aceita com o `google-re2` instalado: o re2 garante tempo linear no tamanho da linha, o que o
+    `re` da stdlib não garante e nem permite interromper. Mesmo assim recusamos os padrões que seriam
+    exponenciais no `re`, para que o resultado de uma busca não dependa de qual engine está instalada.
+    """
+    if len(pattern) > conf.ASGARD_TASK_GREP_MAX_PATTERN_LENGTH:
+        raise ValueError(f"pattern must have at most {conf.ASGARD_TASK_GREP_MAX_PATTERN_LENGTH} characters")
+    if use_regex:
+        if re2 is None:
+            raise ValueError("regex search is not available, search without regex=1")
+        try:
+            if _is_unsafe_regex(sre_parse.parse(pattern), ignore_case):
+                raise ValueError("pattern has nested repetitions or overlapping alternatives inside a repetition "
+                                 "(ex: (a+)+ or (a|aa)+), which can take too long to match")
+            return re2.compile(f"(?i){pattern}" if ignore_case else pattern).search
+        except (re.error, re2.error) as e:
+            raise ValueError(f"invalid pattern: {e}")
+    if ignore_case:
+        pattern = pattern.lower()
+        return lambda line: pattern in line.lower()
+    return lambda line: pattern in line
+
+
+@tasks_blueprint.route("/<string:task_id>/files/grep")
+@auth_required(pass_user=True)
+def task_files_grep(task_id, user):
+    """
+    Procura linhas em um arquivo do sandbox da task sem que o arquivo saia do servidor. Parâmetros:
+        pattern: texto (ou regex, com regex=1) a ser procurado, com no máximo ASGARD_TASK_GREP_MAX_PATTERN_LENGTH
+            caracteres. Obrigatório. Regex precisa do `google-re2` instalado; regex com repetições aninhadas,
+            ex: (a+)+, ou com alternativas que se sobrepõem dentro de uma repetição, ex: (a|aa)+, são recusadas
+        path: default /stdout
+        ignore_case: 1 para ignorar maiúsculas/minúsculas
+        context: quantas linhas antes e depois de cada match retornar, default 0
+        offset: de onde começar a leitura (ex: o next_offset de uma busca que foi interrompida), default 0
+        max_matches: default ASGARD_TASK_GREP_MAX_MATCHES (que também é o limite máximo)
+
+    A leitura do arquivo termina quando passa de ASGARD_TASK_GREP_MAX_BYTES bytes ou de
+    ASGARD_TASK_GREP_MAX_SECONDS segundos.
+    """
+    pattern = request.args.get("pattern")
+    if not pattern:
+        return Response(response=codec.dumps({"msg": "pattern is required"}), status=HTTPStatus.BAD_REQUEST)
+    try:
+        context = min(int(request.args.get("context", 0)), conf.ASGARD_TASK_GREP_MAX_CONTEXT)
+        offset = int(request.args.get("offset", 0))
+        max_matches = min(int(request.args.get("max_matches", conf.ASGARD_TASK_GREP_MAX_MATCHES)),
+                          conf.ASGARD_TASK_GREP_MAX_MATCHES)
+        matches = _build_line_matcher(pattern, request.args.get("regex") == "1", request.args.get("ignore_case") == "1")
+    except ValueError as e:
+        return Response(response=codec.dumps({"msg": str(e)}), status=HTTPStatus.BAD_REQUEST)
+
+    namespace = user.current_account.namespace
+    agent_address, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
+    if not agent_address:
+        return Response(response=codec.dumps({}), status=404)
+
+    path = request.args.get("path", "/stdout")
+    chunks = download_file(agent_address, sandbox_directory, path, offset=offset,
+                           chunk_size=conf.ASGARD_TASK_DOWNLOAD_CHUNK_SIZE)
+    try:
+        result = grep_chunks(chunks, matches, context=max(context, 0), offset=offset,
+                             max_bytes=conf.ASGARD_TASK_GREP_MAX_BYTES,
+                             max_seconds=conf.ASGARD_TASK_GREP_MAX_SECONDS,
+                             max_matches=max_matches)
+    except FileNotFoundError:
+        invalidate_task_data(f"{namespace}_{task_id}")
+        return Response(response=codec.dumps({}), status=404)
+    finally:
+        chunks.close()
+
+    return Response(response=codec.dumps(dict(result, path=path)), status=200, mimetype="application/json")
 
 @tasks_blueprint.route("/<string:task_id>/files/download")
 @auth_required(pass_user=True)
 def task_files_download(task_id, user):
     namespace = user.current_account.namespace
-    slave_ip, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
-    if not slave_ip:
-        return Response(response=json.dumps({}), status=404)
+    agent_address, sandbox_directory = get_task_data(f"{namespace}_{task_id}")
+    if not agent_address:
+        return Response(response=codec.dumps({}), status=404)
 
     offset = request.args.get("offset", 0)
     length = request.args.get("length", 1024)
     path = request.args.get("path", "")
-    file_final_url = f"http://{slave_ip}:5051/files/download?path={sandbox_directory}{path}"
+    file_final_url = f"http://{agent_address}/files/download?path={sandbox_directory}{path}"
     download_id = uuid4().hex
     cache.set(f"downloads/{download_id}", {
         'file_url': file_final_url,
         'task_id': task_id,
         'file_path': path
-    }, timeout=30) 
+    }, timeout=conf.ASGARD_TASK_DOWNLOAD_ID_TIMEOUT)
     download_id_url = url_for('hollowman.api.tasks.download_by_id', download_id=download_id) 
-    return Response(response=json.dumps({'download_url': download_id_url.strip("/")}), status=HTTPStatus.OK)
+    return Response(response=codec.dumps({'download_url': download_id_url.strip("/")}), status=HTTPStatus.OK)
+
+def _download_error(response):
+    """
+    Resposta para um download que o agent não serviu: 404 e 416 (Range inválido, com o Content-Range
+    do agent) são repassados; qualquer outro status vira 502.
+    """
+    if response.status_code == HTTPStatus.NOT_FOUND:
+        return json_response({}, status=HTTPStatus.NOT_FOUND)
+    if response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+        error_response = json_response({"msg": "Requested range not satisfiable"},
+                                       status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        if "Content-Range" in response.headers:
+            error_response.headers["Content-Range"] = response.headers["Content-Range"]
+        return error_response
+    logger.error({"action": "task-file-download", "state": "error", "url": response.url, "status": response.status_code})
+    return json_response({"msg": f"Agent returned status {response.status_code}"}, status=HTTPStatus.BAD_GATEWAY)
+
+
+def _closing_chunks(response):
+    """
+    Devolve a conexão com o agent mesmo quando o cliente desiste do download no meio.
+    """
+    try:
+        yield from response.iter_content(chunk_size=conf.ASGARD_TASK_DOWNLOAD_CHUNK_SIZE)
+    finally:
+        response.close()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
 
 @tasks_blueprint.route("/downloads/<string:download_id>")
 def download_by_id(download_id):
+    """
+    Faz o download do arquivo direto do agent, em pedaços de ASGARD_TASK_DOWNLOAD_CHUNK_SIZE bytes.
+
+    O header `Range` é repassado para o agent, assim um download interrompido pode continuar de onde
+    parou (enquanto o download_id for válido). Se ASGARD_TASK_DOWNLOAD_GZIP_ENABLED estiver ligado e o
+    cliente aceitar gzip, downloads completos (sem Range) são comprimidos durante o envio.
+    """
     file_data = cache.get(f"downloads/{download_id}")
     if not file_data:
         return Response(status=HTTPStatus.NOT_FOUND)
 
+    # Cada uso renova o download_id, para que um download interrompido possa ser retomado.
+    cache.set(f"downloads/{download_id}", file_data, timeout=conf.ASGARD_TASK_DOWNLOAD_ID_TIMEOUT)
+
     file_url = file_data['file_url']
     task_id = file_data['task_id']
     file_path = file_data['file_path']
 
-    response = requests.get(file_url, stream=True)
+    # Pedimos o arquivo sem compressão para que o Content-Length/Content-Range do agent continuem valendo.
+    upstream_headers = {"Accept-Encoding": "identity"}
+    if request.headers.get("Range"):
+        upstream_headers["Range"] = request.headers["Range"]
+    response = mesos_client.session.get(file_url, stream=True, headers=upstream_headers, timeout=conf.ASGARD_MESOS_REQUEST_TIMEOUT)
 
-    if response.status_code == HTTPStatus.NOT_FOUND:
-        return Response(response=json.dumps({}), status=HTTPStatus.NOT_FOUND)
+    if response.status_code not in (HTTPStatus.OK, HTTPStatus.PARTIAL_CONTENT):
+        response.close()
+        return _download_error(response)
 
     filename = f"{task_id}_{file_path.strip('/')}.log"
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Content-Type": "application/octet-stream",
+    }
+    chunks = _closing_chunks(response)
+
+    use_gzip = conf.ASGARD_TASK_DOWNLOAD_GZIP_ENABLED and response.status_code == HTTPStatus.OK \
+        and "gzip" in request.headers.get("Accept-Encoding", "")
+    if use_gzip:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    else:
+        for header_name in ("Content-Length", "Content-Range", "Accept-Ranges"):
+            if header_name in response.headers:
+                headers[header_name] = response.headers[header_name]
 
-    return Response(response=response.iter_content(chunk_size=4096), status=200, headers={"Content-Disposition":  f"attachment; filename={filename}",
-                                                                                            "Content-Type": "application/octet-stream"})
+    return Response(response=chunks, status=response.status_code, headers=headers)
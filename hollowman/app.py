@@ -1,7 +1,7 @@
 #encoding: utf-8
 
 from datetime import timedelta
-import json
+from hollowman import codec
 import traceback
 import sys
 import os
@@ -13,15 +13,19 @@ from flask_cors import CORS
 import pkg_resources
 
 from hollowman.hollowman_flask import HollowmanFlask
-from hollowman.conf import SECRET_KEY, CORS_WHITELIST, NEW_RELIC_LICENSE_KEY, NEW_RELIC_APP_NAME
+from hollowman.conf import SECRET_KEY, CORS_WHITELIST, NEW_RELIC_LICENSE_KEY, NEW_RELIC_APP_NAME, \
+    ASGARD_MESOS_AGENTS_INDEX_REFRESH_INTERVAL, ASGARD_METRICS_ZK_COLLECT_INTERVAL
 from hollowman.log import logger, dev_null_logger
 from hollowman.plugins import register_plugin
 from hollowman.auth.jwt import jwt_auth
 from hollowman.metrics.zk.routes import zk_metrics_blueprint
 from hollowman.api.account import account_blueprint
 from hollowman.api.tasks import tasks_blueprint
+from hollowman.api.apps import apps_blueprint
 from hollowman.plugins import load_all_metrics_plugins
 from hollowman import cache
+from hollowman.mesos.agents import agents_index
+from hollowman.metrics.zk.collector import zk_metrics_collector
 
 if NEW_RELIC_LICENSE_KEY and NEW_RELIC_APP_NAME:
     newrelic.agent.initialize()
@@ -39,11 +43,18 @@ application.config["JWT_EXPIRATION_DELTA"] = timedelta(days=7)
 application.register_blueprint(zk_metrics_blueprint, url_prefix="/_cat/metrics/zk")
 application.register_blueprint(account_blueprint, url_prefix="/hollow/account")
 application.register_blueprint(tasks_blueprint, url_prefix="/tasks")
+application.register_blueprint(apps_blueprint, url_prefix="/hollow/apps")
 
 CORS(application, origins=CORS_WHITELIST)
 jwt_auth.init_app(application)
 cache.init_app(application)
 
+if ASGARD_MESOS_AGENTS_INDEX_REFRESH_INTERVAL:
+    agents_index.start_background_refresh(ASGARD_MESOS_AGENTS_INDEX_REFRESH_INTERVAL)
+
+if ASGARD_METRICS_ZK_COLLECT_INTERVAL:
+    zk_metrics_collector.start_background_collection(ASGARD_METRICS_ZK_COLLECT_INTERVAL)
+
 def _get_current_exception_if_exists(current_request):
     try:
         return current_request.current_exception
@@ -77,7 +88,7 @@ def handler_500(error):
     request.current_exception = current_exception
 
     return Response(
-        response=json.dumps(current_exception),
+        response=codec.dumps(current_exception),
         status=500
     )
 
@@ -1,7 +1,7 @@
 #encoding: utf-8
 
 from datetime import datetime
-import json
+from hollowman import codec
 
 from flask import make_response, current_app
 from flask_jwt import JWT, jwt_required, current_identity
@@ -10,8 +10,7 @@ jwt_auth = JWT()
 
 @jwt_auth.jwt_error_handler
 def jwt_error(e):
-    import json
-    return make_response(json.dumps({"msg": str(e)}), 401)
+    return make_response(codec.dumps({"msg": str(e)}), 401)
 
 @jwt_auth.jwt_payload_handler
 def jwt_payload_handler(user_info):
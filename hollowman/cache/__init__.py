@@ -31,6 +31,14 @@ def set(key, value, *args, **kwargs):
 
     return False
 
+def delete(key):
+    try:
+        return __cache_backend.delete(key)
+    except redis.exceptions.ConnectionError as e:
+        logger.error({"action": "cache-delete", "state": "error", "key": key, "cache-backend": __cache_backend.config.get("CACHE_REDIS_URL")})
+
+    return False
+
 
 def init_app(application):
     __cache_backend.init_app(application)
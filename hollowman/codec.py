@@ -0,0 +1,56 @@
+"""
+Ponto único de encode/decode de JSON da Asgard API.
+
+Se o `orjson` estiver instalado (e ASGARD_FAST_JSON_ENABLED estiver ligado) ele é usado como backend,
+caso contrário usamos o `json` da stdlib. Os encoders do marathon-python (MarathonJsonEncoder e
+MarathonMinimalJsonEncoder) continuam funcionando nos dois casos: no orjson o `default()` do encoder
+é chamado para todo objeto que o orjson não sabe serializar, exatamente como acontece na stdlib.
+
+Os dois backends geram o mesmo JSON: compacto (sem espaços depois de "," e ":") e com os caracteres
+não-ASCII em UTF-8 (sem escapes \\uXXXX), que é o único formato que o orjson gera. Assim o body dos
+responses não depende de o orjson estar instalado ou não. O orjson só pode ser instalado em Python 3.8+.
+"""
+import json
+
+from hollowman import conf
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+SEPARATORS = (",", ":")
+
+
+def _use_orjson() -> bool:
+    return orjson is not None and conf.ASGARD_FAST_JSON_ENABLED
+
+
+def _orjson_options(sort_keys):
+    # Datas passam pelo default() do encoder, que gera o formato que o Marathon usa.
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        options |= orjson.OPT_SORT_KEYS
+    return options
+
+
+def dumps(obj, cls=None, default=None, sort_keys=False) -> str:
+    """
+    Equivalente ao `json.dumps(obj, cls=cls, default=default, sort_keys=sort_keys)`.
+    """
+    if not _use_orjson():
+        return json.dumps(obj, cls=cls, default=default, sort_keys=sort_keys, separators=SEPARATORS, ensure_ascii=False)
+
+    if cls is not None:
+        default = cls().default
+    return orjson.dumps(obj, default=default, option=_orjson_options(sort_keys)).decode("utf-8")
+
+
+def loads(data):
+    """
+    Equivalente ao `json.loads(data)`. Aceita str ou bytes.
+    Erros de parse são sempre `ValueError` (json.JSONDecodeError).
+    """
+    if not _use_orjson():
+        return json.loads(data)
+    return orjson.loads(data)
@@ -1,9 +1,10 @@
 import os
 import base64
 
-from marathon import MarathonClient
 from asgard.sdk.options import get_option
 
+from hollowman.marathon.client import AsgardMarathonClient
+
 ENABLED = "1"
 DISABLED = "0"
 
@@ -37,8 +38,43 @@ MARATHON_LEADER = MARATHON_ADDRESSES[0]
 
 MESOS_ADDRESSES = _build_mesos_addresses()
 
+ASGARD_UPSTREAM_SINGLEFLIGHT_ENABLED = os.getenv("ASGARD_UPSTREAM_SINGLEFLIGHT_ENABLED", ENABLED) == ENABLED
+ASGARD_ORIGINAL_APPS_FETCH_WORKERS = int(os.getenv("ASGARD_ORIGINAL_APPS_FETCH_WORKERS", 8))
+ASGARD_WRITE_DIFF_ENABLED = os.getenv("ASGARD_WRITE_DIFF_ENABLED", DISABLED) == ENABLED
+ASGARD_BULK_SCALE_BATCH_SIZE = int(os.getenv("ASGARD_BULK_SCALE_BATCH_SIZE", 100))
+ASGARD_BULK_SCALE_WORKERS = int(os.getenv("ASGARD_BULK_SCALE_WORKERS", 4))
+ASGARD_APPS_INDEX_TTL = int(os.getenv("ASGARD_APPS_INDEX_TTL", 30))
+ASGARD_APPS_PAGE_MAX_LIMIT = int(os.getenv("ASGARD_APPS_PAGE_MAX_LIMIT", 1000))
+ASGARD_STREAMING_RESPONSE_ENABLED = os.getenv("ASGARD_STREAMING_RESPONSE_ENABLED", ENABLED) == ENABLED
+ASGARD_STREAMING_RESPONSE_CHUNK_SIZE = int(os.getenv("ASGARD_STREAMING_RESPONSE_CHUNK_SIZE", 64 * 1024))
+ASGARD_FAST_JSON_ENABLED = os.getenv("ASGARD_FAST_JSON_ENABLED", ENABLED) == ENABLED
+ASGARD_TASK_DATA_CACHE_TIMEOUT = int(os.getenv("ASGARD_TASK_DATA_CACHE_TIMEOUT", 300))
+ASGARD_MESOS_AGENTS_INDEX_TTL = int(os.getenv("ASGARD_MESOS_AGENTS_INDEX_TTL", 60))
+ASGARD_MESOS_AGENTS_INDEX_REFRESH_INTERVAL = int(os.getenv("ASGARD_MESOS_AGENTS_INDEX_REFRESH_INTERVAL", 0))
+ASGARD_MESOS_AGENT_STATE_CACHE_TTL = int(os.getenv("ASGARD_MESOS_AGENT_STATE_CACHE_TTL", 5))
+ASGARD_MESOS_REQUEST_TIMEOUT = float(os.getenv("ASGARD_MESOS_REQUEST_TIMEOUT", 10))
+ASGARD_TASK_TAIL_MAX_PER_ACCOUNT = int(os.getenv("ASGARD_TASK_TAIL_MAX_PER_ACCOUNT", 10))
+ASGARD_TASK_TAIL_CHUNK_SIZE = int(os.getenv("ASGARD_TASK_TAIL_CHUNK_SIZE", 64 * 1024))
+ASGARD_TASK_TAIL_MIN_INTERVAL = float(os.getenv("ASGARD_TASK_TAIL_MIN_INTERVAL", 0.5))
+ASGARD_TASK_TAIL_MAX_INTERVAL = float(os.getenv("ASGARD_TASK_TAIL_MAX_INTERVAL", 5))
+ASGARD_APP_FILES_READ_WORKERS = int(os.getenv("ASGARD_APP_FILES_READ_WORKERS", 8))
+ASGARD_TASKS_FILES_WORKERS = int(os.getenv("ASGARD_TASKS_FILES_WORKERS", 8))
+ASGARD_TASK_DOWNLOAD_ID_TIMEOUT = int(os.getenv("ASGARD_TASK_DOWNLOAD_ID_TIMEOUT", 30))
+ASGARD_TASK_DOWNLOAD_CHUNK_SIZE = int(os.getenv("ASGARD_TASK_DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+ASGARD_TASK_DOWNLOAD_GZIP_ENABLED = os.getenv("ASGARD_TASK_DOWNLOAD_GZIP_ENABLED", DISABLED) == ENABLED
+ASGARD_TASK_GREP_MAX_BYTES = int(os.getenv("ASGARD_TASK_GREP_MAX_BYTES", 1024 * 1024 * 1024))
+ASGARD_TASK_GREP_MAX_SECONDS = float(os.getenv("ASGARD_TASK_GREP_MAX_SECONDS", 20))
+ASGARD_TASK_GREP_MAX_MATCHES = int(os.getenv("ASGARD_TASK_GREP_MAX_MATCHES", 1000))
+ASGARD_TASK_GREP_MAX_CONTEXT = int(os.getenv("ASGARD_TASK_GREP_MAX_CONTEXT", 50))
+ASGARD_TASK_GREP_MAX_PATTERN_LENGTH = int(os.getenv("ASGARD_TASK_GREP_MAX_PATTERN_LENGTH", 256))
+ASGARD_METRICS_ZK_CONNECT_TIMEOUT = float(os.getenv("ASGARD_METRICS_ZK_CONNECT_TIMEOUT", 2))
+ASGARD_METRICS_ZK_READ_TIMEOUT = float(os.getenv("ASGARD_METRICS_ZK_READ_TIMEOUT", 3))
+ASGARD_METRICS_ZK_SNAPSHOT_MAX_AGE = float(os.getenv("ASGARD_METRICS_ZK_SNAPSHOT_MAX_AGE", 5))
+ASGARD_METRICS_ZK_COLLECT_INTERVAL = float(os.getenv("ASGARD_METRICS_ZK_COLLECT_INTERVAL", 0))
+
 user, passw = MARATHON_CREDENTIALS.split(':')
-marathon_client = MarathonClient(MARATHON_ADDRESSES, username=user, password=passw)
+marathon_client = AsgardMarathonClient(MARATHON_ADDRESSES, username=user, password=passw,
+                                       singleflight=ASGARD_UPSTREAM_SINGLEFLIGHT_ENABLED)
 
 CORS_WHITELIST = _build_cors_whitelist(os.getenv("HOLLOWMAN_CORS_WHITELIST"))
 
@@ -2,7 +2,7 @@ from functools import wraps
 from collections import defaultdict
 
 import jwt
-import json
+from hollowman import codec
 from flask import request, make_response, session
 from alchemytools.context import managed
 
@@ -12,10 +12,10 @@ from hollowman.log import logger
 from hollowman.auth import _get_user_by_email, _get_user_by_authkey, _get_account_by_id
 
 
-invalid_token_response_body = json.dumps({"msg": "Authorization token is invalid"})
-permission_denied_on_account_response_body = json.dumps({"msg": "Permission Denied to access this account"})
-no_associated_account_response_error = json.dumps({"msg": "No associated account"})
-account_does_not_exist_response_error = json.dumps({"msg": "Account does not exist"})
+invalid_token_response_body = codec.dumps({"msg": "Authorization token is invalid"})
+permission_denied_on_account_response_body = codec.dumps({"msg": "Permission Denied to access this account"})
+no_associated_account_response_error = codec.dumps({"msg": "No associated account"})
+account_does_not_exist_response_error = codec.dumps({"msg": "Account does not exist"})
 
 class TokenTypes(object):
     USER_TOKEN = "Token"
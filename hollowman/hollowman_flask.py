@@ -1,8 +1,9 @@
 from flask import Flask,Request
-from json import loads
 
 from enum import Enum, auto
 
+from hollowman import codec
+
 
 class OperationType(Enum):
     READ = 'read'
@@ -27,7 +28,7 @@ class HollowmanRequest(Request):
         """
         Changed cache to False to ease filter implementations
         """
-        return loads(self.data)
+        return codec.loads(self.data)
         # return super(HollowmanRequest, self).get_json(
         #     cache=False,
         #     **kwargs
@@ -1,7 +1,6 @@
 import abc
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List
-from werkzeug.utils import cached_property
-from enum import Enum, auto
 
 from marathon import MarathonApp, NotFoundError
 from marathon.util import MarathonJsonEncoder
@@ -11,18 +10,12 @@ from hollowman import conf
 from hollowman.hollowman_flask import OperationType
 from hollowman.marathonapp import AsgardApp
 from hollowman.marathon.group import AsgardAppGroup
+from hollowman.http_wrappers.route import RequestResource, Route, parse_route
 
 
 Apps = List[Tuple[AsgardApp, MarathonApp]]
 
 
-class RequestResource(Enum):
-    APPS = auto()
-    GROUPS = auto()
-    DEPLOYMENTS = auto()
-    TASKS = auto()
-    QUEUE = auto()
-
 class HTTPWrapper(metaclass=abc.ABCMeta):
     json_encoder = MarathonJsonEncoder
     marathon_client = conf.marathon_client
@@ -33,13 +26,13 @@ class HTTPWrapper(metaclass=abc.ABCMeta):
     tasks_prefix = '/v2/tasks'
     queue_prefix = '/v2/queue'
 
-    API_RESERVED_PATHS_PER_ENDPOINT = {
-        "apps": ['restart', 'tasks', 'versions'],
-        "groups": ["versions"],
-        "deployments": [],
-        "tasks": [],
-        "queue": ["delay"],
-    }
+    def _parse_route(self) -> Route:
+        """
+        O path do request é interpretado uma única vez, na construção do wrapper (ver `hollowman.http_wrappers.route`),
+        e todos os métodos is_*(), object_id, etc leem dessa descrição. Alterações posteriores no path
+        do request (ex: feitas pelo join()) não mudam a descrição, que sempre se refere ao path original.
+        """
+        return parse_route(getattr(self.request, "path", None))
 
     def is_delete(self):
         return self.request.method == "DELETE"
@@ -47,6 +40,9 @@ class HTTPWrapper(metaclass=abc.ABCMeta):
     def is_post(self):
         return self.request.method == "POST"
 
+    def is_put(self):
+        return self.request.method == "PUT"
+
     def is_write_request(self) -> bool:
         return OperationType.WRITE in self.request.operations
 
@@ -57,13 +53,13 @@ class HTTPWrapper(metaclass=abc.ABCMeta):
         """
         It's a request at /v2/tasks/* ?
         """
-        return self.request.path.startswith(self.tasks_prefix)
+        return self.route.resource == RequestResource.TASKS
 
     def is_app_request(self):
         """
         It's a request at /v2/apps/* ?
         """
-        return self.request.path.startswith(self.app_path_prefix)
+        return self.route.resource == RequestResource.APPS
 
     def is_list_apps_request(self):
         """
@@ -75,58 +71,51 @@ class HTTPWrapper(metaclass=abc.ABCMeta):
         """
         It's a request at /v2/groups/* ?
         """
-        return self.request.path.startswith(self.group_path_prefix)
+        return self.route.resource == RequestResource.GROUPS
 
     def is_deployment(self) -> bool:
-        return self.request.path.startswith(self.deployment_prefix)
+        return self.route.resource == RequestResource.DEPLOYMENTS
 
     def is_queue_request(self) -> bool:
-        return self.request.path.startswith(self.queue_prefix)
-
-    def _get_object_id(self, reserved_paths, endpoint_prefix):
-        split_ = self.request.path.split('/')
-        api_paths = reserved_paths
-        locations = [split_.index(path) for path in api_paths if path in split_]
-        cut_limit = min(locations or [len(split_)])
-        # Removes every path after the app name
-        split_ = split_[:cut_limit]
-
-        # Removes evey empty path
-        split_ = [part for part in split_ if part]
-        return '/'.join(split_).replace(endpoint_prefix, '') or None
+        return self.route.resource == RequestResource.QUEUE
 
-    @cached_property
+    @property
     def object_id(self) -> str:
-        if self.is_tasks_request():
-            return None
-        base_path = [p for p in self.request.path.split("/") if p][:2]
-        endpoint_name = base_path[1]
-        return self._get_object_id(self.API_RESERVED_PATHS_PER_ENDPOINT.get(endpoint_name, []), "/".join(base_path))
+        return self.route.object_id
 
-    @cached_property
+    @property
     def request_resource(self) -> RequestResource:
-        if self.is_app_request():
-            return RequestResource.APPS
-        if self.is_group_request():
-            return RequestResource.GROUPS
-        if self.is_deployment():
-            return RequestResource.DEPLOYMENTS
-        if self.is_tasks_request():
-            return RequestResource.TASKS
-        if self.is_queue_request():
-            return RequestResource.QUEUE
+        return self.route.resource
+
+    def _get_id_with_namespace(self, user, object_id) -> str:
+        return "/{}/{}".format(user.current_account.namespace,
+                               (object_id or "/").strip("/"))
 
     def _get_original_app(self, user, app_id):
-        app_id_with_namespace = "/{}/{}".format(user.current_account.namespace,
-                                                app_id.strip("/"))
+        return self._get_app_with_namespace(self._get_id_with_namespace(user, app_id))
+
+    def _get_app_with_namespace(self, app_id_with_namespace):
         try:
             return self.marathon_client.get_app(app_id_with_namespace)
         except NotFoundError as e:
             return MarathonApp.from_json({"id": app_id_with_namespace})
 
+    def _get_original_apps(self, user, app_ids: List[str]) -> List[MarathonApp]:
+        """
+        Busca as apps originais de um request com múltiplas apps (ex: PUT em /v2/apps com uma lista).
+        As buscas são feitas em paralelo, com no máximo `ASGARD_ORIGINAL_APPS_FETCH_WORKERS` requests
+        simultâneos ao Marathon. A ordem do retorno é a mesma ordem de `app_ids`.
+        """
+        app_ids_with_namespace = [self._get_id_with_namespace(user, app_id) for app_id in app_ids]
+        if len(app_ids_with_namespace) < 2:
+            return [self._get_app_with_namespace(app_id) for app_id in app_ids_with_namespace]
+
+        max_workers = min(conf.ASGARD_ORIGINAL_APPS_FETCH_WORKERS, len(app_ids_with_namespace))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self._get_app_with_namespace, app_ids_with_namespace))
+
     def _get_original_group(self, user, group_id):
-        group_id_with_namespace = "/{}/{}".format(user.current_account.namespace,
-                                                (group_id or "/").strip("/"))
+        group_id_with_namespace = self._get_id_with_namespace(user, group_id)
         try:
             return AsgardAppGroup(self.marathon_client.get_group(group_id_with_namespace))
         except NotFoundError as e:
@@ -1,11 +1,13 @@
-import json
+from hollowman import codec
 from typing import Iterable, Dict
 
 from marathon import MarathonApp, NotFoundError
+from werkzeug.datastructures import ImmutableMultiDict
 from marathon.util import MarathonMinimalJsonEncoder
 from marathon.models.group import MarathonGroup
 from marathon.models.task import MarathonTask
 
+from hollowman import conf
 from hollowman.hollowman_flask import HollowmanRequest
 from hollowman.http_wrappers.base import Apps, HTTPWrapper
 from hollowman.marathon.group import AsgardAppGroup
@@ -17,6 +19,11 @@ from hollowman.marathonapp import AsgardApp
 # juntamos a request_app com a original_app
 REMOVABLE_KEYS = {"constraints", "labels", "env", "healthChecks", "upgradeStrategy"}
 
+# Keys que o Marathon retorna em um GET mas que não aceita
+# de volta em um PUT/POST. São removidas no momento do join(),
+# assim o body é serializado uma única vez antes de ir para o upstream.
+UPSTREAM_REMOVABLE_KEYS = ("version", "fetch", "secrets")
+
 
 class Request(HTTPWrapper):
     json_encoder = MarathonMinimalJsonEncoder
@@ -26,8 +33,9 @@ class Request(HTTPWrapper):
 
     def __init__(self, request: HollowmanRequest):
         self.request = request
+        self.route = self._parse_route()
 
-    def merge_marathon_apps(self, modified_app, base_app):
+    def merge_marathon_apps(self, modified_app, base_app, raw_app_data: Dict = None):
         """
         A junção das duas apps (request_app (aqui modified_app) e original_app (aqui base_app)) é
         sempre feita pegando todos os dados da original_app e jogando os dados da requst_app "em cima".
@@ -42,22 +50,48 @@ class Request(HTTPWrapper):
             Então quando fizermos `merged.update(modified_app.json_repr(minimal=False))`, vamos no final ter um JSON apenas com
             o campo "instances" perrnchido e todo o restante vazio.
 
-
+        O `raw_app_data` é o JSON original (já parseado pelo split()) da app que está sendo mergeada. É de onde
+        tiramos as REMOVABLE_KEYS, assim o body do request é parseado apenas uma vez, mesmo quando ele
+        possui muitas apps.
         """
 
         merged = base_app.json_repr(minimal=False)
         merged.update(modified_app.json_repr(minimal=True))
-        try:
-            raw_request_data = json.loads(self.request.data)
-            for key in REMOVABLE_KEYS:
-                if key in raw_request_data:
-                    merged[key] = raw_request_data[key]
-        except Exception as e:
-            pass
+        for key in REMOVABLE_KEYS:
+            if raw_app_data and key in raw_app_data:
+                merged[key] = raw_app_data[key]
         if isinstance(base_app, MarathonTask):
             return MarathonTask.from_json(merged)
         return AsgardApp.from_json(merged)
 
+    def diff_marathon_apps(self, modified_app, base_app) -> Dict:
+        """
+        Retorna apenas os campos da modified_app (request_app já filtrada) que são diferentes
+        da base_app (original_app), sempre incluindo o "id".
+
+        Um PUT no Marathon é um update parcial, então podemos mandar apenas o que mudou. Isso evita que campos
+        que não foram alterados, mas que o Marathon considera como mudança, gerem um novo deploy da app. Ex: Um
+        scale (PUT com {"instances": N}) passa a enviar apenas {"id": ..., "instances": N}.
+        """
+        modified_app_json_repr = modified_app.json_repr(minimal=False)
+        base_app_json_repr = base_app.json_repr(minimal=False)
+        changed_fields = {key: value for key, value in modified_app_json_repr.items()
+                          if key not in base_app_json_repr or base_app_json_repr[key] != value}
+        changed_fields["id"] = modified_app.id
+        return changed_fields
+
+    def _should_diff_apps(self, original_app) -> bool:
+        """
+        Só faz sentido mandar o diff se a app já existe no Marathon. Uma app que não existe
+        é representada por uma original_app que possui apenas o id, sem version.
+        """
+        return conf.ASGARD_WRITE_DIFF_ENABLED and self.is_put() and bool(original_app.version)
+
+    def _get_app_json_repr(self, request_app, original_app, minimal) -> Dict:
+        if self._should_diff_apps(original_app):
+            return self._remove_upstream_keys(self.diff_marathon_apps(request_app, original_app))
+        return self._remove_upstream_keys(request_app.json_repr(minimal=minimal))
+
     def get_request_data(self) -> Iterable[Dict]:
         if not self.request.data:
             return [{}]
@@ -76,27 +110,21 @@ class Request(HTTPWrapper):
     def split(self) -> Apps:
 
         if self.is_read_request():
-            if self.is_list_apps_request():
-                apps = self.marathon_client.list_apps()
-                for app in apps:
-                    yield self.merge_marathon_apps(MarathonApp(), app), app
-            elif self.is_app_request():
-                app = self._get_original_app(self.request.user, self.object_id)
-                yield self.merge_marathon_apps(MarathonApp(), app), app
-            elif self.is_group_request():
-                self.group = self._get_original_group(self.request.user, self.object_id)
-                for app in self.group.iterate_apps():
-                    yield self.merge_marathon_apps(MarathonApp(), app), app
-
+            """
+            A pipeline de READ do request não modifica nada, então não precisamos
+            buscar as apps originais no upstream. O join() monta o path (com namespace)
+            diretamente a partir do object_id.
+            """
             return
 
         # Request is a WRITE
         if self.is_app_request():
-            for app in self.get_request_data():
-                request_app = MarathonApp.from_json(app)
-                app = self._get_original_app(self.request.user, self.object_id or request_app.id)
-
-                yield self.merge_marathon_apps(request_app, app), app
+            raw_apps = self.get_request_data()
+            request_apps = [MarathonApp.from_json(raw_app) for raw_app in raw_apps]
+            original_apps = self._get_original_apps(self.request.user,
+                                                    [self.object_id or request_app.id for request_app in request_apps])
+            for raw_app, request_app, original_app in zip(raw_apps, request_apps, original_apps):
+                yield self.merge_marathon_apps(request_app, original_app, raw_app), original_app
         elif self.is_tasks_request():
             request_data = self.request.get_json()
             for task_id in request_data['ids']:
@@ -104,75 +132,70 @@ class Request(HTTPWrapper):
                 yield request_task, request_task
             return
 
-    def _rindex(self, iterable, value):
+    def _adjust_request_path_if_needed(self, request, modified_app_or_group):
         """
-        Busca o valor de `value` dentro do iterável `iterable`, mas começando do final.
-        https://stackoverflow.com/questions/522372/finding-first-and-last-index-of-some-value-in-a-list-in-python
+        Troca, no path do request, o id do objeto pelo id de `modified_app_or_group` (normalmente o id com namespace),
+        mantendo o que vem depois do id (ex: /versions/<version-id>, /tasks, /restart).
         """
-        return len(iterable) - iterable[::-1].index(value) - 1
+        if self.is_list_apps_request() or not (self.is_app_request() or self.is_group_request()):
+            return
+        request.path = self.route.upstream_path(modified_app_or_group.id or self.object_id)
 
-    def _adjust_request_path_if_needed(self, request, modified_app_or_group):
-        original_path = request.path.rstrip("/")
-        original_path_parts = original_path.split("/")
-        if original_path.startswith("/v2/apps") and original_path != "/v2/apps":
-            app_id = modified_app_or_group.id or self.object_id
-            last_app_id_part = app_id.split("/")[-1]
-            last_part_position = self._rindex(original_path_parts, last_app_id_part)
-            extra = original_path_parts[last_part_position+1:]
-            request.path = "/v2/apps{app_id}/{extra}".format(app_id=app_id.rstrip("/"), extra="/".join(extra))
-            request.path = request.path.rstrip("/")
-        if original_path.startswith("/v2/groups"):
-            extra = []
-            group_id = modified_app_or_group.id or self.group_id
-            group_id = group_id.rstrip("/")
-            last_app_id_part = group_id.split("/")[-1]
-            if last_app_id_part in original_path_parts:
-                last_part_position = self._rindex(original_path_parts, last_app_id_part)
-                extra = original_path_parts[last_part_position+1:]
-            request.path = "/v2/groups{group_id}/{extra}".format(group_id=group_id.rstrip("/"), extra="/".join(extra))
-            request.path = request.path.rstrip("/")
+    def _remove_upstream_keys(self, app_json_repr: Dict) -> Dict:
+        for key in UPSTREAM_REMOVABLE_KEYS:
+            app_json_repr.pop(key, None)
+        return app_json_repr
+
+    def _namespace_app_id_filter(self) -> str:
+        """
+        Filtro usado no parametro `id` do GET /v2/apps do Marathon. Assim o Marathon
+        retorna apenas as apps do namespace da conta atual e não todas as apps do cluster.
+        O Marathon faz um "contains" com esse valor, por isso o NameSpaceFilter continua
+        sendo o responsável por remover do response qualquer app de outro namespace.
+        """
+        return "/{}/".format(self.request.user.current_account.namespace)
+
+    def _add_namespace_filter_to_query_string(self, request):
+        if "id" in request.args:
+            return
+        args = request.args.copy()
+        args["id"] = self._namespace_app_id_filter()
+        request.args = ImmutableMultiDict(args)
 
     def join(self, apps: Apps) -> HollowmanRequest:
         request = HollowmanRequest(environ=self.request.environ, shallow=True)
 
+        if self.is_read_request() and self.is_list_apps_request():
+            self._add_namespace_filter_to_query_string(self.request)
+            return self.request
+
         if self.is_read_request() and self.is_app_request():
             """
             OperationType.READ derived request filters are
             readonly and dont manipulate the request
             """
-            if not apps:
-                request.data = json.dumps([])
-                return self.request
-            request_app, original_app = apps[0]
-            self._adjust_request_path_if_needed(self.request, original_app)
+            app_id = self._get_id_with_namespace(self.request.user, self.object_id)
+            self._adjust_request_path_if_needed(self.request, MarathonApp(id=app_id))
             return self.request
 
         if self.is_read_request() and self.is_group_request():
-            self._adjust_request_path_if_needed(self.request, self.group)
+            group_id = self._get_id_with_namespace(self.request.user, self.object_id)
+            self._adjust_request_path_if_needed(self.request, MarathonGroup(id=group_id))
             return self.request
 
         if self.is_read_request() and self.is_queue_request():
             return self.request
 
         if self.is_list_apps_request():
-            apps_json_repr = [request_app.json_repr(minimal=True)
-                              for request_app, _ in apps]
+            apps_json_repr = [self._get_app_json_repr(request_app, original_app, minimal=True)
+                              for request_app, original_app in apps]
             if self.is_post():
                 # Post em /v2/apps nao poder ser uma lista, tem que ser apenas uma app.
                 apps_json_repr = apps_json_repr[0]
         elif self.is_delete():
-            if self.is_group_request():
-                group_id = self.object_id
-                group_id_with_namespace = "/{}/{}".format(self.request.user.current_account.namespace, group_id.strip("/"))
-                self.request.path = "/v2/groups{}".format(group_id_with_namespace)
-            if self.is_app_request():
-                group_id = self.object_id
-                group_id_with_namespace = "/{}/{}".format(self.request.user.current_account.namespace, group_id.strip("/"))
-                self.request.path = "/v2/apps{}".format(group_id_with_namespace)
-            if self.is_queue_request():
-                app_id = self.object_id
-                app_id_with_namespace = "/{}/{}".format(self.request.user.current_account.namespace, app_id.strip("/"))
-                self.request.path = "/v2/queue{}/delay".format(app_id_with_namespace)
+            if self.is_group_request() or self.is_app_request() or self.is_queue_request():
+                object_id_with_namespace = self._get_id_with_namespace(self.request.user, self.object_id)
+                self.request.path = self.route.upstream_path(object_id_with_namespace)
 
             return self.request
         elif self.is_tasks_request():
@@ -186,7 +209,7 @@ class Request(HTTPWrapper):
         else:
             request_app, original_app = apps[0]
             self._adjust_request_path_if_needed(request, original_app)
-            apps_json_repr = request_app.json_repr(minimal=False)
+            apps_json_repr = self._get_app_json_repr(request_app, original_app, minimal=False)
 
-        request.data = json.dumps(apps_json_repr, cls=self.json_encoder)
+        request.data = codec.dumps(apps_json_repr, cls=self.json_encoder)
         return request
@@ -1,12 +1,17 @@
-import json
+from hollowman import codec
+from typing import List, Optional, Tuple, Dict
+
 from flask import Response as FlaskResponse
+from werkzeug.datastructures import Headers
 
 from marathon.models.group import MarathonGroup
 from marathon.models.task import MarathonTask
 from marathon.models.deployment import MarathonDeployment
 from marathon.models.queue import MarathonQueueItem
 
+from hollowman import conf
 from hollowman.http_wrappers.base import HTTPWrapper, Apps
+from hollowman.http_wrappers.stream import iter_json, buffered
 from hollowman.marathonapp import AsgardApp
 from hollowman.marathon.group import AsgardAppGroup
 
@@ -15,6 +20,7 @@ class Response(HTTPWrapper):
     def __init__(self, request, response: FlaskResponse):
         self.request = request
         self.response = response
+        self.route = self._parse_route()
 
     def is_deployment_id_response(self):
         pass
@@ -26,7 +32,7 @@ class Response(HTTPWrapper):
     def split(self) -> Apps:
 
         if self.is_read_request():
-            response_content = json.loads(self.response.data)
+            response_content = codec.loads(self.response.data)
             if self.is_list_apps_request():
                 for app in response_content['apps']:
                     response_app = AsgardApp.from_json(app)
@@ -66,7 +72,7 @@ class Response(HTTPWrapper):
                 return
 
         if self.is_write_request():
-            response_content = json.loads(self.response.data)
+            response_content = codec.loads(self.response.data)
             if 'tasks' in response_content:
                 for task in response_content['tasks']:
                     response_task = MarathonTask.from_json(task)
@@ -76,13 +82,89 @@ class Response(HTTPWrapper):
 
         yield AsgardApp(), self.marathon_client.get_app(self.app_id)
 
-    def join(self, apps: Apps) -> FlaskResponse:
+    def _paginate_apps(self, response_apps: List[AsgardApp]) -> Tuple[List[AsgardApp], Optional[str]]:
+        """
+        Paginação opcional (?limit=N&cursor=<app-id>) do GET /v2/apps. O cursor é o id (sem namespace)
+        da última app da página anterior; as apps são ordenadas pelo id e a página seguinte começa
+        logo depois do cursor. Retorna as apps da página e o cursor da próxima página (None se essa for a última).
+
+        O limit fica sempre entre 1 e ASGARD_APPS_PAGE_MAX_LIMIT (um cursor sem limit usa o máximo).
+        A paginação é feita depois de buscar (e filtrar) todas as apps no Marathon, então ela limita apenas
+        o tamanho do response, não a memória usada para buscar as apps.
+        """
+        limit = self.request.args.get("limit", type=int)
+        cursor = self.request.args.get("cursor")
+        if limit is None and not cursor:
+            return response_apps, None
+
+        if limit is None:
+            limit = conf.ASGARD_APPS_PAGE_MAX_LIMIT
+        limit = min(max(limit, 1), conf.ASGARD_APPS_PAGE_MAX_LIMIT)
+        response_apps = sorted(response_apps, key=lambda app: app.id)
+        if cursor:
+            response_apps = [app for app in response_apps if app.id > cursor]
+        if len(response_apps) <= limit:
+            return response_apps, None
+        page = response_apps[:limit]
+        return page, page[-1].id
+
+    def _get_projected_fields(self) -> Optional[List[str]]:
+        fields = self.request.args.get("fields")
+        if not fields:
+            return None
+        return ["id"] + [field.strip() for field in fields.split(",") if field.strip()]
+
+    def _project_app(self, app_json_repr: Dict, fields: Optional[List[str]]) -> Dict:
+        """
+        O json_repr() mantém os objetos aninhados (container, healthChecks, tasks, etc) como objetos, que só
+        são serializados no codec.dumps(). Projetando aqui evitamos serializar os campos que o cliente não pediu.
+        """
+        if not fields:
+            return app_json_repr
+        return {field: app_json_repr[field] for field in fields if field in app_json_repr}
+
+    def _group_json_repr(self, group: MarathonGroup) -> Dict:
+        """
+        Representação de um grupo onde as apps e os sub-grupos são generators, assim
+        a árvore de grupos é serializada aos poucos pelo `iter_json()`.
+        """
+        group_json_repr = group.json_repr(minimal=False)
+        if "apps" in group_json_repr:
+            group_json_repr["apps"] = (app for app in group.apps)
+        if "groups" in group_json_repr:
+            group_json_repr["groups"] = (self._group_json_repr(subgroup) for subgroup in group.groups)
+        return group_json_repr
+
+    def _build_response(self, body) -> FlaskResponse:
+        chunks = iter_json(body, cls=self.json_encoder)
+        if not conf.ASGARD_STREAMING_RESPONSE_ENABLED:
+            return FlaskResponse(
+                response="".join(chunks),
+                status=self.response.status,
+                headers=self.response.headers
+            )
 
-        body = json.loads(self.response.data)
+        headers = Headers(self.response.headers)
+        headers.remove("Content-Length")
+        return FlaskResponse(
+            response=buffered(chunks, conf.ASGARD_STREAMING_RESPONSE_CHUNK_SIZE),
+            status=self.response.status,
+            headers=headers
+        )
+
+    def join(self, apps: Apps) -> FlaskResponse:
+        """
+        Apps, tasks e grupos são montados como generators, que só são consumidos durante
+        a serialização (ver `hollowman.http_wrappers.stream`). Com ASGARD_STREAMING_RESPONSE_ENABLED
+        o body é enviado em pedaços, sem nunca existir inteiro em memória.
+        """
         if self.is_list_apps_request():
-            apps_json_repr = [response_app.json_repr(minimal=True)
-                              for response_app, _ in apps]
-            body = {'apps': apps_json_repr}
+            response_apps, next_cursor = self._paginate_apps([response_app for response_app, _ in apps])
+            fields = self._get_projected_fields()
+            body = {'apps': (self._project_app(response_app.json_repr(minimal=True), fields)
+                             for response_app in response_apps)}
+            if next_cursor:
+                body['nextCursor'] = next_cursor
         elif self.is_read_request() and self.is_app_request():
                 # TODO: Retornar 404 nesse caso. Pensar em como fazer.
                 # No caso de ser um acesso a uma app específica, e ainda sim recebermos apps = [],
@@ -94,7 +176,7 @@ class Response(HTTPWrapper):
                     body = body['app']
         elif self.is_read_request() and self.is_group_request():
             response_group = apps[0][0] if apps else MarathonGroup()
-            body = response_group.json_repr(minimal=False)
+            body = self._group_json_repr(response_group)
         elif self.is_read_request() and self.is_deployment():
             deployments_json_repr = [response_deployment.json_repr(minimal=True)
                                      for response_deployment, _ in apps]
@@ -104,18 +186,11 @@ class Response(HTTPWrapper):
                                for queue, _ in apps]
             body = {'queue': queue_json_repr}
         elif self.is_tasks_request():
-            original_response_data = json.loads(self.response.data)
-            all_tasks = []
-            for task, _ in apps:
-                all_tasks.append(task.json_repr(minimal=False))
-            body = {'tasks': all_tasks}
-            try:
-                original_response_data['tasks']
-            except KeyError:
+            original_response_data = codec.loads(self.response.data)
+            body = {'tasks': (task.json_repr(minimal=False) for task, _ in apps)}
+            if 'tasks' not in original_response_data:
                 body = original_response_data
+        else:
+            body = codec.loads(self.response.data)
 
-        return FlaskResponse(
-            response=json.dumps(body, cls=self.json_encoder),
-            status=self.response.status,
-            headers=self.response.headers
-        )
+        return self._build_response(body)
@@ -0,0 +1,75 @@
+from enum import Enum, auto
+from typing import NamedTuple, Optional, Tuple
+
+
+class RequestResource(Enum):
+    APPS = auto()
+    GROUPS = auto()
+    DEPLOYMENTS = auto()
+    TASKS = auto()
+    QUEUE = auto()
+
+
+RESOURCES_BY_NAME = {
+    "apps": RequestResource.APPS,
+    "groups": RequestResource.GROUPS,
+    "deployments": RequestResource.DEPLOYMENTS,
+    "tasks": RequestResource.TASKS,
+    "queue": RequestResource.QUEUE,
+}
+
+# Partes do path que, a partir delas, não fazem mais parte do id do objeto.
+# Ex: /v2/apps/my-app/versions/<version-id> -> id: /my-app, suffix: versions/<version-id>
+API_RESERVED_PATHS_PER_ENDPOINT = {
+    "apps": ('restart', 'tasks', 'versions'),
+    "groups": ("versions",),
+    "deployments": (),
+    "tasks": (),
+    "queue": ("delay",),
+}
+
+
+class Route(NamedTuple):
+    """
+    Descrição de um path da API do Marathon, ex: /v2/apps//my/app/versions/<version-id>
+
+        prefix: /v2/apps
+        resource: RequestResource.APPS
+        object_id: /my/app
+        suffix: ("versions", "<version-id>")
+    """
+    prefix: str
+    resource: Optional[RequestResource]
+    object_id: Optional[str]
+    suffix: Tuple[str, ...]
+
+    def upstream_path(self, object_id: str) -> str:
+        """
+        Monta o path que vai para o Marathon trocando o id do objeto (ex: pelo id com namespace)
+        e mantendo o restante do path.
+        """
+        path = "{prefix}{object_id}/{suffix}".format(prefix=self.prefix,
+                                                     object_id=(object_id or "").rstrip("/"),
+                                                     suffix="/".join(self.suffix))
+        return path.rstrip("/")
+
+
+def parse_route(path: Optional[str]) -> Route:
+    if not isinstance(path, str):
+        path = ""
+    parts = [part for part in path.split("/") if part]
+    if len(parts) < 2:
+        return Route(prefix="/" + "/".join(parts), resource=None, object_id=None, suffix=())
+
+    endpoint_name = parts[1]
+    prefix = "/{}/{}".format(parts[0], endpoint_name)
+    resource = RESOURCES_BY_NAME.get(endpoint_name) if parts[0] == "v2" else None
+    if resource == RequestResource.TASKS:
+        return Route(prefix=prefix, resource=resource, object_id=None, suffix=tuple(parts[2:]))
+
+    object_parts = parts[2:]
+    reserved_paths = API_RESERVED_PATHS_PER_ENDPOINT.get(endpoint_name, ())
+    cut_limit = next((position for position, part in enumerate(object_parts) if part in reserved_paths),
+                     len(object_parts))
+    object_id = "/" + "/".join(object_parts[:cut_limit]) if cut_limit else None
+    return Route(prefix=prefix, resource=resource, object_id=object_id, suffix=tuple(object_parts[cut_limit:]))
@@ -0,0 +1,56 @@
+from types import GeneratorType
+from typing import Iterator, Iterable
+
+from hollowman import codec
+
+
+def _is_streamable(value) -> bool:
+    return isinstance(value, GeneratorType) or \
+        (isinstance(value, dict) and any(isinstance(v, GeneratorType) for v in value.values()))
+
+
+def iter_json(value, cls=None) -> Iterator[str]:
+    """
+    Serializa `value` em pedaços, sem montar o JSON inteiro em memória.
+
+    Generators são os pontos de "streaming": cada item de um generator é serializado e
+    entregue separadamente (e os generators só são consumidos aqui). Um dict é serializado
+    chave a chave apenas se algum valor dele for um generator; qualquer outro valor é
+    serializado de uma vez com codec.dumps(value, cls=cls).
+
+    O resultado de "".join(iter_json(value)) é igual ao que codec.dumps() geraria se todos os
+    generators fossem listas.
+    """
+    if isinstance(value, GeneratorType):
+        yield "["
+        for position, item in enumerate(value):
+            if position:
+                yield codec.SEPARATORS[0]
+            yield from iter_json(item, cls)
+        yield "]"
+    elif _is_streamable(value):
+        yield "{"
+        for position, (key, item) in enumerate(value.items()):
+            yield "{}{}{}".format(codec.SEPARATORS[0] if position else "", codec.dumps(key), codec.SEPARATORS[1])
+            yield from iter_json(item, cls)
+        yield "}"
+    else:
+        yield codec.dumps(value, cls=cls)
+
+
+def buffered(chunks: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """
+    Junta os pedaços gerados pelo iter_json() em blocos de ~chunk_size caracteres, assim
+    não fazemos um write() no socket para cada app/task.
+    """
+    buffer = []
+    buffer_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffer_size += len(chunk)
+        if buffer_size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            buffer_size = 0
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,28 @@
+from marathon import MarathonClient
+
+from hollowman.singleflight import SingleFlight, request_key
+
+
+class AsgardMarathonClient(MarathonClient):
+    """
+    MarathonClient que junta GETs idênticos (mesmo path, query string e backends)
+    que estão em andamento em uma única chamada ao Marathon.
+
+    O response é compartilhado entre as threads que fizeram o mesmo request. Isso é seguro
+    pois os métodos do client apenas fazem `response.json()` e constroem novos objetos a partir daí;
+    os filtros de cada usuário sempre trabalham em cima desses novos objetos.
+    """
+
+    def __init__(self, *args, singleflight=True, **kwargs):
+        super(AsgardMarathonClient, self).__init__(*args, **kwargs)
+        self.singleflight = singleflight
+        self._inflight_requests = SingleFlight()
+
+    def _do_request(self, method, path, params=None, data=None):
+        if not self.singleflight or method.upper() != "GET":
+            return super(AsgardMarathonClient, self)._do_request(method, path, params=params, data=data)
+
+        key = request_key(self.servers, method.upper(), path, params, data)
+        return self._inflight_requests.do(key,
+                                          super(AsgardMarathonClient, self)._do_request,
+                                          method, path, params=params, data=data)
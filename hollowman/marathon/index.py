@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple, Iterable
+
+from marathon import MarathonApp
+
+from hollowman import conf
+from hollowman.singleflight import SingleFlight
+
+
+Term = Tuple[str, str]
+
+LABEL = "label"
+IMAGE = "image"
+CONSTRAINT = "constraint"
+ENV = "env"
+
+
+def _image_repository(image: str) -> str:
+    """
+    Remove a tag da imagem: "registry:5000/org/app:1.0" -> "registry:5000/org/app"
+    """
+    name_start = image.rfind("/") + 1
+    tag_separator = image.rfind(":")
+    if tag_separator > name_start:
+        return image[:tag_separator]
+    return image
+
+
+def app_revision(app: MarathonApp) -> Tuple:
+    """
+    Muda sempre que a app muda de configuração ou de quantidade de tasks. Apps com a mesma
+    revisão não são reprocessadas no `AppsIndex.update()`.
+    """
+    return app.version, app.instances, app.tasks_running, app.tasks_staged
+
+
+def app_terms(app: MarathonApp) -> Set[Term]:
+    """
+    Todos os termos pelos quais uma app pode ser encontrada no índice.
+    Labels e constraints são indexadas tanto pela chave quanto pela chave + valor.
+    """
+    terms = set()
+    for key, value in (app.labels or {}).items():
+        terms.add((LABEL, key))
+        terms.add((LABEL, "{}={}".format(key, value)))
+
+    docker = app.container and app.container.docker
+    if docker and docker.image:
+        terms.add((IMAGE, docker.image))
+        terms.add((IMAGE, _image_repository(docker.image)))
+
+    for constraint in app.constraints or []:
+        terms.add((CONSTRAINT, constraint.field))
+        terms.add((CONSTRAINT, ":".join(str(part) for part in (constraint.field, constraint.operator, constraint.value)
+                                        if part is not None)))
+
+    for key in (app.env or {}).keys():
+        terms.add((ENV, key))
+    return terms
+
+
+class AppsIndex:
+    """
+    Índice invertido (termo -> ids das apps) das apps de um namespace.
+
+    O índice é atualizado de forma incremental: em cada `update()` apenas as apps que
+    mudaram de revisão (ou que foram criadas/removidas) são re-indexadas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._terms = defaultdict(set)  # type: Dict[Term, Set[str]]
+        self._apps = {}  # type: Dict[str, Tuple[Tuple, Set[Term]]]
+        self.updated_at = None
+
+    def _remove_app(self, app_id):
+        _, terms = self._apps.pop(app_id)
+        for term in terms:
+            self._terms[term].discard(app_id)
+            if not self._terms[term]:
+                del self._terms[term]
+
+    def _add_app(self, app):
+        terms = app_terms(app)
+        self._apps[app.id] = (app_revision(app), terms)
+        for term in terms:
+            self._terms[term].add(app.id)
+
+    def update(self, apps: Iterable[MarathonApp]) -> Tuple[List[MarathonApp], List[str]]:
+        """
+        Sincroniza o índice com a lista atual de apps.
+        Retorna as apps que foram (re)indexadas e os ids das apps removidas.
+        """
+        with self._lock:
+            current_ids = set()
+            changed_apps = []
+            for app in apps:
+                current_ids.add(app.id)
+                indexed = self._apps.get(app.id)
+                if indexed and indexed[0] == app_revision(app):
+                    continue
+                if indexed:
+                    self._remove_app(app.id)
+                self._add_app(app)
+                changed_apps.append(app)
+
+            removed_ids = [app_id for app_id in self._apps if app_id not in current_ids]
+            for app_id in removed_ids:
+                self._remove_app(app_id)
+
+            self.updated_at = time.time()
+            return changed_apps, removed_ids
+
+    def search(self, terms: Iterable[Term]) -> List[str]:
+        """
+        Retorna os ids das apps que possuem *todos* os termos pedidos.
+        """
+        with self._lock:
+            result = None
+            for term in terms:
+                app_ids = self._terms.get(term, set())
+                result = set(app_ids) if result is None else result & app_ids
+                if not result:
+                    return []
+            return sorted(result or [])
+
+
+class NamespaceIndexes:
+    """
+    Um AppsIndex por namespace, atualizado a partir do Marathon quando tem mais de
+    `ttl` segundos. Atualizações simultâneas de um mesmo namespace viram uma só.
+
+    Os listeners registrados com `add_listener()` recebem as mudanças de cada atualização:
+    `listener(namespace, changed_apps, removed_ids)`.
+    """
+
+    def __init__(self, ttl=None, marathon_client=None):
+        self.ttl = ttl
+        self.marathon_client = marathon_client
+        self._lock = threading.Lock()
+        self._indexes = {}  # type: Dict[str, AppsIndex]
+        self._inflight_refreshes = SingleFlight()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _get_ttl(self):
+        return conf.ASGARD_APPS_INDEX_TTL if self.ttl is None else self.ttl
+
+    def _get_marathon_client(self):
+        return self.marathon_client or conf.marathon_client
+
+    def _get_or_create(self, namespace) -> AppsIndex:
+        with self._lock:
+            if namespace not in self._indexes:
+                self._indexes[namespace] = AppsIndex()
+            return self._indexes[namespace]
+
+    def _is_stale(self, index: AppsIndex) -> bool:
+        return index.updated_at is None or time.time() - index.updated_at > self._get_ttl()
+
+    def refresh(self, namespace) -> Tuple[List[MarathonApp], List[str]]:
+        namespace_prefix = "/{}/".format(namespace)
+        apps = [app for app in self._get_marathon_client().list_apps(app_id=namespace_prefix)
+                if app.id.startswith(namespace_prefix)]
+        changed_apps, removed_ids = self._get_or_create(namespace).update(apps)
+        for listener in self._listeners:
+            listener(namespace, changed_apps, removed_ids)
+        return changed_apps, removed_ids
+
+    def get(self, namespace) -> AppsIndex:
+        index = self._get_or_create(namespace)
+        if self._is_stale(index):
+            self._inflight_refreshes.do(namespace, self.refresh, namespace)
+        return index
+
+
+namespace_indexes = NamespaceIndexes()
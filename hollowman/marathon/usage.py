@@ -0,0 +1,112 @@
+import threading
+from typing import Dict, List
+
+from marathon import MarathonApp
+
+from hollowman.marathon.index import namespace_indexes
+
+
+USAGE_FIELDS = ("apps", "instances", "cpus", "mem", "disk", "tasks_running", "tasks_staged")
+
+
+def app_usage(app: MarathonApp) -> Dict[str, float]:
+    instances = app.instances or 0
+    return {
+        "apps": 1,
+        "instances": instances,
+        "cpus": (app.cpus or 0) * instances,
+        "mem": (app.mem or 0) * instances,
+        "disk": (app.disk or 0) * instances,
+        "tasks_running": app.tasks_running or 0,
+        "tasks_staged": app.tasks_staged or 0,
+    }
+
+
+def app_groups(app_id: str) -> List[str]:
+    """
+    Todos os grupos (já sem o namespace) que contém a app, do root até o grupo pai. Ex:
+        "/infra/db/mysql" -> ["/", "/infra", "/infra/db"]
+    """
+    parts = [part for part in app_id.split("/") if part][:-1]
+    return ["/"] + ["/" + "/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def _empty_usage() -> Dict[str, float]:
+    return dict.fromkeys(USAGE_FIELDS, 0)
+
+
+class NamespaceUsage:
+    """
+    Totais de recursos reservados por grupo de um namespace. O grupo "/" é o total do namespace.
+
+    Os totais não são recalculados a cada request: cada app guarda a sua contribuição e, quando
+    ela muda (ou é removida), apenas a diferença é aplicada nos grupos que contém a app.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._apps = {}  # type: Dict[str, Dict[str, float]]
+        self._groups = {}  # type: Dict[str, Dict[str, float]]
+
+    def _remove_namespace(self, app_id):
+        return app_id[len(self.namespace) + 1:]
+
+    def _apply(self, app_id, usage, sign):
+        for group in app_groups(self._remove_namespace(app_id)):
+            group_usage = self._groups.setdefault(group, _empty_usage())
+            for field in USAGE_FIELDS:
+                group_usage[field] += sign * usage[field]
+            if not group_usage["apps"]:
+                del self._groups[group]
+
+    def update(self, changed_apps: List[MarathonApp], removed_ids: List[str]):
+        with self._lock:
+            for app_id in removed_ids:
+                if app_id in self._apps:
+                    self._apply(app_id, self._apps.pop(app_id), -1)
+            for app in changed_apps:
+                if app.id in self._apps:
+                    self._apply(app.id, self._apps.pop(app.id), -1)
+                usage = app_usage(app)
+                self._apps[app.id] = usage
+                self._apply(app.id, usage, 1)
+
+    def totals(self) -> Dict:
+        with self._lock:
+            groups = {group: {field: round(value, 3) for field, value in usage.items()}
+                      for group, usage in self._groups.items()}
+        return {
+            "namespace": self.namespace,
+            "total": groups.pop("/", _empty_usage()),
+            "groups": groups,
+        }
+
+
+class NamespacesUsage:
+    """
+    Um NamespaceUsage por namespace, alimentado pelas atualizações do índice de apps
+    (hollowman.marathon.index), ou seja, usa a mesma leitura do Marathon e o mesmo TTL.
+    """
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self._lock = threading.Lock()
+        self._usages = {}  # type: Dict[str, NamespaceUsage]
+        indexes.add_listener(self.on_index_update)
+
+    def _get_or_create(self, namespace) -> NamespaceUsage:
+        with self._lock:
+            if namespace not in self._usages:
+                self._usages[namespace] = NamespaceUsage(namespace)
+            return self._usages[namespace]
+
+    def on_index_update(self, namespace, changed_apps, removed_ids):
+        self._get_or_create(namespace).update(changed_apps, removed_ids)
+
+    def get(self, namespace) -> Dict:
+        self.indexes.get(namespace)
+        return self._get_or_create(namespace).totals()
+
+
+namespace_usages = NamespacesUsage(namespace_indexes)
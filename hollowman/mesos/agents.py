@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from hollowman import conf
+from hollowman.log import logger
+from hollowman.mesos.client import mesos_client
+from hollowman.singleflight import SingleFlight
+
+
+class Agent(NamedTuple):
+    id: str
+    hostname: str
+    port: int
+
+    @property
+    def address(self) -> str:
+        return "{}:{}".format(self.hostname, self.port)
+
+
+class AgentsIndex:
+    """
+    Índice (id -> hostname/porta) dos agents do cluster, montado a partir do `/slaves` do Mesos master.
+
+    Por padrão o índice é atualizado sob demanda: quando tem mais de `ttl` segundos ou quando
+    procuramos um agent que ainda não conhecemos (ex: um agent que acabou de entrar no cluster).
+    Com `start_background_refresh()` a atualização passa a ser feita também por uma thread, assim
+    os requests quase nunca precisam esperar pelo master.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._agents = {}  # type: Dict[str, Agent]
+        self._inflight_refreshes = SingleFlight()
+        self._refresh_thread = None
+        self.updated_at = None
+
+    def _get_ttl(self):
+        return conf.ASGARD_MESOS_AGENTS_INDEX_TTL if self.ttl is None else self.ttl
+
+    def _is_stale(self) -> bool:
+        return self.updated_at is None or time.time() - self.updated_at > self._get_ttl()
+
+    def _refresh(self):
+        slaves = mesos_client.get("/slaves").json()['slaves']
+        # Trocamos o dict inteiro, assim quem está lendo nunca vê o índice pela metade.
+        self._agents = {slave['id']: Agent(id=slave['id'], hostname=slave['hostname'], port=slave['port'])
+                        for slave in slaves}
+        self.updated_at = time.time()
+
+    def refresh(self):
+        self._inflight_refreshes.do("agents", self._refresh)
+
+    def get(self, agent_id) -> Optional[Agent]:
+        refreshed = False
+        if self._is_stale():
+            self.refresh()
+            refreshed = True
+        agent = self._agents.get(agent_id)
+        if agent is None and not refreshed:
+            self.refresh()
+            agent = self._agents.get(agent_id)
+        return agent
+
+    def __contains__(self, agent_id):
+        return agent_id in self._agents
+
+    def clear(self):
+        self._agents = {}
+        self.updated_at = None
+
+    def _refresh_forever(self, interval):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error({"action": "mesos-agents-index-refresh", "state": "error", "error": str(e)})
+            time.sleep(interval)
+
+    def start_background_refresh(self, interval):
+        if self._refresh_thread:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_forever, args=(interval,), daemon=True)
+        self._refresh_thread.start()
+
+
+agents_index = AgentsIndex()
@@ -0,0 +1,84 @@
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+import requests
+
+from hollowman import conf
+from hollowman.log import logger
+
+
+class MesosClient:
+    """
+    Faz os requests para os Mesos masters (e para os agents) usando uma única `requests.Session`,
+    assim as conexões são reaproveitadas entre os requests.
+
+    O master que é o leader fica guardado em `self.leader` e é sempre o primeiro a ser usado.
+    Um master que não é o leader responde com um redirect (307) para o leader atual, nesse caso
+    passamos a usar o leader informado. Se um master não responde (erro de conexão, timeout
+    ou 5xx) tentamos o próximo da lista.
+    """
+
+    def __init__(self, addresses=None, timeout=None):
+        self.addresses = addresses
+        self.timeout = timeout
+        self.leader = None
+        self.session = requests.Session()
+
+    def _get_addresses(self):
+        return self.addresses or conf.MESOS_ADDRESSES
+
+    def _get_timeout(self):
+        return conf.ASGARD_MESOS_REQUEST_TIMEOUT if self.timeout is None else self.timeout
+
+    def _masters(self):
+        addresses = self._get_addresses()
+        if self.leader in addresses:
+            return [self.leader] + [address for address in addresses if address != self.leader]
+        return ([self.leader] if self.leader else []) + list(addresses)
+
+    def _leader_from_redirect(self, master, response):
+        """
+        O Location do redirect vem sem o scheme, ex: //10.0.0.1:5050/tasks
+        """
+        location = urlparse(response.headers.get("Location", ""))
+        if not location.netloc:
+            return None
+        return "{}://{}".format(location.scheme or urlparse(master).scheme, location.netloc)
+
+    def _get_from_master(self, master, path, **kwargs):
+        response = self.session.get(f"{master}{path}", timeout=self._get_timeout(), allow_redirects=False, **kwargs)
+        if response.status_code != HTTPStatus.TEMPORARY_REDIRECT:
+            return master, response
+
+        leader = self._leader_from_redirect(master, response)
+        if not leader or leader == master:
+            return master, response
+        logger.debug({"action": "mesos-leader-redirect", "talked_to": master, "new_leader": leader})
+        return leader, self.session.get(f"{leader}{path}", timeout=self._get_timeout(), allow_redirects=False, **kwargs)
+
+    def get(self, path, **kwargs) -> requests.Response:
+        """
+        GET em um endpoint do master, ex: client.get("/slaves")
+        """
+        for master in self._masters():
+            try:
+                talked_to, response = self._get_from_master(master, path, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                logger.error({"action": "mesos-request", "state": "error", "master": master, "error": str(e)})
+                continue
+            if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                logger.error({"action": "mesos-request", "state": "error", "master": talked_to, "status_code": response.status_code})
+                continue
+            self.leader = talked_to
+            return response
+        self.leader = None
+        raise Exception("No Mesos masters found")
+
+    def get_agent(self, agent_address, path, **kwargs) -> requests.Response:
+        """
+        GET em um endpoint de um agent, ex: client.get_agent("10.0.0.1:5051", "/flags")
+        """
+        return self.session.get(f"http://{agent_address}{path}", timeout=self._get_timeout(), **kwargs)
+
+
+mesos_client = MesosClient()
@@ -0,0 +1,192 @@
+import time
+from collections import deque
+from http import HTTPStatus
+from typing import Callable, Iterable, Iterator, Optional
+
+import requests
+
+from hollowman.mesos.client import mesos_client
+
+
+def read_file(agent_address, sandbox_directory, path, offset, length):
+    """
+    Lê um pedaço de um arquivo do sandbox usando o `/files/read` do agent.
+    Retorna o response do agent (com offset=-1 o agent retorna apenas o tamanho atual do arquivo).
+    """
+    return mesos_client.get_agent(agent_address,
+                                  f"/files/read?path={sandbox_directory}{path}&offset={offset}&length={length}")
+
+
+def encoded_length(data: str) -> int:
+    """
+    O `data` do `/files/read` vem decodificado, mas os offsets do agent são em bytes (UTF-8).
+    """
+    return len(data.encode("utf-8"))
+
+
+def download_file(agent_address, sandbox_directory, path, offset=0, chunk_size=1024 * 1024) -> Iterator[bytes]:
+    """
+    Lê o arquivo do sandbox (`/files/download` do agent) a partir de `offset`, em pedaços de `chunk_size` bytes.
+    Agents que não respeitam o header Range respondem o arquivo inteiro; nesse caso descartamos o início.
+    """
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    response = mesos_client.get_agent(agent_address, f"/files/download?path={sandbox_directory}{path}",
+                                      headers=headers, stream=True)
+    try:
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            raise FileNotFoundError(path)
+        if response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+            return
+        response.raise_for_status()
+
+        to_skip = offset if response.status_code == HTTPStatus.OK else 0
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if to_skip:
+                skipped = min(to_skip, len(chunk))
+                chunk = chunk[skipped:]
+                to_skip -= skipped
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+
+
+def _iter_lines(chunks: Iterable[bytes], max_line_length) -> Iterator[bytes]:
+    """
+    Linhas (incluindo a quebra de linha) de um stream de bytes. Linhas maiores que `max_line_length` são quebradas,
+    para que um arquivo binário (ou sem quebras de linha) não seja guardado inteiro em memória.
+    """
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end == -1:
+                break
+            while end + 1 - start > max_line_length:
+                yield pending[start:start + max_line_length]
+                start += max_line_length
+            yield pending[start:end + 1]
+            start = end + 1
+        pending = pending[start:]
+        while len(pending) > max_line_length:
+            yield pending[:max_line_length]
+            pending = pending[max_line_length:]
+    if pending:
+        yield pending
+
+
+def grep_chunks(chunks: Iterable[bytes], matches: Callable[[str], bool], context=0, offset=0,
+                max_bytes=None, max_seconds=None, max_matches=None, max_line_length=64 * 1024,
+                clock=time.monotonic) -> dict:
+    """
+    Filtra as linhas de um arquivo (recebido em pedaços de bytes), como um `grep -C <context>`.
+
+    Retorna as linhas que casaram (match=True) e as linhas de contexto (match=False), cada uma com o offset
+    em que começa no arquivo. A leitura para quando um dos limites é atingido (bytes lidos, tempo ou quantidade
+    de matches); nesse caso "truncated" diz qual limite foi atingido e "next_offset" é de onde continuar.
+    """
+    lines = []
+    before = deque(maxlen=context) if context else None
+    after_remaining = 0
+    match_count = 0
+    scanned_bytes = 0
+    truncated = None
+    started_at = clock()
+
+    for raw_line in _iter_lines(chunks, max_line_length):
+        if max_bytes is not None and scanned_bytes + len(raw_line) > max_bytes:
+            truncated = "max_bytes"
+            break
+        if max_seconds is not None and clock() - started_at > max_seconds:
+            truncated = "max_seconds"
+            break
+
+        line = {"offset": offset, "line": raw_line.rstrip(b"\r\n").decode("utf-8", errors="replace")}
+        if matches(line["line"]):
+            if max_matches is not None and match_count >= max_matches:
+                truncated = "max_matches"
+                break
+            if before:
+                lines.extend(before)
+                before.clear()
+            lines.append(dict(line, match=True))
+            match_count += 1
+            after_remaining = context
+        elif after_remaining:
+            lines.append(dict(line, match=False))
+            after_remaining -= 1
+        elif before is not None:
+            before.append(dict(line, match=False))
+
+        offset += len(raw_line)
+        scanned_bytes += len(raw_line)
+
+    return {"lines": lines, "matches": match_count, "scanned_bytes": scanned_bytes,
+            "next_offset": offset, "truncated": truncated}
+
+
+class FileTail:
+    """
+    Acompanha um arquivo do sandbox de uma task (como um `tail -f`).
+
+    Sem `offset` começamos do final do arquivo, menos `backlog` bytes.
+    Cada iteração lê o próximo pedaço do arquivo a partir de `offset`. Quando o arquivo tem dados
+    novos, o pedaço é entregue ({"offset": ..., "data": ...}) e lemos de novo imediatamente.
+    Quando não tem, esperamos antes de ler de novo, dobrando a espera (até `max_interval`) a cada
+    leitura vazia; assim um arquivo parado custa poucas chamadas ao agent. Depois de uma espera
+    é entregue `None`, para quem está enviando os dados poder mandar um keepalive.
+
+    A iteração termina quando o agent responde 404 (a task ou o arquivo não existem mais), nesse caso
+    `self.gone` fica True, ou quando não conseguimos falar com o agent, nesse caso o erro fica em `self.error`.
+    """
+
+    def __init__(self, agent_address, sandbox_directory, path, offset=None, backlog=0, chunk_size=64 * 1024,
+                 min_interval=0.5, max_interval=5, sleep=time.sleep):
+        self.agent_address = agent_address
+        self.sandbox_directory = sandbox_directory
+        self.path = path
+        self.offset = offset
+        self.backlog = backlog
+        self.chunk_size = chunk_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.sleep = sleep
+        self.gone = False
+        self.error = None
+
+    def _read(self, offset, length) -> Optional[dict]:
+        try:
+            response = read_file(self.agent_address, self.sandbox_directory, self.path, offset, length)
+        except requests.exceptions.RequestException as e:
+            self.error = str(e)
+            return None
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            self.gone = True
+            return None
+        return response.json()
+
+    def __iter__(self) -> Iterator[Optional[dict]]:
+        if self.offset is None or self.offset < 0:
+            file_info = self._read(-1, 0)
+            if file_info is None:
+                return
+            self.offset = max(0, file_info['offset'] - self.backlog)
+
+        interval = self.min_interval
+        while True:
+            file_info = self._read(self.offset, self.chunk_size)
+            if file_info is None:
+                return
+            if file_info['data']:
+                chunk = {"offset": self.offset, "data": file_info['data']}
+                self.offset += encoded_length(file_info['data'])
+                interval = self.min_interval
+                yield chunk
+            else:
+                self.sleep(interval)
+                interval = min(interval * 2, self.max_interval)
+                yield None
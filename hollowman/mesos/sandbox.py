@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from hollowman import conf
+from hollowman.mesos.agents import Agent, AgentsIndex, agents_index
+from hollowman.mesos.client import mesos_client
+
+
+def task_container_id(task) -> Optional[str]:
+    """
+    Id do container da task, como informado pelo agent nos status da task.
+    Containers aninhados (que têm `parent`) ficam em outro path do sandbox, por isso não são
+    considerados aqui.
+    """
+    for status in reversed(task.get('statuses') or []):
+        container_id = status.get('container_status', {}).get('container_id', {})
+        if container_id.get('value') and 'parent' not in container_id:
+            return container_id['value']
+    return None
+
+
+def task_executor_id(task) -> str:
+    # Tasks lançadas com o command executor (caso das tasks do Marathon) vêm com executor_id vazio,
+    # nesse caso o executor tem o mesmo id da task.
+    return task.get('executor_id') or task['id']
+
+
+def sandbox_path(work_dir, agent_id, framework_id, executor_id, container_id) -> str:
+    return f"{work_dir.rstrip('/')}/slaves/{agent_id}/frameworks/{framework_id}/executors/{executor_id}/runs/{container_id}"
+
+
+class SandboxResolver:
+    """
+    Descobre o agent e o diretório do sandbox de uma task (no formato do `/tasks` do Mesos master).
+
+    O diretório é montado a partir do `work_dir` do agent (lido do `/flags`, que é pequeno) e do id do
+    container da task. O `work_dir` de um agent não muda enquanto o agent tiver o mesmo id (o próprio
+    id fica guardado dentro do work_dir), então ele fica guardado enquanto o agent estiver no índice.
+
+    Só quando a task não informa o container usamos o `/state` do agent, que pode ter vários MB. Esse
+    state fica guardado por ASGARD_MESOS_AGENT_STATE_CACHE_TTL segundos por agent.
+    """
+
+    def __init__(self, agents: AgentsIndex, state_ttl=None):
+        self.agents = agents
+        self.state_ttl = state_ttl
+        self._lock = threading.Lock()
+        self._work_dirs = {}  # type: Dict[str, str]
+        self._states = {}  # type: Dict[str, Tuple[float, dict]]
+
+    def _get_state_ttl(self):
+        return conf.ASGARD_MESOS_AGENT_STATE_CACHE_TTL if self.state_ttl is None else self.state_ttl
+
+    def _get_work_dir(self, agent: Agent) -> str:
+        with self._lock:
+            work_dir = self._work_dirs.get(agent.id)
+        if work_dir:
+            return work_dir
+
+        work_dir = mesos_client.get_agent(agent.address, "/flags").json()['flags']['work_dir']
+        with self._lock:
+            for agent_id in [agent_id for agent_id in self._work_dirs if agent_id not in self.agents]:
+                del self._work_dirs[agent_id]
+            self._work_dirs[agent.id] = work_dir
+        return work_dir
+
+    def _get_state(self, agent: Agent) -> dict:
+        with self._lock:
+            cached = self._states.get(agent.id)
+        if cached and time.time() - cached[0] <= self._get_state_ttl():
+            return cached[1]
+
+        state = mesos_client.get_agent(agent.address, "/state").json()
+        with self._lock:
+            self._states[agent.id] = (time.time(), state)
+        return state
+
+    def _find_executor_directory(self, agent: Agent, task) -> Optional[str]:
+        state = self._get_state(agent)
+        frameworks = [fwk for fwk in state['frameworks'] if fwk['id'] == task['framework_id']]
+        if not frameworks:
+            return None
+        executor_id = task_executor_id(task)
+        executors = frameworks[0]['executors'] + frameworks[0]['completed_executors']
+        for executor in executors:
+            if executor['id'] == executor_id:
+                return executor['directory']
+        return None
+
+    def resolve(self, task) -> Tuple[Optional[Agent], Optional[str]]:
+        agent = self.agents.get(task['slave_id'])
+        if not agent:
+            return None, None
+
+        container_id = task_container_id(task)
+        if container_id:
+            directory = sandbox_path(self._get_work_dir(agent), agent.id, task['framework_id'],
+                                     task_executor_id(task), container_id)
+        else:
+            directory = self._find_executor_directory(agent, task)
+        return agent, directory
+
+    def clear(self):
+        with self._lock:
+            self._work_dirs = {}
+            self._states = {}
+
+
+sandbox_resolver = SandboxResolver(agents_index)
@@ -0,0 +1,122 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from asgard.sdk.options import get_option
+
+from hollowman import conf
+from hollowman.log import logger
+from hollowman.singleflight import SingleFlight
+from .telnet import send_command
+from .parser import parse_stat_output, parse_mntr_output
+
+ZK_PORT = 2181
+
+COMMAND_PARSERS = {
+    "stat": parse_stat_output,
+    "mntr": parse_mntr_output,
+}
+
+
+def run_command(ip, command) -> dict:
+    """
+    Métricas de um comando (`stat` ou `mntr`) de um ZK server. Nunca levanta exception: se o server
+    não responde dentro dos timeouts, ou responde algo que não são métricas (ex: "This ZooKeeper instance
+    is not currently serving requests", ou o comando não está no `4lw.commands.whitelist`), o erro volta
+    no campo "error".
+    """
+    try:
+        raw_output = send_command(ip, ZK_PORT, command,
+                                  connect_timeout=conf.ASGARD_METRICS_ZK_CONNECT_TIMEOUT,
+                                  read_timeout=conf.ASGARD_METRICS_ZK_READ_TIMEOUT).decode("utf8")
+        metrics = COMMAND_PARSERS[command](raw_output)
+    except (OSError, EOFError, ValueError) as e:
+        logger.error({"action": "zk-command", "state": "error", "zk": ip, "command": command, "error": str(e)})
+        return {"error": str(e) or e.__class__.__name__}
+    if not metrics:
+        return {"error": raw_output.strip() or "empty response"}
+    return metrics
+
+
+def collect_node(myid, ip) -> dict:
+    return {
+        "id": myid,
+        "collected_at": time.time(),
+        "stat": run_command(ip, "stat"),
+        "mntr": run_command(ip, "mntr"),
+    }
+
+
+def node_mode(node) -> Optional[str]:
+    return node["stat"].get("mode") or node["mntr"].get("zk_server_state")
+
+
+class ZKMetricsCollector:
+    """
+    Guarda a última coleta (`stat` e `mntr`) de todos os ZK servers configurados
+    (HOLLOWMAN_METRICS_ZK_ID_<N>). O ID de cada server é <N+1>.
+
+    Por padrão a coleta é feita sob demanda, quando a última tem mais de `max_age` segundos; requests que
+    chegam enquanto uma coleta está em andamento esperam por ela. Com `start_background_collection()` a coleta
+    passa a ser feita também por uma thread, assim os requests apenas leem a última coleta e o custo de cada
+    request não depende de quantos dashboards estão consultando as métricas.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._nodes = []  # type: List[dict]
+        self._inflight_collections = SingleFlight()
+        self._collect_thread = None
+        self.collected_at = None
+
+    def _get_max_age(self):
+        return conf.ASGARD_METRICS_ZK_SNAPSHOT_MAX_AGE if self.max_age is None else self.max_age
+
+    def _is_stale(self) -> bool:
+        return self.collected_at is None or time.time() - self.collected_at > self._get_max_age()
+
+    def _collect(self):
+        zk_ips = get_option("metrics", "zk_id")
+        nodes = []
+        if zk_ips:
+            with ThreadPoolExecutor(max_workers=len(zk_ips)) as executor:
+                nodes = list(executor.map(collect_node, range(1, len(zk_ips) + 1), zk_ips))
+        # Trocamos a lista inteira, assim quem está lendo nunca vê uma coleta pela metade.
+        self._nodes = nodes
+        self.collected_at = time.time()
+
+    def collect(self):
+        self._inflight_collections.do("zk", self._collect)
+
+    def nodes(self) -> List[dict]:
+        if self._is_stale():
+            self.collect()
+        return self._nodes
+
+    def get(self, myid) -> Optional[dict]:
+        for node in self.nodes():
+            if node["id"] == myid:
+                return node
+        return None
+
+    def clear(self):
+        self._nodes = []
+        self.collected_at = None
+
+    def _collect_forever(self, interval):
+        while True:
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error({"action": "zk-metrics-collect", "state": "error", "error": str(e)})
+            time.sleep(interval)
+
+    def start_background_collection(self, interval):
+        if self._collect_thread:
+            return
+        self._collect_thread = threading.Thread(target=self._collect_forever, args=(interval,), daemon=True)
+        self._collect_thread.start()
+
+
+zk_metrics_collector = ZKMetricsCollector()
@@ -49,3 +49,27 @@ def parse_stat_output(raw_output):
             result_dict.update(parsed)
 
     return result_dict
+
+
+def _parse_mntr_value(value):
+    for _type in (int, float):
+        try:
+            return _type(value)
+        except ValueError:
+            continue
+    return value
+
+
+def parse_mntr_output(raw_output):
+    """
+    O `mntr` retorna uma métrica por linha, no formato "<chave>\t<valor>", ex: "zk_server_state\tleader".
+    Os valores numéricos são convertidos para int/float e as chaves são mantidas como o ZK retorna.
+    """
+    result_dict = {}
+    for line in raw_output.split("\n"):
+        if "\t" not in line:
+            continue
+        key, value = line.split("\t", 1)
+        result_dict[key.strip()] = _parse_mntr_value(value.strip())
+
+    return result_dict
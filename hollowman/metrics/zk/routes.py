@@ -1,40 +1,54 @@
-
-import json
-import os
+from hollowman import codec
+import time
 from http import HTTPStatus
 
 from flask import Blueprint, make_response
 
-from .telnet import send_command
-from .parser import parse_stat_output
-
-from asgard.sdk.options import get_option
+from .collector import zk_metrics_collector, node_mode
 
 zk_metrics_blueprint = Blueprint(__name__, __name__)
 
 
+def _age(node) -> float:
+    return round(time.time() - node["collected_at"], 3)
+
+
+def _json_response(data, status=HTTPStatus.OK):
+    response = make_response(codec.dumps(data), status)
+    response.headers['Content-type'] = "application/json"
+    return response
+
+
 @zk_metrics_blueprint.route("/<int:myid>")
 def zk_metrics(myid):
-    ZK_IP = os.getenv("HOLLOWMAN_METRICS_ZK_ID_{}".format(myid - 1))
-    if not ZK_IP:
+    """
+    Métricas do `stat` do ZK server com ID=<myid>, junto com o `mntr` e a idade (em segundos) da coleta.
+    """
+    node = zk_metrics_collector.get(myid)
+    if not node:
         return make_response("{}", HTTPStatus.NOT_FOUND)
 
-    res = parse_stat_output(send_command(ZK_IP, 2181, "stat").decode("utf8"))
-    response = make_response(json.dumps(res), HTTPStatus.OK)
-    response.headers['Content-type'] = "application/json"
-    return response
+    res = dict(node["stat"], mntr=node["mntr"], age=_age(node))
+    status = HTTPStatus.BAD_GATEWAY if "error" in node["stat"] else HTTPStatus.OK
+    return _json_response(res, status)
 
 
-@zk_metrics_blueprint.route("/leader")
-def zk_leader():
-    zk_ips = get_option("metrics", "zk_id")
-    data = []
-    for ip in zk_ips:
-        metrics = parse_stat_output(send_command(ip, 2181, "stat").decode("utf8"))
-        data.append(metrics)
+@zk_metrics_blueprint.route("/all")
+def zk_metrics_all():
+    nodes = zk_metrics_collector.nodes()
+    return _json_response({"nodes": [dict(node, age=_age(node)) for node in nodes]})
 
-    all_modes = [metric.get("mode") == "leader" for metric in data]
-    if any(all_modes):
-        return json.dumps({"leader": all_modes.index(True) + 1})
 
-    return json.dumps({"leader": 0})
+@zk_metrics_blueprint.route("/leader")
+def zk_leader():
+    nodes = zk_metrics_collector.nodes()
+    leader = 0
+    for node in nodes:
+        if node_mode(node) == "leader":
+            leader = node["id"]
+            break
+
+    return codec.dumps({
+        "leader": leader,
+        "nodes": [dict(node["stat"], id=node["id"]) for node in nodes],
+    })
@@ -1,8 +1,31 @@
-
+import socket
+import time
 from telnetlib import Telnet
 
 
-def send_command(host, port, command):
-    conn = Telnet(host.encode("utf8"), port)
-    conn.write(command.encode("utf8"))
-    return conn.read_all()
+def send_command(host, port, command, connect_timeout=None, read_timeout=None):
+    """
+    Envia um comando (ex: "stat") para o ZK e retorna a resposta inteira.
+
+    `read_timeout` é o tempo total para ler a resposta, não o tempo de cada leitura; assim um server
+    que responde aos poucos também não segura o request. Sem timeout a chamada pode esperar para sempre.
+    Se um dos timeouts estoura, `socket.timeout` é levantada.
+    """
+    with Telnet(host.encode("utf8"), port, connect_timeout) as conn:
+        conn.write(command.encode("utf8"))
+        if read_timeout is None:
+            return conn.read_all()
+        return _read_all(conn, time.monotonic() + read_timeout)
+
+
+def _read_all(conn, deadline):
+    data = b""
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("timed out")
+        conn.sock.settimeout(remaining)
+        chunk = conn.read_some()
+        if not chunk:
+            return data
+        data += chunk
@@ -1,17 +1,23 @@
 import abc
-from typing import Optional
+from hollowman import codec
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict
 
 from flask import Response
 from http import HTTPStatus
 
+from marathon import MarathonApp
 from marathon.models import MarathonDeployment
 from werkzeug.utils import cached_property
 
-from hollowman.dispatcher import dispatch, FILTERS_PIPELINE
+from hollowman.dispatcher import dispatch, _dispatch, FILTERS_PIPELINE
+from hollowman.filters.namespace import NameSpaceFilter
+from hollowman.filters.defaultscale import DefaultScaleFilter
 from hollowman.hollowman_flask import HollowmanRequest, FilterType
 from hollowman import upstream, conf, http_wrappers
 from hollowman.hollowman_flask import OperationType
 from hollowman.models import User
+from hollowman.log import logger
 from hollowman.http_wrappers.base import RequestResource
 
 
@@ -64,6 +70,170 @@ class Deployments(RequestHandler):
         return response
 
 
+class BulkScale(RequestHandler):
+    """
+    Faz o scale de várias apps com um único PUT em /v2/apps no Marathon, o que gera apenas um deployment.
+
+    O body do request é uma lista: [{"id": "/app", "instances": N}, ...]
+    Cada app passa pelos filtros de namespace e de default scale e o que vai para o Marathon
+    são apenas os campos que mudaram (id, instances e, se for o caso, labels).
+    """
+    filters_pipeline = (
+        NameSpaceFilter(),
+        DefaultScaleFilter(),
+    )
+
+    def _error_response(self, status, msg, **extra) -> Response:
+        return Response(response=codec.dumps(dict(msg=msg, **extra)), status=status)
+
+    def _validate_scale_data(self, scale_data) -> Optional[str]:
+        if not isinstance(scale_data, list) or not scale_data:
+            return "Body must be a non-empty list of {\"id\": ..., \"instances\": ...}"
+        for item in scale_data:
+            if not isinstance(item, dict) or not isinstance(item.get("id"), str):
+                return "Every item must have an \"id\""
+            instances = item.get("instances")
+            if isinstance(instances, bool) or not isinstance(instances, int) or instances < 0:
+                return "Invalid \"instances\" for app {}".format(item["id"])
+        return None
+
+    def handle(self) -> Response:
+        try:
+            scale_data = self.wrapped_request.request.get_json()
+        except ValueError:
+            return self._error_response(HTTPStatus.BAD_REQUEST, "Invalid JSON")
+
+        error = self._validate_scale_data(scale_data)
+        if error:
+            return self._error_response(HTTPStatus.BAD_REQUEST, error)
+
+        return self.scale(scale_data)
+
+    def scale(self, scale_data: List[Dict]) -> Response:
+        request_apps = [MarathonApp(id=item["id"], instances=item["instances"]) for item in scale_data]
+        original_apps = self.wrapped_request._get_original_apps(self.user, [app.id for app in request_apps])
+
+        not_found = [request_app.id for request_app, original_app in zip(request_apps, original_apps)
+                     if not original_app.version]
+        if not_found:
+            return self._error_response(HTTPStatus.NOT_FOUND, "App not found", apps=not_found)
+
+        return upstream_request(self._build_scale_request(zip(request_apps, original_apps)))
+
+    def _build_scale_request(self, apps) -> HollowmanRequest:
+        """
+        Monta o PUT /v2/apps com todas as apps recebidas. `apps` é uma lista de (request_app, original_app),
+        onde a request_app ainda está sem namespace.
+        """
+        apps_json_repr = []
+        for request_app, original_app in apps:
+            merged_app = self.wrapped_request.merge_marathon_apps(request_app, original_app)
+            if _dispatch(self.wrapped_request, self.filters_pipeline, OperationType.WRITE.value,
+                         merged_app, original_app):
+                apps_json_repr.append(self.wrapped_request._remove_upstream_keys(
+                    self.wrapped_request.diff_marathon_apps(merged_app, original_app)))
+
+        # O /v2/apps do Marathon só aceita JSON, independente do Content-Type do request original.
+        environ = dict(self.wrapped_request.request.environ, REQUEST_METHOD="PUT", CONTENT_TYPE="application/json")
+        request = HollowmanRequest(environ=environ, shallow=True)
+        request.path = self.wrapped_request.app_path_prefix
+        request.data = codec.dumps(apps_json_repr, cls=self.wrapped_request.json_encoder)
+        return request
+
+
+class SuspendNamespace(BulkScale):
+    """
+    Coloca todas as apps do namespace da conta atual com 0 instâncias. O DefaultScaleFilter
+    guarda a quantidade de instâncias de cada app na label `hollowman.default_scale`,
+    que é usada depois pelo ResumeNamespace.
+
+    As apps são enviadas ao Marathon em lotes de ASGARD_BULK_SCALE_BATCH_SIZE apps (um PUT /v2/apps
+    por lote) com no máximo ASGARD_BULK_SCALE_WORKERS lotes sendo enviados ao mesmo tempo.
+    O response (e os logs) trazem o resultado de cada lote.
+    """
+    action = "suspend"
+
+    @cached_property
+    def namespace(self) -> str:
+        return self.user.current_account.namespace
+
+    def _get_namespace_apps(self) -> List[MarathonApp]:
+        namespace_prefix = "/{}/".format(self.namespace)
+        return [app for app in conf.marathon_client.list_apps(app_id=namespace_prefix)
+                if app.id.startswith(namespace_prefix)]
+
+    def _get_request_app(self, original_app) -> Optional[MarathonApp]:
+        if not original_app.instances:
+            return None
+        return MarathonApp(id=self._remove_namespace(original_app.id), instances=0)
+
+    def _remove_namespace(self, app_id: str) -> str:
+        return app_id[len(self.namespace) + 1:]
+
+    def _chunks(self, items: List, size: int) -> List[List]:
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _send_batch(self, batch_number, total_batches, batch, request) -> Dict:
+        response = upstream_request(request)
+        logger.info({"action": self.action,
+                     "namespace": self.namespace,
+                     "batch": batch_number,
+                     "total_batches": total_batches,
+                     "apps": len(batch),
+                     "status_code": response.status_code})
+        try:
+            response_data = codec.loads(response.data)
+        except ValueError:
+            response_data = {}
+        return {
+            "batch": batch_number,
+            "apps": [request_app.id for request_app, _ in batch],
+            "status_code": response.status_code,
+            "deploymentId": response_data.get("deploymentId"),
+        }
+
+    def handle(self) -> Response:
+        apps = []
+        for original_app in self._get_namespace_apps():
+            request_app = self._get_request_app(original_app)
+            if request_app:
+                apps.append((request_app, original_app))
+
+        batches = self._chunks(apps, conf.ASGARD_BULK_SCALE_BATCH_SIZE)
+        # Os requests são montados aqui pois dependem do request atual, que só existe nessa thread.
+        scale_requests = [self._build_scale_request(batch) for batch in batches]
+        results = []
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(conf.ASGARD_BULK_SCALE_WORKERS, len(batches))) as executor:
+                results = list(executor.map(self._send_batch,
+                                            range(1, len(batches) + 1),
+                                            [len(batches)] * len(batches),
+                                            batches,
+                                            scale_requests))
+
+        all_ok = all(result["status_code"] == HTTPStatus.OK for result in results)
+        return Response(response=codec.dumps({"action": self.action, "total_apps": len(apps), "batches": results}),
+                        status=HTTPStatus.OK if all_ok else HTTPStatus.MULTI_STATUS)
+
+
+class ResumeNamespace(SuspendNamespace):
+    """
+    Volta todas as apps do namespace que estão com 0 instâncias para a quantidade
+    guardada na label `hollowman.default_scale`.
+    """
+    action = "resume"
+
+    def _get_request_app(self, original_app) -> Optional[MarathonApp]:
+        default_scale = original_app.labels.get("hollowman.default_scale")
+        if original_app.instances or not default_scale:
+            return None
+        try:
+            instances = int(default_scale)
+        except ValueError:
+            return None
+        return MarathonApp(id=self._remove_namespace(original_app.id), instances=instances)
+
+
 def new(request: http_wrappers.Request) -> Response:
 
     filtered_request = dispatch(user=request.request.user, request=request)
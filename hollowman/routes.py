@@ -1,4 +1,4 @@
-import json
+from hollowman import codec
 import requests
 from flask import url_for, redirect, Response, request, session, \
                   render_template, make_response
@@ -142,7 +142,7 @@ def get_access_token():
 
 @application.route("/v2/plugins")
 def plugins():
-    return make_response(json.dumps(get_plugin_registry_data()), 200)
+    return make_response(codec.dumps(get_plugin_registry_data()), 200)
 
 
 @application.route("/v2/plugins/<string:plugin_id>/main.js")
@@ -151,6 +151,6 @@ def main_js(plugin_id):
 
 @application.route("/plugins")
 def plugins_status():
-    resp = make_response(json.dumps(get_pulgin_load_status_data()), 200)
+    resp = make_response(codec.dumps(get_pulgin_load_status_data()), 200)
     resp.headers["Content-Type"] = "application/json; charset=utf-8"
     return resp
\ No newline at end of file
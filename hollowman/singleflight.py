@@ -0,0 +1,58 @@
+import json
+import threading
+
+
+def request_key(*parts) -> str:
+    """
+    Gera uma chave estável a partir das partes de um request (path, query string, backend, etc).
+    Usada para identificar requests idênticos que estão em andamento.
+    """
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Junta chamadas idênticas que acontecem ao mesmo tempo em uma única execução.
+
+    A primeira thread que chama `do()` com uma chave executa a função; as threads
+    que chamam `do()` com a mesma chave enquanto essa execução está em andamento
+    apenas esperam e recebem o mesmo resultado (ou a mesma exception).
+    Nada é guardado depois que a chamada termina, ou seja, isso *não* é um cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -1,12 +1,17 @@
 # encoding: utf-8
 
 import sys
-import json
+import copy
 
 import requests
+from requests.structures import CaseInsensitiveDict
 
 from hollowman import conf
 from hollowman.log import logger
+from hollowman.singleflight import SingleFlight, request_key
+
+
+_inflight_requests = SingleFlight()
 
 
 def replay_request(request):
@@ -16,20 +21,35 @@ def replay_request(request):
     headers.pop("Content-Length", None)
     headers['Authorization'] = conf.MARATHON_AUTH_HEADER
     method = request.method.lower()
-    if method in ['put', 'post'] and request.is_json:
-        request_data = json.loads(request.data)
-        if isinstance(request_data, list):
-            for data in request_data:
-                _remove_keys(data)
-        else:
-            _remove_keys(request_data)
-        request.data = json.dumps(request_data)
-    upstream_response = _make_request(request.path, method, params=params, headers=headers, data=request.data)
+    data = request.data
+    if isinstance(data, str):
+        # Bodies montados por nós (codec.dumps) são str e podem ter caracteres não-ASCII; o requests
+        # enviaria str em latin-1.
+        data = data.encode("utf-8")
+    upstream_response = _make_request(request.path, method, params=params, headers=headers, data=data)
     upstream_response.headers.pop("Content-Encoding", None)
     upstream_response.headers.pop("Transfer-Encoding", None) # Marathon 1.3.x returns all responses gziped
     return upstream_response
 
 def _make_request(path, method, params=None, headers=None, data=None):
+    """
+    GETs idênticos (mesmo backend, path e query string) que acontecem ao mesmo tempo
+    são feitos apenas uma vez no Marathon. Cada chamador recebe sua própria cópia do response,
+    já que os filtros de response são aplicados depois, individualmente para cada request.
+    """
+    if method != "get" or not conf.ASGARD_UPSTREAM_SINGLEFLIGHT_ENABLED:
+        return _do_make_request(path, method, params=params, headers=headers, data=data)
+
+    key = request_key(conf.MARATHON_LEADER, path, params, (headers or {}).get("Accept"), data)
+    response = _inflight_requests.do(key, _do_make_request, path, method, params=params, headers=headers, data=data)
+    return _copy_response(response)
+
+def _copy_response(response):
+    response_copy = copy.copy(response)
+    response_copy.headers = CaseInsensitiveDict(response.headers)
+    return response_copy
+
+def _do_make_request(path, method, params=None, headers=None, data=None):
     for marathon_backend in [conf.MARATHON_LEADER] + conf.MARATHON_ADDRESSES:
         try:
             url = "{}{}".format(marathon_backend, path)
@@ -42,8 +62,3 @@ def _make_request(path, method, params=None, headers=None, data=None):
             pass
     raise Exception("No Marathon servers found")
 
-def _remove_keys(data):
-    data.pop("version", None)
-    data.pop("fetch", None)
-    data.pop("secrets", None)
-
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
+import json
 import requests
 import sys
 import os
+import time
 
 
 
@@ -21,16 +23,55 @@ ASGARD_AUTH = os.getenv("ASGARD_AUTH_HEADER").split(":")[1].strip()
 task_id = sys.argv[1]
 filelog = "/stdout" if len(sys.argv) < 3 else sys.argv[2]
 
-def get_json(url):
-    return requests.get(url, proxies=proxies, headers={"Authorization": f"{ASGARD_AUTH}"}).json()
+MIN_RETRY_INTERVAL = 1
+MAX_RETRY_INTERVAL = 60
 
 
-offset = get_json(f"{ASGARD_API}/tasks/{task_id}/files/read?path={filelog}&offset=-1&account_id={ASGARD_ACCOUNT_ID}")['offset'] 
-offset -= min(512, offset)
-block_size = 4096
-while True:
-    url = f"{ASGARD_API}/tasks/{task_id}/files/read?path={filelog}&offset={offset}&length={block_size}&account_id={ASGARD_ACCOUNT_ID}"
-    content_jon = get_json(url)
-    if len(content_jon['data']):
-        sys.stdout.write(content_jon['data'])
-        offset += len(content_jon['data'])
+def _retry_after(response, default):
+    try:
+        return max(float(response.headers.get("Retry-After", default)), 0)
+    except ValueError:
+        return default
+
+
+def tail(url, offset):
+    """
+    Lê os eventos (Server-Sent Events) do /tasks/<task-id>/files/tail. Se a conexão cair (ou a API responder
+    429/5xx) reconectamos a partir do último offset recebido, esperando cada vez mais entre as tentativas
+    (respeitando o Retry-After). Outros erros (ex: 404, task não existe mais; 401) encerram o script.
+    """
+    retry_interval = MIN_RETRY_INTERVAL
+    while True:
+        headers = {"Authorization": f"{ASGARD_AUTH}"}
+        if offset is not None:
+            headers["Last-Event-ID"] = str(offset)
+        wait = retry_interval
+        try:
+            response = requests.get(url, proxies=proxies, headers=headers, stream=True)
+            if response.status_code == 429 or response.status_code >= 500:
+                wait = _retry_after(response, retry_interval)
+                sys.stderr.write(f"HTTP {response.status_code}, tentando novamente em {wait}s\n")
+            elif response.status_code >= 400:
+                sys.exit(f"HTTP {response.status_code}: {response.text}")
+            else:
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("id: "):
+                        offset = int(line[4:])
+                        retry_interval = wait = MIN_RETRY_INTERVAL
+                    elif line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: "):
+                        data = json.loads(line[6:])
+                        if event == "end":
+                            if data.get("error"):
+                                sys.exit(data["error"])
+                            return
+                        sys.stdout.write(data['data'])
+                        sys.stdout.flush()
+        except requests.exceptions.RequestException as e:
+            sys.stderr.write(f"{e}, tentando novamente em {wait}s\n")
+        time.sleep(wait)
+        retry_interval = min(retry_interval * 2, MAX_RETRY_INTERVAL)
+
+tail(f"{ASGARD_API}/tasks/{task_id}/files/tail?path={filelog}&backlog=512&account_id={ASGARD_ACCOUNT_ID}", None)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+ Compara o backend stdlib com o orjson (se estiver instalado, apenas em Python 3.8+) usando os JSONs de tests/fixtures.
+ Como usar:
+     python scripts/json-codec-benchmark.py [<repetições>]
+"""
+import os
+import sys
+import glob
+import json
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from marathon.util import MarathonJsonEncoder, MarathonMinimalJsonEncoder
+
+from hollowman import conf, codec
+from hollowman.marathonapp import AsgardApp
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+NUMBER = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+def _load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_PATH, "**", "*.json"), recursive=True)):
+        with open(path, "rb") as fixture_file:
+            fixtures[os.path.relpath(path, FIXTURES_PATH)] = fixture_file.read()
+    return fixtures
+
+
+def _marathon_apps(data):
+    apps = data.get("apps") if isinstance(data, dict) else None
+    if isinstance(apps, list):
+        return [AsgardApp.from_json(app) for app in apps]
+    if isinstance(data, dict) and "app" in data:
+        return [AsgardApp.from_json(data["app"])]
+    return None
+
+
+def _bench(fn):
+    return timeit.timeit(fn, number=NUMBER) / NUMBER * 1000
+
+
+def _run(raw, apps):
+    result = {
+        "loads": _bench(lambda: codec.loads(raw)),
+        "dumps": _bench(lambda: codec.dumps(json.loads(raw))),
+    }
+    if apps:
+        result["dumps_apps"] = _bench(lambda: codec.dumps(apps, cls=MarathonJsonEncoder))
+        result["dumps_apps_minimal"] = _bench(lambda: codec.dumps(apps, cls=MarathonMinimalJsonEncoder))
+    return result
+
+
+def main():
+    if codec.orjson is None:
+        print("orjson não está instalado, apenas o backend stdlib será medido")
+
+    backends = [("stdlib", False)] + ([("orjson", True)] if codec.orjson else [])
+    print(f"{'fixture':<70} {'operação':<20} " + " ".join(f"{name + ' (ms)':>14}" for name, _ in backends))
+    for name, raw in _load_fixtures().items():
+        try:
+            apps = _marathon_apps(json.loads(raw))
+        except Exception:
+            apps = None
+        results = []
+        for _, enabled in backends:
+            conf.ASGARD_FAST_JSON_ENABLED = enabled
+            results.append(_run(raw, apps))
+        for operation in results[0]:
+            print(f"{name:<70} {operation:<20} " + " ".join(f"{result[operation]:>14.4f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 import unittest
 import json
 import jwt
+from unittest.mock import patch
 
 from hollowman.app import application
 from hollowman.models import HollowmanSession, User, Account
@@ -9,6 +10,7 @@ from hollowman.conf import SECRET_KEY
 from hollowman.auth.jwt import jwt_auth, jwt_generate_user_info
 
 from tests import rebuild_schema
+from tests.base import BaseApiTests
 from tests.utils import with_json_fixture
 
 class TestAccountEndpoints(unittest.TestCase):
@@ -143,3 +145,17 @@ class TestAccountEndpoints(unittest.TestCase):
             self.assertEqual(self.user.tx_name, returned_token["user"]["name"])
             self.assertEqual(self.user.accounts[0].id, returned_token["current_account"]["id"])
             self.assertEqual(self.user.accounts[0].name, returned_token["current_account"]["name"])
+
+
+class AccountUsageEndpointTest(BaseApiTests, unittest.TestCase):
+
+    def test_usage_of_current_namespace(self):
+        usage = {"namespace": "dev", "cpus": 1.5, "mem": 512, "disk": 0, "instances": 3, "tasks": 3, "groups": {}}
+        with application.test_client() as client, \
+                patch("hollowman.api.account.namespace_usages") as namespace_usages_mock:
+            namespace_usages_mock.get.return_value = usage
+            response = client.get("/hollow/account/usage", headers=self.auth_header)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual("application/json", response.mimetype)
+            self.assertEqual(usage, json.loads(response.data))
+            namespace_usages_mock.get.assert_called_once_with("dev")
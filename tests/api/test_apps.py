@@ -0,0 +1,327 @@
+import unittest
+import json
+from copy import deepcopy
+from unittest.mock import patch
+from http import HTTPStatus
+
+from responses import RequestsMock
+
+from hollowman import conf
+from hollowman.app import application
+from hollowman.marathon.index import NamespaceIndexes
+
+from tests.base import BaseApiTests
+from tests.utils import with_json_fixture
+
+
+class BulkScaleEndpointTest(BaseApiTests, unittest.TestCase):
+
+    @with_json_fixture("single_full_app.json")
+    def test_scale_many_apps_with_one_upstream_request(self, single_full_app_fixture):
+        """
+        Todas as apps são enviadas em um único PUT /v2/apps, já com namespace e
+        contendo apenas os campos que mudaram.
+        """
+        app_foo = deepcopy(single_full_app_fixture)
+        app_foo["id"] = "/dev/foo"
+        app_foo["instances"] = 2
+        app_bar = deepcopy(single_full_app_fixture)
+        app_bar["id"] = "/dev/bar"
+        app_bar["instances"] = 1
+
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/foo",
+                         body=json.dumps({"app": app_foo}), status=200)
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/bar",
+                         body=json.dumps({"app": app_bar}), status=200)
+                rsps.add(method="PUT", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"deploymentId": "abc", "version": "2017-01-01"}), status=200)
+
+                response = client.put("/hollow/apps/scale", headers=self.auth_header,
+                                      data=json.dumps([{"id": "/foo", "instances": 5},
+                                                       {"id": "/bar", "instances": 0}]))
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual({"deploymentId": "abc", "version": "2017-01-01"}, json.loads(response.data))
+
+                put_calls = [c for c in rsps.calls if c.request.method == "PUT"]
+                self.assertEqual(1, len(put_calls))
+                self.assertEqual("application/json", put_calls[0].request.headers["Content-Type"])
+                upstream_body = json.loads(put_calls[0].request.body)
+                self.assertEqual(2, len(upstream_body))
+                self.assertEqual({"id": "/dev/foo", "instances": 5}, upstream_body[0])
+                self.assertEqual("/dev/bar", upstream_body[1]["id"])
+                self.assertEqual(0, upstream_body[1]["instances"])
+                self.assertEqual("1", upstream_body[1]["labels"]["hollowman.default_scale"])
+
+    def test_scale_returns_404_if_any_app_does_not_exist(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/foo",
+                         body=json.dumps({"message": "App '/dev/foo' does not exist"}), status=404)
+
+                response = client.put("/hollow/apps/scale", headers=self.auth_header,
+                                      data=json.dumps([{"id": "/foo", "instances": 5}]))
+                self.assertEqual(HTTPStatus.NOT_FOUND, response.status_code)
+                self.assertEqual(["/dev/foo"], json.loads(response.data)["apps"])
+
+    def test_scale_returns_400_for_invalid_body(self):
+        with application.test_client() as client:
+            for body in ({"id": "/foo", "instances": 1}, [], [{"id": "/foo"}], [{"id": "/foo", "instances": -1}]):
+                response = client.put("/hollow/apps/scale", headers=self.auth_header, data=json.dumps(body))
+                self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+
+
+class NamespaceSuspendResumeTest(BaseApiTests, unittest.TestCase):
+
+    def _app(self, fixture, app_id, instances, labels=None):
+        app = deepcopy(fixture)
+        app["id"] = app_id
+        app["instances"] = instances
+        app["labels"] = labels or {}
+        return app
+
+    @with_json_fixture("single_full_app.json")
+    def test_suspend_scales_all_namespace_apps_to_zero(self, single_full_app_fixture):
+        apps = [
+            self._app(single_full_app_fixture, "/dev/foo", 3),
+            self._app(single_full_app_fixture, "/dev/bar", 0),
+            self._app(single_full_app_fixture, "/developers/other", 2),
+        ]
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"apps": apps}), status=200)
+                rsps.add(method="PUT", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"deploymentId": "abc", "version": "2017-01-01"}), status=200)
+
+                response = client.post("/hollow/account/suspend", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                response_data = json.loads(response.data)
+                self.assertEqual(1, response_data["total_apps"])
+                self.assertEqual([{"batch": 1, "apps": ["/foo"], "status_code": 200, "deploymentId": "abc"}],
+                                 response_data["batches"])
+
+                self.assertEqual("application/json", rsps.calls[1].request.headers["Content-Type"])
+                upstream_body = json.loads(rsps.calls[1].request.body)
+                self.assertEqual(1, len(upstream_body))
+                self.assertEqual("/dev/foo", upstream_body[0]["id"])
+                self.assertEqual(0, upstream_body[0]["instances"])
+                self.assertEqual("3", upstream_body[0]["labels"]["hollowman.default_scale"])
+
+    @with_json_fixture("single_full_app.json")
+    def test_suspend_sends_apps_in_batches(self, single_full_app_fixture):
+        apps = [self._app(single_full_app_fixture, f"/dev/app{i}", 1) for i in range(5)]
+        with application.test_client() as client, \
+                patch.object(conf, "ASGARD_BULK_SCALE_BATCH_SIZE", 2):
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"apps": apps}), status=200)
+                rsps.add(method="PUT", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"deploymentId": "abc", "version": "2017-01-01"}), status=200)
+
+                response = client.post("/hollow/account/suspend", headers=self.auth_header)
+                response_data = json.loads(response.data)
+                self.assertEqual(5, response_data["total_apps"])
+                self.assertEqual([1, 2, 3], [batch["batch"] for batch in response_data["batches"]])
+                self.assertEqual(["/app4"], response_data["batches"][2]["apps"])
+                put_calls = [c for c in rsps.calls if c.request.method == "PUT"]
+                self.assertEqual(3, len(put_calls))
+                for call in put_calls:
+                    self.assertEqual("application/json", call.request.headers["Content-Type"])
+
+    @with_json_fixture("single_full_app.json")
+    def test_resume_restores_instances_from_default_scale_label(self, single_full_app_fixture):
+        apps = [
+            self._app(single_full_app_fixture, "/dev/foo", 0, {"hollowman.default_scale": "3"}),
+            self._app(single_full_app_fixture, "/dev/bar", 0),
+            self._app(single_full_app_fixture, "/dev/running", 2, {"hollowman.default_scale": "5"}),
+        ]
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"apps": apps}), status=200)
+                rsps.add(method="PUT", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"deploymentId": "abc", "version": "2017-01-01"}), status=200)
+
+                response = client.post("/hollow/account/resume", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual(1, json.loads(response.data)["total_apps"])
+                self.assertEqual("application/json", rsps.calls[1].request.headers["Content-Type"])
+                upstream_body = json.loads(rsps.calls[1].request.body)
+                self.assertEqual([{"id": "/dev/foo", "instances": 3}], upstream_body)
+
+    def test_suspend_empty_namespace_does_not_write_upstream(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"apps": []}), status=200)
+                response = client.post("/hollow/account/suspend", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual({"action": "suspend", "total_apps": 0, "batches": []}, json.loads(response.data))
+
+
+class AppsSearchEndpointTest(BaseApiTests, unittest.TestCase):
+
+    @with_json_fixture("single_full_app.json")
+    def test_search_apps_by_label(self, single_full_app_fixture):
+        foo = deepcopy(single_full_app_fixture)
+        foo["id"] = "/dev/foo"
+        foo["labels"] = {"traefik.frontend": "foo"}
+        bar = deepcopy(single_full_app_fixture)
+        bar["id"] = "/dev/bar"
+        bar["labels"] = {}
+        with application.test_client() as client, \
+                patch("hollowman.api.apps.namespace_indexes", NamespaceIndexes(ttl=30)):
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps",
+                         body=json.dumps({"apps": [foo, bar]}), status=200)
+                response = client.get("/hollow/apps/search?label=traefik.frontend=foo", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual("application/json", response.mimetype)
+                self.assertEqual({"apps": ["/foo"]}, json.loads(response.data))
+
+    def test_search_without_terms_returns_400(self):
+        with application.test_client() as client:
+            response = client.get("/hollow/apps/search", headers=self.auth_header)
+            self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+            self.assertEqual("application/json", response.mimetype)
+
+
+class AppFilesReadEndpointTest(BaseApiTests, unittest.TestCase):
+
+    sandbox_directory = "/tmp/mesos/slaves/S1/frameworks/F/executors/{task_id}/runs/C"
+
+    def setUp(self):
+        super(AppFilesReadEndpointTest, self).setUp()
+        self.task_ids = ["dev_infra_app.1", "dev_infra_app.2", "dev_infra_app.3"]
+        agents = {"dev_infra_app.1": "10.0.0.1:5051", "dev_infra_app.2": "10.0.0.2:5051", "dev_infra_app.3": "10.0.0.3:5051"}
+        self.tasks_data = {
+            f"tasks/{task_id}/data": {
+                "agent_address": agents[task_id],
+                "framework_id": "F",
+                "sandbox_directory": self.sandbox_directory.format(task_id=task_id),
+            } for task_id in self.task_ids
+        }
+        patch("hollowman.api.tasks.cache.get", side_effect=self.tasks_data.get).start()
+
+    def _read_url(self, task_id, offset, length):
+        agent_address = self.tasks_data[f"tasks/{task_id}/data"]["agent_address"]
+        sandbox_directory = self.sandbox_directory.format(task_id=task_id)
+        return f"http://{agent_address}/files/read?path={sandbox_directory}/stdout&offset={offset}&length={length}"
+
+    def _add_app_tasks(self, rsps):
+        rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/infra/app/tasks",
+                 body=json.dumps({"tasks": [{"id": task_id, "appId": "/dev/infra/app"} for task_id in self.task_ids]}),
+                 status=200)
+
+    def test_read_same_file_from_all_app_tasks(self):
+        """
+        Tasks com offset continuam de onde estavam, tasks sem offset começam pelo final do arquivo.
+        Um agent que não responde não impede a leitura das outras tasks.
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_app_tasks(rsps)
+                rsps.add(method="GET", url=self._read_url("dev_infra_app.1", 10, 5),
+                         body=json.dumps({"offset": 10, "data": "hello"}), status=200, match_querystring=True)
+                rsps.add(method="GET", url=self._read_url("dev_infra_app.2", -1, 0),
+                         body=json.dumps({"offset": 100, "data": ""}), status=200, match_querystring=True)
+                rsps.add(method="GET", url=self._read_url("dev_infra_app.2", 95, 5),
+                         body=json.dumps({"offset": 95, "data": "world"}), status=200, match_querystring=True)
+                response = client.get("/hollow/apps/infra/app/files/read?length=5&offset=infra_app.1:10&offset=infra_app.3:7",
+                                      headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                response_data = json.loads(response.data)
+                self.assertEqual("/stdout", response_data["path"])
+                self.assertEqual(["infra_app.1", "infra_app.2", "infra_app.3"],
+                                 [task["task_id"] for task in response_data["tasks"]])
+                self.assertEqual({"task_id": "infra_app.1", "offset": 10, "data": "hello", "error": None},
+                                 response_data["tasks"][0])
+                self.assertEqual({"task_id": "infra_app.2", "offset": 95, "data": "world", "error": None},
+                                 response_data["tasks"][1])
+                self.assertEqual(7, response_data["tasks"][2]["offset"])
+                self.assertIsNotNone(response_data["tasks"][2]["error"])
+                self.assertEqual(["infra_app.1:15", "infra_app.2:100", "infra_app.3:7"], response_data["offsets"])
+
+    def test_read_files_next_offset_counts_bytes(self):
+        """
+        O offset do próximo request é em bytes, mesmo quando os dados têm caracteres multibyte
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_app_tasks(rsps)
+                rsps.add(method="GET", url=self._read_url("dev_infra_app.1", 10, 5),
+                         body=json.dumps({"offset": 10, "data": "ação"}), status=200, match_querystring=True)
+                for task_id in ("dev_infra_app.2", "dev_infra_app.3"):
+                    rsps.add(method="GET", url=self._read_url(task_id, -1, 0), body="", status=404,
+                             match_querystring=True)
+                response = client.get("/hollow/apps/infra/app/files/read?length=5&offset=infra_app.1:10",
+                                      headers=self.auth_header)
+                self.assertEqual("application/json", response.mimetype)
+                self.assertEqual(["infra_app.1:16"], json.loads(response.data)["offsets"])
+
+    def test_read_files_of_app_that_does_not_exist(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/infra/app/tasks",
+                         body=json.dumps({"message": "App '/dev/infra/app' does not exist"}), status=404)
+                response = client.get("/hollow/apps/infra/app/files/read", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.NOT_FOUND, response.status_code)
+
+    def test_read_files_ignores_tasks_outside_the_namespace(self):
+        """
+        Apenas tasks com o prefixo do namespace da conta são lidas
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/infra/app/tasks",
+                         body=json.dumps({"tasks": [{"id": "other_infra_app.1", "appId": "/other/infra/app"}]}),
+                         status=200)
+                response = client.get("/hollow/apps/infra/app/files/read", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual([], json.loads(response.data)["tasks"])
+                self.assertEqual(1, len(rsps.calls))
+
+    def test_read_files_rejects_app_id_outside_the_namespace(self):
+        with application.test_client() as client:
+            for app_id in ("infra/../../other/app", "infra/./app", "infra//app"):
+                response = client.get(f"/hollow/apps/{app_id}/files/read", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code, app_id)
+
+    def test_read_files_with_invalid_offset(self):
+        with application.test_client() as client:
+            response = client.get("/hollow/apps/infra/app/files/read?offset=infra_app.1:abc", headers=self.auth_header)
+            self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+
+    def test_list_files_of_all_app_tasks(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_app_tasks(rsps)
+                for task_id in self.task_ids:
+                    agent_address = self.tasks_data[f"tasks/{task_id}/data"]["agent_address"]
+                    sandbox_directory = self.sandbox_directory.format(task_id=task_id)
+                    rsps.add(method="GET", url=f"http://{agent_address}/files/browse?path={sandbox_directory}",
+                             body=json.dumps([{"path": f"{sandbox_directory}/stdout"}]), status=200,
+                             match_querystring=True)
+                response = client.get("/hollow/apps/infra/app/files", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual("application/json", response.mimetype)
+                self.assertEqual([{"task_id": task_id[len("dev_"):], "files": [{"path": "/stdout"}], "error": None}
+                                  for task_id in self.task_ids], json.loads(response.data)["tasks"])
+
+    def test_list_files_ignores_tasks_outside_the_namespace(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=conf.MARATHON_ADDRESSES[0] + "/v2/apps//dev/infra/app/tasks",
+                         body=json.dumps({"tasks": [{"id": "other_infra_app.1", "appId": "/other/infra/app"}]}),
+                         status=200)
+                response = client.get("/hollow/apps/infra/app/files", headers=self.auth_header)
+                self.assertEqual(HTTPStatus.OK, response.status_code)
+                self.assertEqual({"tasks": []}, json.loads(response.data))
+                self.assertEqual(1, len(rsps.calls))
+
+    def test_list_files_rejects_app_id_outside_the_namespace(self):
+        with application.test_client() as client:
+            response = client.get("/hollow/apps/infra/../../other/app/files", headers=self.auth_header)
+            self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
@@ -1,4 +1,6 @@
 
+import gzip
+import re
 import unittest
 import json
 from http import HTTPStatus
@@ -9,12 +11,24 @@ from hollowman.conf import DEFAULT_MESOS_ADDRESS
 from hollowman.app import application
 from hollowman import cache
 from hollowman import api
+from hollowman.mesos.agents import agents_index
+from hollowman.mesos.sandbox import sandbox_resolver
 
 from tests.base import BaseApiTests
 from tests.utils import with_json_fixture, get_raw_fixture
 
 class TasksEndpointTest(BaseApiTests, unittest.TestCase):
 
+    agent_flags = {"flags": {"work_dir": "/tmp/mesos"}}
+
+    def setUp(self):
+        super(TasksEndpointTest, self).setUp()
+        agents_index.clear()
+        sandbox_resolver.clear()
+
+    def _slaves_json(self, one_slave_json_fixture, slave_id):
+        return {"slaves": [dict(one_slave_json_fixture['slaves'][0], id=slave_id)]}
+
     @unittest.skip("")
     def test_tasks_return_404_for_not_found_task(self):
         self.fail()
@@ -38,13 +52,12 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                          status=200,
                          match_querystring=True)
                 rsps.add(method="GET",
-                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves?slave_id=2084863b-12d1-4319-b515-992eab91a53d-S1",
-                         body=json.dumps(one_slave_json_fixture),
-                         status=200,
-                         match_querystring=True)
+                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves",
+                         body=json.dumps(self._slaves_json(one_slave_json_fixture, "2084863b-12d1-4319-b515-992eab91a53d-S1")),
+                         status=200)
                 rsps.add(method="GET",
-                         url="http://127.0.0.1:5051/state",
-                         body=json.dumps(slave_state_fixture),
+                         url="http://127.0.0.1:5051/flags",
+                         body=json.dumps(self.agent_flags),
                          status=200)
                 rsps.add(method="GET",
                          url=f"http://127.0.0.1:5051/files/browse?path={sandbox_directory}",
@@ -69,7 +82,10 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
         """
             Se tentamos pegar os arquivos de uma task que não está mais rodando, temos que procurá-la
             no array `completed_tasks`.
+            Aqui a task não informa o id do container, então o sandbox é procurado no /state do agent.
         """
+        for status in one_task_json_fixture['tasks'][0]['statuses']:
+            del status['container_status']
         slave_id = "31fcae61-51a9-4ad1-8054-538503eb53a9-S5"
         task_id = "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e"
         sandbox_directory = "/tmp/mesos/slaves/31fcae61-51a9-4ad1-8054-538503eb53a9-S5/frameworks/27b52920-3899-4b90-a1d6-bf83a87f3612-0000/executors/dev_infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e/runs/1ec0d0bf-0f11-49ba-8a03-2cf954ad1cfe"
@@ -81,10 +97,9 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                          status=200,
                          match_querystring=True)
                 rsps.add(method="GET",
-                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves?slave_id={slave_id}",
-                         body=json.dumps(one_slave_json_fixture),
-                         status=200,
-                         match_querystring=True)
+                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves",
+                         body=json.dumps(self._slaves_json(one_slave_json_fixture, slave_id)),
+                         status=200)
                 rsps.add(method="GET",
                          url="http://127.0.0.1:5051/state",
                          body=json.dumps(slave_state_fixture),
@@ -131,13 +146,12 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                          status=200,
                          match_querystring=True)
                 rsps.add(method="GET",
-                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves?slave_id={slave_id}",
-                         body=json.dumps(one_slave_json_fixture),
-                         status=200,
-                         match_querystring=True)
+                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves",
+                         body=json.dumps(self._slaves_json(one_slave_json_fixture, slave_id)),
+                         status=200)
                 rsps.add(method="GET",
-                         url="http://127.0.0.1:5051/state",
-                         body=json.dumps(slave_state_fixture),
+                         url="http://127.0.0.1:5051/flags",
+                         body=json.dumps(self.agent_flags),
                          status=200)
                 rsps.add(method="GET",
                          url=f"http://127.0.0.1:5051/files/read?path={sandbox_directory}/stderr&offset=0&length=42",
@@ -170,13 +184,12 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                          status=200,
                          match_querystring=True)
                 rsps.add(method="GET",
-                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves?slave_id={slave_id}",
-                         body=json.dumps(one_slave_json_fixture),
-                         status=200,
-                         match_querystring=True)
+                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves",
+                         body=json.dumps(self._slaves_json(one_slave_json_fixture, slave_id)),
+                         status=200)
                 rsps.add(method="GET",
-                         url="http://127.0.0.1:5051/state",
-                         body=json.dumps(slave_state_fixture),
+                         url="http://127.0.0.1:5051/flags",
+                         body=json.dumps(self.agent_flags),
                          status=200)
                 download_id = "7094c8e5b131416a87ccdc3e7d3131a6" 
                 with unittest.mock.patch.object(cache, "set") as cache_set_mock, \
@@ -206,13 +219,12 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                          status=200,
                          match_querystring=True)
                 rsps.add(method="GET",
-                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves?slave_id={slave_id}",
-                         body=json.dumps(one_slave_json_fixture),
-                         status=200,
-                         match_querystring=True)
+                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves",
+                         body=json.dumps(self._slaves_json(one_slave_json_fixture, slave_id)),
+                         status=200)
                 rsps.add(method="GET",
-                         url="http://127.0.0.1:5051/state",
-                         body=json.dumps(slave_state_fixture),
+                         url="http://127.0.0.1:5051/flags",
+                         body=json.dumps(self.agent_flags),
                          status=200)
                 rsps.add(method="GET",
                          url=f"http://127.0.0.1:5051/files/read?path={sandbox_directory}/not_found_file&offset=0&length=42",
@@ -223,6 +235,96 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                 resp_data = json.loads(resp.data)
                 self.assertEquals(404, resp.status_code)
 
+    @with_json_fixture("../fixtures/api/tasks/task_file_read_response.json")
+    def test_tasks_read_file_with_task_data_in_cache(self, task_file_read_fixture):
+        """
+        Com o agent e o sandbox da task no cache, não precisamos falar com o Mesos master
+        nem pedir o /state do agent: apenas uma chamada ao agent é feita.
+        """
+        task_id = "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e"
+        sandbox_directory = "/tmp/mesos/slaves/31fcae61-51a9-4ad1-8054-538503eb53a9-S5/frameworks/27b52920-3899-4b90-a1d6-bf83a87f3612-0000/executors/dev_infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e/runs/1ec0d0bf-0f11-49ba-8a03-2cf954ad1cfe"
+        task_data = {
+            'agent_address': "127.0.0.1:5051",
+            'framework_id': "27b52920-3899-4b90-a1d6-bf83a87f3612-0000",
+            'sandbox_directory': sandbox_directory,
+        }
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url=f"http://127.0.0.1:5051/files/read?path={sandbox_directory}/stderr&offset=0&length=42",
+                         body=json.dumps(task_file_read_fixture),
+                         status=200,
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=task_data) as cache_get_mock:
+                    resp = client.get(f"/tasks/{task_id}/files/read?path=/stderr&offset=0&length=42", headers=self.auth_header)
+                    self.assertEquals(200, resp.status_code)
+                    self.assertEqual(1, len(rsps.calls))
+                    cache_get_mock.assert_called_with(f"tasks/{self.user.current_account.namespace}_{task_id}/data")
+
+    @with_json_fixture("../fixtures/api/tasks/task_file_read_response.json")
+    @with_json_fixture("../fixtures/api/tasks/task_info_namespace_dev_task_id_infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e.json")
+    @with_json_fixture("../fixtures/api/tasks/one_slave_json_id_2084863b-12d1-4319-b515-992eab91a53d-S1.json")
+    @with_json_fixture("../fixtures/api/tasks/slave_state_id_2084863b-12d1-4319-b515-992eab91a53d-S1.json")
+    def test_tasks_read_file_populates_task_data_cache(self, task_file_read_fixture, one_task_json_fixture, one_slave_json_fixture, slave_state_fixture):
+        slave_id = "31fcae61-51a9-4ad1-8054-538503eb53a9-S5"
+        task_id = "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e"
+        namespaced_task_id = f"{self.user.current_account.namespace}_{task_id}"
+        sandbox_directory = "/tmp/mesos/slaves/31fcae61-51a9-4ad1-8054-538503eb53a9-S5/frameworks/27b52920-3899-4b90-a1d6-bf83a87f3612-0000/executors/dev_infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e/runs/1ec0d0bf-0f11-49ba-8a03-2cf954ad1cfe"
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url=f"{DEFAULT_MESOS_ADDRESS}/tasks?task_id={namespaced_task_id}",
+                         body=json.dumps(one_task_json_fixture),
+                         status=200,
+                         match_querystring=True)
+                rsps.add(method="GET",
+                         url=f"{DEFAULT_MESOS_ADDRESS}/slaves",
+                         body=json.dumps(self._slaves_json(one_slave_json_fixture, slave_id)),
+                         status=200)
+                rsps.add(method="GET",
+                         url="http://127.0.0.1:5051/flags",
+                         body=json.dumps(self.agent_flags),
+                         status=200)
+                rsps.add(method="GET",
+                         url=f"http://127.0.0.1:5051/files/read?path={sandbox_directory}/stderr&offset=0&length=42",
+                         body=json.dumps(task_file_read_fixture),
+                         status=200,
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "set") as cache_set_mock:
+                    resp = client.get(f"/tasks/{task_id}/files/read?path=/stderr&offset=0&length=42", headers=self.auth_header)
+                    self.assertEquals(200, resp.status_code)
+                    cache_set_mock.assert_called_with(f"tasks/{namespaced_task_id}/data", {
+                        'agent_address': "127.0.0.1:5051",
+                        'framework_id': one_task_json_fixture['tasks'][0]['framework_id'],
+                        'sandbox_directory': sandbox_directory,
+                    }, timeout=300)
+
+    def test_tasks_read_file_not_found_invalidates_task_data_cache(self):
+        """
+        Se o agent não conhece mais o arquivo (ex: a task foi movida ou o sandbox foi removido)
+        removemos a entrada do cache, assim a próxima chamada resolve agent e sandbox novamente.
+        """
+        task_id = "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e"
+        namespaced_task_id = f"{self.user.current_account.namespace}_{task_id}"
+        sandbox_directory = "/tmp/mesos/slaves/31fcae61-51a9-4ad1-8054-538503eb53a9-S5/frameworks/27b52920-3899-4b90-a1d6-bf83a87f3612-0000/executors/dev_infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e/runs/1ec0d0bf-0f11-49ba-8a03-2cf954ad1cfe"
+        task_data = {
+            'agent_address': "127.0.0.1:5051",
+            'framework_id': "27b52920-3899-4b90-a1d6-bf83a87f3612-0000",
+            'sandbox_directory': sandbox_directory,
+        }
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url=f"http://127.0.0.1:5051/files/read?path={sandbox_directory}/stderr&offset=0&length=42",
+                         body="",
+                         status=404,
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=task_data), \
+                        unittest.mock.patch.object(cache, "delete") as cache_delete_mock:
+                    resp = client.get(f"/tasks/{task_id}/files/read?path=/stderr&offset=0&length=42", headers=self.auth_header)
+                    self.assertEquals(404, resp.status_code)
+                    cache_delete_mock.assert_called_once_with(f"tasks/{namespaced_task_id}/data")
+
     def test_download_by_id_expired(self):
         """
         Se o ID não existir mais no cache, retornamos 404
@@ -265,3 +367,420 @@ class TasksEndpointTest(BaseApiTests, unittest.TestCase):
                     self.assertEqual(resp.headers.get("Content-Disposition"), f"attachment; filename={task_id}_stdout.log")
 
 
+
+
+    def _download_cache_data(self):
+        return {
+            'file_url': "http://127.0.0.1:5051/files/download?path=/tmp/mesos/sandbox/stdout",
+            'task_id': "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e",
+            'file_path': "/stdout"
+        }
+
+    def test_download_by_id_passes_range_to_agent(self):
+        """
+        Um download interrompido pode ser retomado com o header Range, o agent responde
+        apenas o pedaço pedido e repassamos o 206 com Content-Range e Content-Length.
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url="http://127.0.0.1:5051/files/download?path=/tmp/mesos/sandbox/stdout",
+                         body="56789",
+                         status=206,
+                         headers={"Content-Range": "bytes 5-9/10", "Content-Length": "5", "Accept-Ranges": "bytes"},
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=self._download_cache_data()), \
+                        unittest.mock.patch.object(cache, "set") as cache_set_mock:
+                    resp = client.get("/tasks/downloads/7094c8e5b131416a87ccdc3e7d3131a6", headers={"Range": "bytes=5-"})
+                    self.assertEqual(HTTPStatus.PARTIAL_CONTENT, resp.status_code)
+                    self.assertEqual(b"56789", resp.data)
+                    self.assertEqual("bytes 5-9/10", resp.headers["Content-Range"])
+                    self.assertEqual("5", resp.headers["Content-Length"])
+                    self.assertEqual("bytes", resp.headers["Accept-Ranges"])
+                    self.assertEqual("bytes=5-", rsps.calls[0].request.headers["Range"])
+                    cache_set_mock.assert_called_once_with("downloads/7094c8e5b131416a87ccdc3e7d3131a6",
+                                                           self._download_cache_data(), timeout=30)
+
+    def test_download_by_id_propagates_content_length(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url="http://127.0.0.1:5051/files/download?path=/tmp/mesos/sandbox/stdout",
+                         body="0123456789",
+                         status=200,
+                         headers={"Content-Length": "10"},
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=self._download_cache_data()):
+                    resp = client.get("/tasks/downloads/7094c8e5b131416a87ccdc3e7d3131a6")
+                    self.assertEqual(HTTPStatus.OK, resp.status_code)
+                    self.assertEqual("10", resp.headers["Content-Length"])
+                    self.assertEqual("identity", rsps.calls[0].request.headers["Accept-Encoding"])
+
+    def test_download_by_id_with_gzip(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url="http://127.0.0.1:5051/files/download?path=/tmp/mesos/sandbox/stdout",
+                         body="0123456789" * 100,
+                         status=200,
+                         headers={"Content-Length": "1000"},
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=self._download_cache_data()), \
+                        unittest.mock.patch.object(api.tasks.conf, "ASGARD_TASK_DOWNLOAD_GZIP_ENABLED", True), \
+                        unittest.mock.patch.object(api.tasks.conf, "ASGARD_TASK_DOWNLOAD_CHUNK_SIZE", 64):
+                    resp = client.get("/tasks/downloads/7094c8e5b131416a87ccdc3e7d3131a6", headers={"Accept-Encoding": "gzip"})
+                    self.assertEqual(HTTPStatus.OK, resp.status_code)
+                    self.assertEqual("gzip", resp.headers["Content-Encoding"])
+                    self.assertNotIn("Content-Length", resp.headers)
+                    self.assertEqual(b"0123456789" * 100, gzip.decompress(resp.data))
+
+    def test_download_by_id_range_not_satisfiable(self):
+        """
+        Um Range fora do arquivo volta como 416 com o Content-Range do agent, para o cliente saber o tamanho
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url="http://127.0.0.1:5051/files/download?path=/tmp/mesos/sandbox/stdout",
+                         body="",
+                         status=416,
+                         headers={"Content-Range": "bytes */10"},
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=self._download_cache_data()):
+                    resp = client.get("/tasks/downloads/7094c8e5b131416a87ccdc3e7d3131a6", headers={"Range": "bytes=20-"})
+                    self.assertEqual(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, resp.status_code)
+                    self.assertEqual("application/json", resp.mimetype)
+                    self.assertEqual("bytes */10", resp.headers["Content-Range"])
+                    self.assertNotIn("Content-Disposition", resp.headers)
+
+    def test_download_by_id_agent_error(self):
+        """
+        Erros do agent não podem virar um arquivo baixado com o corpo do erro
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET",
+                         url="http://127.0.0.1:5051/files/download?path=/tmp/mesos/sandbox/stdout",
+                         body="Internal Server Error",
+                         status=500,
+                         match_querystring=True)
+                with unittest.mock.patch.object(cache, "get", return_value=self._download_cache_data()):
+                    resp = client.get("/tasks/downloads/7094c8e5b131416a87ccdc3e7d3131a6")
+                    self.assertEqual(HTTPStatus.BAD_GATEWAY, resp.status_code)
+                    self.assertEqual("application/json", resp.mimetype)
+                    self.assertEqual({"msg": "Agent returned status 500"}, json.loads(resp.data))
+                    self.assertNotIn("Content-Disposition", resp.headers)
+
+    def test_download_by_id_closes_agent_response(self):
+        """
+        A conexão com o agent é fechada mesmo se o cliente não lê o arquivo inteiro
+        """
+        agent_response = unittest.mock.Mock(status_code=200, headers={},
+                                            **{"iter_content.return_value": iter([b"0123", b"4567"])})
+        with application.test_client() as client, \
+                unittest.mock.patch.object(cache, "get", return_value=self._download_cache_data()), \
+                unittest.mock.patch.object(api.tasks.mesos_client.session, "get", return_value=agent_response):
+            resp = client.get("/tasks/downloads/7094c8e5b131416a87ccdc3e7d3131a6", buffered=False)
+            self.assertEqual(b"0123", next(resp.response))
+            agent_response.close.assert_not_called()
+            resp.close()
+            agent_response.close.assert_called_once_with()
+
+class TasksFileTailEndpointTest(BaseApiTests, unittest.TestCase):
+
+    task_id = "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e"
+    sandbox_directory = "/tmp/mesos/slaves/31fcae61-51a9-4ad1-8054-538503eb53a9-S5/frameworks/27b52920-3899-4b90-a1d6-bf83a87f3612-0000/executors/dev_infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e/runs/1ec0d0bf-0f11-49ba-8a03-2cf954ad1cfe"
+
+    def setUp(self):
+        super(TasksFileTailEndpointTest, self).setUp()
+        api.tasks._tails_per_account.clear()
+        task_data = {
+            'agent_address': "127.0.0.1:5051",
+            'framework_id': "27b52920-3899-4b90-a1d6-bf83a87f3612-0000",
+            'sandbox_directory': self.sandbox_directory,
+        }
+        unittest.mock.patch.object(cache, "get", return_value=task_data).start()
+
+    def _read_url(self, offset, length=65536, path="/stdout"):
+        return f"http://127.0.0.1:5051/files/read?path={self.sandbox_directory}{path}&offset={offset}&length={length}"
+
+    def _events(self, resp):
+        events = []
+        for raw_event in resp.data.decode("utf-8").split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in raw_event.splitlines() if not line.startswith(":"))
+            if fields:
+                events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+        return events
+
+    def test_tail_streams_file_until_it_is_gone(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=self._read_url(0), body=json.dumps({"data": "abc", "offset": 0}),
+                         status=200, match_querystring=True)
+                rsps.add(method="GET", url=self._read_url(3), body="", status=404, match_querystring=True)
+                with unittest.mock.patch.object(cache, "delete") as cache_delete_mock:
+                    resp = client.get(f"/tasks/{self.task_id}/files/tail?offset=0", headers=self.auth_header)
+                    self.assertEqual(200, resp.status_code)
+                    self.assertEqual("text/event-stream", resp.mimetype)
+                    self.assertEqual([("3", "data", {"offset": 0, "data": "abc"}),
+                                      (None, "end", {"offset": 3, "error": None})], self._events(resp))
+                    cache_delete_mock.assert_called_once_with(f"tasks/dev_{self.task_id}/data")
+
+    def test_tail_invalidates_task_data_inside_app_context(self):
+        """
+        O stream é consumido depois que a view retorna. O cache.delete() real (sem mock) precisa do app
+        context; sem ele o stream seria interrompido antes do evento "end".
+        Como o cache está fora do ar nos testes, o delete chega ao redis e apenas loga o erro de conexão.
+        """
+        with application.test_client() as client, \
+                unittest.mock.patch.object(cache, "logger") as cache_logger_mock:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=self._read_url(0), body="", status=404, match_querystring=True)
+                resp = client.get(f"/tasks/{self.task_id}/files/tail?offset=0", headers=self.auth_header)
+                self.assertEqual([(None, "end", {"offset": 0, "error": None})], self._events(resp))
+                cache_logger_mock.error.assert_called_once_with({
+                    "action": "cache-delete", "state": "error", "key": f"tasks/dev_{self.task_id}/data",
+                    "cache-backend": "redis://127.0.0.1:6379/0"})
+
+    def test_tail_event_id_is_a_byte_offset(self):
+        """
+        O Last-Event-ID usado para continuar o tail precisa ser em bytes, mesmo com caracteres multibyte
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=self._read_url(0), body=json.dumps({"data": "ação\n", "offset": 0}),
+                         status=200, match_querystring=True)
+                rsps.add(method="GET", url=self._read_url(7), body="", status=404, match_querystring=True)
+                resp = client.get(f"/tasks/{self.task_id}/files/tail?offset=0", headers=self.auth_header)
+                self.assertEqual([("7", "data", {"offset": 0, "data": "ação\n"}),
+                                  (None, "end", {"offset": 7, "error": None})], self._events(resp))
+
+    def test_tail_without_offset_starts_at_end_of_file_minus_backlog(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=self._read_url(-1, 0), body=json.dumps({"data": "", "offset": 10}),
+                         status=200, match_querystring=True)
+                rsps.add(method="GET", url=self._read_url(8), body="", status=404, match_querystring=True)
+                resp = client.get(f"/tasks/{self.task_id}/files/tail?backlog=2", headers=self.auth_header)
+                self.assertEqual([(None, "end", {"offset": 8, "error": None})], self._events(resp))
+
+    def test_tail_resumes_from_last_event_id(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=self._read_url(42, path="/stderr"), body="", status=404, match_querystring=True)
+                resp = client.get(f"/tasks/{self.task_id}/files/tail?path=/stderr&offset=0",
+                                  headers=dict(self.auth_header, **{"Last-Event-ID": "42"}))
+                self.assertEqual([(None, "end", {"offset": 42, "error": None})], self._events(resp))
+
+    def test_tail_invalid_offset(self):
+        with application.test_client() as client:
+            resp = client.get(f"/tasks/{self.task_id}/files/tail?offset=abc", headers=self.auth_header)
+            self.assertEqual(HTTPStatus.BAD_REQUEST, resp.status_code)
+
+    def test_tail_returns_429_when_account_has_too_many_tails(self):
+        with application.test_client() as client, \
+                unittest.mock.patch.object(api.tasks.conf, "ASGARD_TASK_TAIL_MAX_PER_ACCOUNT", 0):
+            resp = client.get(f"/tasks/{self.task_id}/files/tail", headers=self.auth_header)
+            self.assertEqual(HTTPStatus.TOO_MANY_REQUESTS, resp.status_code)
+
+    def test_tail_releases_account_slot_when_stream_is_closed(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                rsps.add(method="GET", url=self._read_url(0), body="", status=404, match_querystring=True)
+                resp = client.get(f"/tasks/{self.task_id}/files/tail?offset=0", headers=self.auth_header)
+                self.assertEqual(1, api.tasks._tails_per_account[self.account_dev.id])
+                resp.data
+                resp.close()
+                self.assertNotIn(self.account_dev.id, api.tasks._tails_per_account)
+
+
+class TasksFileGrepEndpointTest(BaseApiTests, unittest.TestCase):
+
+    task_id = "infra_mongodb_mongodb1.2580925d-0129-11e8-9a03-6e85ded2ca1e"
+    sandbox_directory = "/tmp/mesos/sandbox"
+    file_content = "starting\nerror: first\nworking\nworking\nERROR: second\ndone\n"
+
+    def setUp(self):
+        super(TasksFileGrepEndpointTest, self).setUp()
+        task_data = {
+            'agent_address': "127.0.0.1:5051",
+            'framework_id': "27b52920-3899-4b90-a1d6-bf83a87f3612-0000",
+            'sandbox_directory': self.sandbox_directory,
+        }
+        unittest.mock.patch.object(cache, "get", return_value=task_data).start()
+        # O google-re2 é opcional; nos testes o `re` da stdlib faz o papel dele (mesma API).
+        unittest.mock.patch.object(api.tasks, "re2", re).start()
+
+    def _add_download(self, rsps, body=None, status=200, headers=None):
+        rsps.add(method="GET",
+                 url=f"http://127.0.0.1:5051/files/download?path={self.sandbox_directory}/stdout",
+                 body=self.file_content if body is None else body,
+                 status=status,
+                 headers=headers or {},
+                 match_querystring=True)
+
+    def test_grep_substring_with_context(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_download(rsps)
+                resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=error&context=1", headers=self.auth_header)
+                self.assertEqual(200, resp.status_code)
+                resp_data = json.loads(resp.data)
+                self.assertEqual([
+                    {"offset": 0, "line": "starting", "match": False},
+                    {"offset": 9, "line": "error: first", "match": True},
+                    {"offset": 22, "line": "working", "match": False},
+                ], resp_data["lines"])
+                self.assertEqual(1, resp_data["matches"])
+                self.assertEqual(len(self.file_content), resp_data["scanned_bytes"])
+                self.assertIsNone(resp_data["truncated"])
+
+    def test_grep_regex_ignore_case(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_download(rsps)
+                resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=^error:&regex=1&ignore_case=1", headers=self.auth_header)
+                resp_data = json.loads(resp.data)
+                self.assertEqual(["error: first", "ERROR: second"], [line["line"] for line in resp_data["lines"]])
+
+    def test_grep_from_offset_asks_agent_for_a_range(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_download(rsps, body=self.file_content[30:], status=206,
+                                   headers={"Content-Range": f"bytes 30-{len(self.file_content) - 1}/{len(self.file_content)}"})
+                resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=ERROR&offset=30", headers=self.auth_header)
+                resp_data = json.loads(resp.data)
+                self.assertEqual("bytes=30-", rsps.calls[0].request.headers["Range"])
+                self.assertEqual([{"offset": 38, "line": "ERROR: second", "match": True}], resp_data["lines"])
+                self.assertEqual(len(self.file_content), resp_data["next_offset"])
+
+    def test_grep_stops_at_byte_budget(self):
+        with application.test_client() as client, \
+                unittest.mock.patch.object(api.tasks.conf, "ASGARD_TASK_GREP_MAX_BYTES", 25):
+            with RequestsMock() as rsps:
+                self._add_download(rsps)
+                resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=error", headers=self.auth_header)
+                resp_data = json.loads(resp.data)
+                self.assertEqual("max_bytes", resp_data["truncated"])
+                self.assertEqual(22, resp_data["next_offset"])
+                self.assertEqual(1, resp_data["matches"])
+
+    def test_grep_file_not_found(self):
+        with application.test_client() as client, \
+                unittest.mock.patch.object(cache, "delete") as cache_delete_mock:
+            with RequestsMock() as rsps:
+                self._add_download(rsps, body="", status=404)
+                resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=error", headers=self.auth_header)
+                self.assertEqual(404, resp.status_code)
+                cache_delete_mock.assert_called_once_with(f"tasks/dev_{self.task_id}/data")
+
+    def test_grep_invalid_parameters(self):
+        with application.test_client() as client:
+            self.assertEqual(400, client.get(f"/tasks/{self.task_id}/files/grep", headers=self.auth_header).status_code)
+            self.assertEqual(400, client.get(f"/tasks/{self.task_id}/files/grep?pattern=(&regex=1",
+                                             headers=self.auth_header).status_code)
+            self.assertEqual(400, client.get(f"/tasks/{self.task_id}/files/grep?pattern=a&context=x",
+                                             headers=self.auth_header).status_code)
+
+    def test_grep_rejects_patterns_that_can_take_too_long(self):
+        """
+        Regex com repetições aninhadas (backtracking exponencial) e patterns muito grandes são recusados
+        antes de qualquer leitura do arquivo.
+        """
+        with application.test_client() as client, \
+                unittest.mock.patch.object(api.tasks.conf, "ASGARD_TASK_GREP_MAX_PATTERN_LENGTH", 10):
+            for params in ({"pattern": "(a+)+$", "regex": "1"},
+                           {"pattern": r"(\w+\s?)*$", "regex": "1"},
+                           {"pattern": "(a|a)*b", "regex": "1"},
+                           {"pattern": "(a|aa)+$", "regex": "1"},
+                           {"pattern": "(.*,){12}x", "regex": "1"},
+                           {"pattern": "a" * 11}):
+                resp = client.get(f"/tasks/{self.task_id}/files/grep", query_string=params, headers=self.auth_header)
+                self.assertEqual(400, resp.status_code, params)
+                self.assertIn("msg", json.loads(resp.data))
+
+    def test_grep_accepts_repetitions_that_are_not_ambiguous(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_download(rsps)
+                resp = client.get(f"/tasks/{self.task_id}/files/grep", headers=self.auth_header,
+                                  query_string={"pattern": r"^(error|ERROR): \w+$", "regex": "1"})
+                self.assertEqual(200, resp.status_code)
+                self.assertEqual(["error: first", "ERROR: second"], [line["line"] for line in json.loads(resp.data)["lines"]])
+
+    def test_grep_regex_without_re2(self):
+        """
+        Sem o google-re2 só a busca por substring está disponível
+        """
+        with application.test_client() as client, \
+                unittest.mock.patch.object(api.tasks, "re2", None):
+            resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=error&regex=1", headers=self.auth_header)
+            self.assertEqual(400, resp.status_code)
+            self.assertIn("msg", json.loads(resp.data))
+            with RequestsMock() as rsps:
+                self._add_download(rsps)
+                resp = client.get(f"/tasks/{self.task_id}/files/grep?pattern=error", headers=self.auth_header)
+                self.assertEqual(200, resp.status_code)
+
+
+class TasksFilesBatchEndpointTest(BaseApiTests, unittest.TestCase):
+
+    def setUp(self):
+        super(TasksFilesBatchEndpointTest, self).setUp()
+        self.tasks_data = {
+            "tasks/dev_app.1/data": {"agent_address": "10.0.0.1:5051", "framework_id": "F", "sandbox_directory": "/sandbox/app.1"},
+            "tasks/dev_app.2/data": {"agent_address": "10.0.0.1:5051", "framework_id": "F", "sandbox_directory": "/sandbox/app.2"},
+            "tasks/dev_app.3/data": {"agent_address": "10.0.0.2:5051", "framework_id": "F", "sandbox_directory": "/sandbox/app.3"},
+        }
+        unittest.mock.patch.object(cache, "get", side_effect=self.tasks_data.get).start()
+
+    def _add_browse(self, rsps, agent_address, sandbox_directory, status=200):
+        rsps.add(method="GET",
+                 url=f"http://{agent_address}/files/browse?path={sandbox_directory}",
+                 body=json.dumps([{"path": f"{sandbox_directory}/stdout", "size": 10}]) if status == 200 else "",
+                 status=status,
+                 match_querystring=True)
+
+    def test_list_files_of_many_tasks(self):
+        """
+        Cada task vem com seus arquivos ou com o erro que aconteceu com ela.
+        """
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_browse(rsps, "10.0.0.1:5051", "/sandbox/app.1")
+                self._add_browse(rsps, "10.0.0.1:5051", "/sandbox/app.2", status=404)
+                self._add_browse(rsps, "10.0.0.2:5051", "/sandbox/app.3")
+                rsps.add(method="GET",
+                         url=f"{DEFAULT_MESOS_ADDRESS}/tasks?task_id=dev_app.4",
+                         body=json.dumps({"tasks": []}),
+                         status=200,
+                         match_querystring=True)
+                resp = client.get("/tasks/files?task_id=app.1&task_id=app.2&task_id=app.3&task_id=app.4",
+                                  headers=self.auth_header)
+                self.assertEqual(200, resp.status_code)
+                self.assertEqual([
+                    {"task_id": "app.1", "files": [{"path": "/stdout", "size": 10}], "error": None},
+                    {"task_id": "app.2", "files": [], "error": "Sandbox not found"},
+                    {"task_id": "app.3", "files": [{"path": "/stdout", "size": 10}], "error": None},
+                    {"task_id": "app.4", "files": [], "error": "Task not found"},
+                ], json.loads(resp.data)["tasks"])
+
+    def test_list_files_with_unreachable_agent(self):
+        with application.test_client() as client:
+            with RequestsMock() as rsps:
+                self._add_browse(rsps, "10.0.0.1:5051", "/sandbox/app.1")
+                resp = client.get("/tasks/files?task_id=app.1&task_id=app.3", headers=self.auth_header)
+                tasks = json.loads(resp.data)["tasks"]
+                self.assertIsNone(tasks[0]["error"])
+                self.assertEqual("app.3", tasks[1]["task_id"])
+                self.assertIsNotNone(tasks[1]["error"])
+
+    def test_list_files_without_task_ids(self):
+        with application.test_client() as client:
+            resp = client.get("/tasks/files", headers=self.auth_header)
+            self.assertEqual(HTTPStatus.BAD_REQUEST, resp.status_code)
+
+    def test_list_tasks_files_ignores_tasks_of_other_namespaces(self):
+        with RequestsMock() as rsps:
+            self.assertEqual([], api.tasks.list_tasks_files(["other_app.1", "devx_app.1"], "dev"))
+            self.assertEqual(0, len(rsps.calls))
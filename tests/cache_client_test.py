@@ -50,3 +50,17 @@ class CacheWrapperTest(unittest.TestCase):
             self.assertTrue(cache.set("my-key", "my-value", timeout=30))
             cache_backend_mock.set.assert_called_with("my-key", "my-value", timeout=30)
 
+
+    def test_delete_with_offline_cache_returns_False(self):
+        self.assertFalse(cache.delete("my-key"))
+
+    def test_delete_with_offline_cache_check_logger(self):
+        self.assertFalse(cache.delete("my-key"))
+        self.assertEqual(self.logger_mock.error.call_count, 1)
+        self.logger_mock.error.assert_called_with({"action": "cache-delete", "state": "error", "key": "my-key", "cache-backend": "redis://127.0.0.1:6379/0"})
+
+    def test_delete_calls_backend_delete_method(self):
+        with mock.patch.object(cache, '__cache_backend') as cache_backend_mock:
+            cache_backend_mock.delete.return_value = True
+            self.assertTrue(cache.delete("my-key"))
+            cache_backend_mock.delete.assert_called_with("my-key")
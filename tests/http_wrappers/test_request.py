@@ -1,6 +1,6 @@
 import json
 from unittest import TestCase, skip
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, call
 import responses
 from copy import deepcopy
 
@@ -30,41 +30,70 @@ class SplitTests(TestCase):
         responses.stop()
 
     # todo: debater nome request_app e app <- app fica ambíguo
-    @with_json_fixture('single_full_app.json')
-    def test_a_read_single_app_request_returns_a_single_marathonapp_if_app_exists(self, fixture):
+    def test_a_read_single_app_request_does_not_fetch_original_app(self):
+        """
+        Requests de leitura não passam por nenhum filtro de request, então
+        não precisamos buscar a app original no upstream.
+        """
         with application.test_request_context('/v2/apps//foo',
                                               method='GET', data=b'') as ctx:
             ctx.request.user = self.user
             request_parser = Request(ctx.request)
 
             with patch.object(request_parser, 'marathon_client') as client:
-                original_app = MarathonApp.from_json(fixture)
-                client.get_app.return_value = original_app
                 apps = list(request_parser.split())
+                self.assertFalse(client.get_app.called)
 
-            self.assertEqual(
-                apps,
-                [
-                    (request_parser.merge_marathon_apps(MarathonApp(), original_app), client.get_app.return_value)
-                ])
+            self.assertEqual([], apps)
 
-    @with_json_fixture('requests/get-v2apps-all-apps.json')
-    def test_a_request_with_n_apps_returns_n_marathonapps(self, fixture):
+    def test_a_read_list_apps_request_does_not_fetch_original_apps(self):
         with application.test_request_context('/v2/apps/', method='GET') as ctx:
             ctx.request.user = self.user
             request_parser = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET',
-                         url=conf.MARATHON_ADDRESSES[0] + '/v2/apps',
-                         body=json.dumps(fixture),
-                         status=200)
+            with patch.object(request_parser, 'marathon_client') as client:
                 apps = list(request_parser.split())
+                self.assertFalse(client.list_apps.called)
 
-                self.assertEqual([request_app for request_app, _ in apps],
-                                 [request_parser.merge_marathon_apps(request_app, original_app) for request_app, original_app in apps])
+            self.assertEqual([], apps)
 
-                self.assertEqual([app.id for app, _ in apps],
-                                 [app['id'] for app in fixture['apps']])
+    @with_json_fixture('requests/put-multi-app.json')
+    def test_a_write_request_with_n_apps_fetches_all_original_apps_keeping_order(self, fixture):
+        fixture = fixture + [{"id": "/other-app", "instances": 1}]
+        with application.test_request_context('/v2/apps/',
+                                              method='PUT',
+                                              data=json.dumps(fixture)) as ctx:
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.side_effect = lambda app_id: MarathonApp(id=app_id, instances=0)
+                apps = list(request_parser.split())
+
+                self.assertCountEqual([call("/dev" + app["id"]) for app in fixture], client.get_app.call_args_list)
+
+            self.assertEqual(["/dev" + app["id"] for app in fixture],
+                             [original_app.id for _, original_app in apps])
+            self.assertEqual([app["id"] for app in fixture],
+                             [request_app.id for request_app, _ in apps])
+
+    @with_json_fixture('single_full_app.json')
+    def test_a_write_request_with_n_apps_merges_removable_keys_of_each_app(self, fixture):
+        """
+        Cada app de um PUT em /v2/apps usa as suas próprias REMOVABLE_KEYS no merge.
+        Aqui a primeira app limpa as labels e a segunda não mexe nelas.
+        """
+        request_data = [{"id": "/foo", "labels": {}}, {"id": "/bar", "instances": 2}]
+        with application.test_request_context('/v2/apps/',
+                                              method='PUT',
+                                              data=json.dumps(request_data)) as ctx:
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.side_effect = lambda app_id: MarathonApp.from_json(dict(deepcopy(fixture), id=app_id))
+                apps = list(request_parser.split())
+
+            self.assertEqual({}, apps[0][0].labels)
+            self.assertEqual(fixture['labels'], apps[1][0].labels)
+            self.assertEqual(2, apps[1][0].instances)
 
     @with_json_fixture('single_full_app.json')
     def test_a_request_for_a_new_app_will_return_a_tuple_with_an_empty_marathonapp(self, fixture):
@@ -141,71 +170,17 @@ class SplitTests(TestCase):
                 expected_app = (request_parser.merge_marathon_apps(MarathonApp.from_json(request_data), original_app), original_app)
                 self.assertEqual(apps, [expected_app])
 
-    @with_json_fixture("single_full_app.json")
-    def test_can_read_app_if_already_migrated(self, single_full_app_fixture):
-        """
-        Conferimos que é possível fazer um GET em
-        /v2/apps/<app-id> para uma app que já está migrada.
-        O <app-id> usado é sempre *sem* namespace
-        """
-        request_data = deepcopy(single_full_app_fixture)
-        single_full_app_fixture['id'] = '/dev/foo'
-        with application.test_request_context('/v2/apps/foo', method='GET') as ctx:
-            ctx.request.user = self.user
-            request_parser = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/apps//dev/foo',
-                         body=json.dumps({'app': single_full_app_fixture}), status=200)
-
-                apps = list(request_parser.split())
-
-                original_app = MarathonApp.from_json(single_full_app_fixture)
-                expected_app = (request_parser.merge_marathon_apps(MarathonApp(), original_app), original_app)
-                self.assertEqual(apps, [expected_app])
-
-    @with_json_fixture("../fixtures/group_dev_namespace_with_apps.json")
-    def test_split_groups_read_on_root_group(self, group_dev_namespace_fixture):
-
-        with application.test_request_context('/v2/groups', method='GET') as ctx:
-            ctx.request.user = self.user
-            request_parser = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/groups//dev/',
-                         body=json.dumps(group_dev_namespace_fixture), status=200)
-
-                apps = list(request_parser.split())
-                self.assertEqual(3, len(apps))
-
-                original_app_one = MarathonApp.from_json({"id": "/dev/a/app0"})
-                original_app_two = MarathonApp.from_json({"id": "/dev/group-b/appb0"})
-                original_app_three = MarathonApp.from_json({"id": "/dev/group-b/group-b0/app0"})
-                expected_apps = [
-                    (request_parser.merge_marathon_apps(MarathonApp(), original_app_one), original_app_one),
-                    (request_parser.merge_marathon_apps(MarathonApp(), original_app_two), original_app_two),
-                    (request_parser.merge_marathon_apps(MarathonApp(), original_app_three), original_app_three),
-                ]
-                self.assertEqual(apps, expected_apps)
-
-    @with_json_fixture("../fixtures/group-b_dev_namespace_with_apps.json")
-    def test_split_groups_read_on_specific_group(self, group_b_fixture):
 
+    def test_split_groups_read_does_not_fetch_original_group(self):
         with application.test_request_context('/v2/groups/group-b', method='GET') as ctx:
             ctx.request.user = self.user
             request_parser = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/groups//dev/group-b',
-                         body=json.dumps(group_b_fixture), status=200)
-
+            with patch.object(request_parser, 'marathon_client') as client:
                 apps = list(request_parser.split())
-                self.assertEqual(2, len(apps))
+                self.assertFalse(client.get_group.called)
+
+            self.assertEqual([], apps)
 
-                original_app_one = MarathonApp.from_json({"id": "/dev/group-b/appb0"})
-                original_app_two = MarathonApp.from_json({"id": "/dev/group-b/group-b0/app0"})
-                expected_apps = [
-                    (request_parser.merge_marathon_apps(MarathonApp(), original_app_one), original_app_one),
-                    (request_parser.merge_marathon_apps(MarathonApp(), original_app_two), original_app_two),
-                ]
-                self.assertEqual(expected_apps, apps)
 
     @skip("Temos que pensar sobre esse method no grupo")
     def test_split_groups_write_PUT_on_group(self):
@@ -247,19 +222,6 @@ class SplitTests(TestCase):
                 ]
                 self.assertEqual(expected_apps, apps)
 
-    @with_json_fixture("non_root_group_empty.json")
-    def test_split_group_nonroot_empty_group(self, non_root_group_empty_fixture):
-        with application.test_request_context('/v2/groups/group-c', method='GET') as ctx:
-            ctx.request.user = self.user
-            request_parser = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/groups//dev/group-c',
-                         body=json.dumps(non_root_group_empty_fixture), status=200)
-
-                apps = list(request_parser.split())
-                self.assertEqual(0, len(apps))
-
-                self.assertEqual([], apps)
 
     def test_split_queue_should_return_empty_iterator(self):
         with application.test_request_context('/v2/queue', method='GET') as ctx:
@@ -411,58 +373,64 @@ class JoinTests(TestCase):
                 self.assertIsInstance(request, HollowmanRequest)
                 self.assertEqual("/v2/apps/dev/foo", request.path)
 
-    @with_json_fixture("../fixtures/group_dev_namespace_with_apps.json")
-    def test_join_group_read_root_group(self, group_dev_namespace_fixture):
+    def test_join_group_read_root_group(self):
         with application.test_request_context('/v2/groups', method='GET') as ctx:
             ctx.request.user = self.user
             request = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/groups//dev/',
-                         body=json.dumps(group_dev_namespace_fixture), status=200)
-
-                apps = list(request.split())
-                joined_request = request.join(apps)
-                self.assertEqual("/v2/groups/dev", joined_request.path)
-                self.assertEqual(b"", joined_request.data)
+            joined_request = request.join(list(request.split()))
+            self.assertEqual("/v2/groups/dev", joined_request.path)
+            self.assertEqual(b"", joined_request.data)
 
     def test_join_apps_read_empty_list(self):
         with application.test_request_context('/v2/apps', method='GET') as ctx:
             ctx.request.user = self.user
             request = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/apps', status=200, body='''{"apps":[]}''')
-                apps = list(request.split())
-                joined_request = request.join(apps)
-                self.assertEqual("/v2/apps", joined_request.path)
-                self.assertEqual(b"", joined_request.data)
-
-    @with_json_fixture("../fixtures/group-b_dev_namespace_with_apps.json")
-    def test_join_group_read_non_root_group(self, group_b_fixture):
+            joined_request = request.join(list(request.split()))
+            self.assertEqual("/v2/apps", joined_request.path)
+            self.assertEqual(b"", joined_request.data)
+
+    def test_join_apps_read_asks_upstream_only_for_current_namespace(self):
+        """
+        Um GET em /v2/apps deve pedir ao Marathon apenas as apps do namespace
+        da conta atual, e não todas as apps do cluster.
+        """
+        with application.test_request_context('/v2/apps', method='GET') as ctx:
+            ctx.request.user = self.user
+            request = Request(ctx.request)
+            joined_request = request.join(list(request.split()))
+            self.assertEqual("/v2/apps", joined_request.path)
+            self.assertEqual("/dev/", joined_request.args["id"])
+
+    def test_join_apps_read_keeps_id_filter_from_original_request(self):
+        with application.test_request_context('/v2/apps?id=foo&embed=apps.tasks', method='GET') as ctx:
+            ctx.request.user = self.user
+            request = Request(ctx.request)
+            joined_request = request.join([])
+            self.assertEqual("foo", joined_request.args["id"])
+            self.assertEqual("apps.tasks", joined_request.args["embed"])
+
+    def test_join_group_read_non_root_group(self):
         with application.test_request_context('/v2/groups/group-b', method='GET') as ctx:
             ctx.request.user = self.user
             request = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/groups//dev/group-b',
-                         body=json.dumps(group_b_fixture), status=200)
+            joined_request = request.join(list(request.split()))
+            self.assertEqual("/v2/groups/dev/group-b", joined_request.path)
+            self.assertEqual(b"", joined_request.data)
 
-                apps = list(request.split())
-                joined_request = request.join(apps)
-                self.assertEqual("/v2/groups/dev/group-b", joined_request.path)
-                self.assertEqual(b"", joined_request.data)
+    def test_join_group_read_versions(self):
+        with application.test_request_context('/v2/groups/group-b/versions', method='GET') as ctx:
+            ctx.request.user = self.user
+            request = Request(ctx.request)
+            joined_request = request.join(list(request.split()))
+            self.assertEqual("/v2/groups/dev/group-b/versions", joined_request.path)
 
-    @with_json_fixture("../fixtures/non_root_group_empty.json")
-    def test_join_group_read_non_root_empty_group(self, non_root_group_empty_fixture):
-        with application.test_request_context('/v2/groups/group-c', method='GET') as ctx:
+    def test_join_app_read_versions(self):
+        with application.test_request_context('/v2/apps//foo/versions/2017-10-31T13:01:07.768Z', method='GET') as ctx:
             ctx.request.user = self.user
             request = Request(ctx.request)
-            with RequestsMock() as rsps:
-                rsps.add(method='GET', url=conf.MARATHON_ADDRESSES[0] + '/v2/groups//dev/group-c',
-                         body=json.dumps(non_root_group_empty_fixture), status=200)
+            joined_request = request.join(list(request.split()))
+            self.assertEqual("/v2/apps/dev/foo/versions/2017-10-31T13:01:07.768Z", joined_request.path)
 
-                apps = list(request.split())
-                joined_request = request.join(apps)
-                self.assertEqual("/v2/groups/dev/group-c", joined_request.path)
-                self.assertEqual(b"", joined_request.data)
 
     @skip("Decidir como implementar PUT em /v2/groups")
     def test_join_group_write_PUT_request(self):
@@ -496,6 +464,124 @@ class JoinTests(TestCase):
             self.assertFalse(isinstance(joined_request_data, list), "Body não deveria ser uma lista")
             self.assertEqual("/foo", joined_request_data['id'])
 
+    @with_json_fixture("single_full_app.json")
+    def test_join_removes_keys_not_accepted_by_upstream(self, fixture):
+        """
+        We must remove these keys:
+            * version
+            * fetch
+            * secrets
+        When GETting an app, Marathon returns a JSON with these keys, but refuses to
+        accept a PUT/POST on this same app if these keys are present.
+        """
+        fixture['version'] = "2018-01-01T00:00:00.000Z"
+        with application.test_request_context('/v2/apps//foo',
+                                              method='PUT',
+                                              data=json.dumps(fixture)) as ctx:
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.return_value = MarathonApp.from_json(fixture)
+                apps = list(request_parser.split())
+
+                joined_request_data = json.loads(request_parser.join(apps).data)
+                self.assertFalse('version' in joined_request_data)
+                self.assertFalse('fetch' in joined_request_data)
+                self.assertFalse('secrets' in joined_request_data)
+
+    @with_json_fixture("single_full_app.json")
+    def test_join_removes_keys_not_accepted_by_upstream_request_data_is_a_list(self, fixture):
+        """
+        A API aceita uma lista se o request for um PUT em /v2/apps.
+        Cada uma das apps da lista deve ter as keys removidas.
+        """
+        fixture['version'] = "2018-01-01T00:00:00.000Z"
+        with application.test_request_context('/v2/apps/',
+                                              method='PUT',
+                                              data=json.dumps([fixture])) as ctx:
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            apps = [(MarathonApp.from_json(fixture), MarathonApp.from_json(fixture))]
+
+            joined_request_data = json.loads(request_parser.join(apps).data)
+            self.assertEqual(1, len(joined_request_data))
+            self.assertFalse('version' in joined_request_data[0])
+            self.assertFalse('fetch' in joined_request_data[0])
+            self.assertFalse('secrets' in joined_request_data[0])
+
+    @with_json_fixture("single_full_app.json")
+    def test_join_sends_only_changed_fields_if_write_diff_is_enabled(self, fixture):
+        """
+        Com o ASGARD_WRITE_DIFF_ENABLED ligado, um scale de uma app que já existe
+        envia ao Marathon apenas o id e o campo que mudou.
+        """
+        fixture['version'] = "2018-01-01T00:00:00.000Z"
+        with application.test_request_context('/v2/apps//foo',
+                                              method='PUT',
+                                              data=json.dumps({"instances": 10})) as ctx, \
+                patch.object(conf, "ASGARD_WRITE_DIFF_ENABLED", True):
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.return_value = MarathonApp.from_json(fixture)
+                apps = list(request_parser.split())
+
+                joined_request_data = json.loads(request_parser.join(apps).data)
+                self.assertEqual({"id": "/foo", "instances": 10}, joined_request_data)
+
+    @with_json_fixture("single_full_app.json")
+    def test_join_sends_only_changed_fields_of_each_app_if_write_diff_is_enabled(self, fixture):
+        fixture['version'] = "2018-01-01T00:00:00.000Z"
+        with application.test_request_context('/v2/apps/',
+                                              method='PUT',
+                                              data=json.dumps([{"id": "/foo", "instances": 10}])) as ctx, \
+                patch.object(conf, "ASGARD_WRITE_DIFF_ENABLED", True):
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.return_value = MarathonApp.from_json(fixture)
+                apps = list(request_parser.split())
+
+                joined_request_data = json.loads(request_parser.join(apps).data)
+                self.assertEqual([{"id": "/foo", "instances": 10}], joined_request_data)
+
+    @with_json_fixture("single_full_app.json")
+    def test_join_sends_full_app_for_new_apps_even_if_write_diff_is_enabled(self, fixture):
+        """
+        Uma app que ainda não existe no Marathon não tem com o que ser comparada,
+        então o body continua sendo a app completa.
+        """
+        with application.test_request_context('/v2/apps//foo',
+                                              method='PUT',
+                                              data=json.dumps(fixture)) as ctx, \
+                patch.object(conf, "ASGARD_WRITE_DIFF_ENABLED", True):
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.return_value = MarathonApp.from_json({"id": "/dev/foo"})
+                apps = list(request_parser.split())
+
+                joined_request_data = json.loads(request_parser.join(apps).data)
+                self.assertEqual(fixture['cmd'], joined_request_data['cmd'])
+                self.assertEqual(fixture['mem'], joined_request_data['mem'])
+
+    @with_json_fixture("single_full_app.json")
+    def test_join_sends_full_app_if_write_diff_is_disabled(self, fixture):
+        fixture['version'] = "2018-01-01T00:00:00.000Z"
+        with application.test_request_context('/v2/apps//foo',
+                                              method='PUT',
+                                              data=json.dumps({"instances": 10})) as ctx, \
+                patch.object(conf, "ASGARD_WRITE_DIFF_ENABLED", False):
+            ctx.request.user = self.user
+            request_parser = Request(ctx.request)
+            with patch.object(request_parser, 'marathon_client') as client:
+                client.get_app.return_value = MarathonApp.from_json(fixture)
+                apps = list(request_parser.split())
+
+                joined_request_data = json.loads(request_parser.join(apps).data)
+                self.assertEqual(10, joined_request_data['instances'])
+                self.assertEqual(fixture['cmd'], joined_request_data['cmd'])
+
     def test_join_v2_groups_on_DELETE_method(self):
         """
         O request de DELETE tem o corpo vazio. Isso significa que o split()
@@ -659,10 +745,14 @@ class RequestWrapperTest(TestCase):
             self.assertEqual("/v2/groups/dev/my-group", request_wrapper.request.path)
 
     def test_adjust_groups_versions_request_path(self):
+        """
+        O "versions" do path não faz parte do id do grupo, então ele deve ser mantido
+        mesmo quando o grupo é o root do namespace.
+        """
         with application.test_request_context('/v2/groups/versions',
                                               method='GET') as ctx:
             request_wrapper = Request(ctx.request)
-            original_app = MarathonGroup(id="/dev/versions")
+            original_app = MarathonGroup(id="/dev/")
             request_wrapper._adjust_request_path_if_needed(request_wrapper.request, original_app)
             self.assertEqual("/v2/groups/dev/versions", request_wrapper.request.path)
 
@@ -324,6 +324,78 @@ class JoinTests(unittest.TestCase):
             self.assertDictEqual(json.loads(joined_response.data),
                                  {'apps': expected_response})
 
+    @with_json_fixture('single_full_app.json')
+    def test_join_list_apps_streams_response_body(self, fixture):
+        with application.test_request_context('/v2/apps/', method='GET') as ctx:
+            upstream_response = FlaskResponse(response=json.dumps({"apps": [fixture]}), status=HTTPStatus.OK)
+            response = Response(ctx.request, upstream_response)
+            apps = [(AsgardApp.from_json(deepcopy(fixture)), AsgardApp.from_json(deepcopy(fixture)))]
+
+            with patch.object(conf, "ASGARD_STREAMING_RESPONSE_ENABLED", True):
+                joined_response = response.join(apps)
+                self.assertTrue(joined_response.is_streamed)
+                self.assertTrue("Content-Length" not in joined_response.headers)
+                self.assertEqual({"apps": [fixture]}, json.loads(joined_response.get_data()))
+
+            with patch.object(conf, "ASGARD_STREAMING_RESPONSE_ENABLED", False):
+                joined_response = response.join(apps)
+                self.assertFalse(joined_response.is_streamed)
+                self.assertEqual({"apps": [fixture]}, json.loads(joined_response.data))
+
+    @with_json_fixture('single_full_app.json')
+    def test_join_list_apps_paginates_with_limit_and_cursor(self, fixture):
+        """
+        Com ?limit=N as apps são ordenadas pelo id e o response traz o `nextCursor`, que
+        é usado no ?cursor= para buscar a próxima página.
+        """
+        apps = []
+        for app_id in ("/c", "/a", "/d", "/b"):
+            app = deepcopy(fixture)
+            app['id'] = app_id
+            apps.append((AsgardApp.from_json(app), AsgardApp.from_json(deepcopy(app))))
+
+        with application.test_request_context('/v2/apps/?limit=2', method='GET') as ctx:
+            response = Response(ctx.request, FlaskResponse(response=b'{"apps": []}', status=HTTPStatus.OK))
+            joined_response_data = json.loads(response.join(apps).data)
+            self.assertEqual(["/a", "/b"], [app['id'] for app in joined_response_data['apps']])
+            self.assertEqual("/b", joined_response_data['nextCursor'])
+
+        with application.test_request_context('/v2/apps/?limit=2&cursor=/b', method='GET') as ctx:
+            response = Response(ctx.request, FlaskResponse(response=b'{"apps": []}', status=HTTPStatus.OK))
+            joined_response_data = json.loads(response.join(apps).data)
+            self.assertEqual(["/c", "/d"], [app['id'] for app in joined_response_data['apps']])
+            self.assertTrue('nextCursor' not in joined_response_data)
+
+    @with_json_fixture('single_full_app.json')
+    def test_join_list_apps_clamps_invalid_limit(self, fixture):
+        """
+        limit <= 0 não pode retornar todas as apps; e o limit nunca passa de ASGARD_APPS_PAGE_MAX_LIMIT
+        """
+        apps = []
+        for app_id in ("/c", "/a", "/b"):
+            app = deepcopy(fixture)
+            app['id'] = app_id
+            apps.append((AsgardApp.from_json(app), AsgardApp.from_json(deepcopy(app))))
+
+        with patch.object(conf, "ASGARD_APPS_PAGE_MAX_LIMIT", 2):
+            for query_string, expected_ids, expected_cursor in (("limit=0", ["/a"], "/a"),
+                                                                 ("limit=-5", ["/a"], "/a"),
+                                                                 ("limit=100", ["/a", "/b"], "/b"),
+                                                                 ("cursor=/a", ["/b", "/c"], None)):
+                with application.test_request_context(f'/v2/apps/?{query_string}', method='GET') as ctx:
+                    response = Response(ctx.request, FlaskResponse(response=b'{"apps": []}', status=HTTPStatus.OK))
+                    joined_response_data = json.loads(response.join(apps).data)
+                    self.assertEqual(expected_ids, [app['id'] for app in joined_response_data['apps']], query_string)
+                    self.assertEqual(expected_cursor, joined_response_data.get('nextCursor'), query_string)
+
+    @with_json_fixture('single_full_app.json')
+    def test_join_list_apps_projects_requested_fields(self, fixture):
+        with application.test_request_context('/v2/apps/?fields=instances,cpus', method='GET') as ctx:
+            response = Response(ctx.request, FlaskResponse(response=b'{"apps": []}', status=HTTPStatus.OK))
+            joined_response = response.join([(AsgardApp.from_json(deepcopy(fixture)), AsgardApp.from_json(deepcopy(fixture)))])
+            self.assertEqual({'apps': [{"id": fixture['id'], "instances": fixture['instances'], "cpus": fixture['cpus']}]},
+                             json.loads(joined_response.data))
+
     @with_json_fixture("single_full_app.json")
     def test_should_join_an_empty_list_into_an_empty_response_single_app(self, single_full_app_fixture):
         with application.test_request_context('/v2/apps//foo',
@@ -0,0 +1,52 @@
+import unittest
+
+from hollowman.http_wrappers.route import parse_route, RequestResource, Route
+
+
+class ParseRouteTest(unittest.TestCase):
+
+    def test_parse_app_path_with_suffix(self):
+        self.assertEqual(Route(prefix="/v2/apps", resource=RequestResource.APPS, object_id="/my/app",
+                               suffix=("versions", "2017-10-31T13:01:07.768Z")),
+                         parse_route("/v2/apps//my/app/versions/2017-10-31T13:01:07.768Z"))
+
+    def test_parse_list_apps_path(self):
+        for path in ("/v2/apps", "/v2/apps/", "/v2/apps////"):
+            route = parse_route(path)
+            self.assertEqual(RequestResource.APPS, route.resource)
+            self.assertIsNone(route.object_id)
+            self.assertEqual((), route.suffix)
+
+    def test_parse_groups_versions_path(self):
+        route = parse_route("/v2/groups/versions")
+        self.assertEqual(RequestResource.GROUPS, route.resource)
+        self.assertIsNone(route.object_id)
+        self.assertEqual(("versions",), route.suffix)
+
+    def test_reserved_paths_are_per_endpoint(self):
+        self.assertEqual("/xablau/restart", parse_route("/v2/groups/xablau/restart").object_id)
+        self.assertEqual("/xablau", parse_route("/v2/apps/xablau/restart").object_id)
+        self.assertEqual("/workers/conversions/splitter", parse_route("/v2/apps/workers/conversions/splitter").object_id)
+
+    def test_tasks_paths_have_no_object_id(self):
+        route = parse_route("/v2/tasks/delete")
+        self.assertEqual(RequestResource.TASKS, route.resource)
+        self.assertIsNone(route.object_id)
+
+    def test_unknown_paths(self):
+        self.assertIsNone(parse_route("/v2/info").resource)
+        self.assertIsNone(parse_route("/").resource)
+        self.assertIsNone(parse_route(None).resource)
+
+
+class UpstreamPathTest(unittest.TestCase):
+
+    def test_replaces_object_id_keeping_suffix(self):
+        self.assertEqual("/v2/apps/dev/my-app/tasks/task_id",
+                         parse_route("/v2/apps/my-app/tasks/task_id").upstream_path("/dev/my-app"))
+        self.assertEqual("/v2/queue/dev/my-app/delay",
+                         parse_route("/v2/queue//my-app/delay").upstream_path("/dev/my-app"))
+
+    def test_root_group(self):
+        self.assertEqual("/v2/groups/dev", parse_route("/v2/groups/").upstream_path("/dev/"))
+        self.assertEqual("/v2/groups/dev/versions", parse_route("/v2/groups/versions").upstream_path("/dev/"))
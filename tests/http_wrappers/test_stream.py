@@ -0,0 +1,45 @@
+import json
+import unittest
+
+from marathon import MarathonApp
+from marathon.util import MarathonJsonEncoder
+
+from hollowman import codec
+from hollowman.http_wrappers.stream import iter_json, buffered
+
+
+class IterJsonTest(unittest.TestCase):
+
+    def test_generates_the_same_json_as_json_dumps(self):
+        body = {"apps": ({"id": "/app{}".format(i), "instances": i} for i in range(3)), "nextCursor": "/app2"}
+        expected = {"apps": [{"id": "/app{}".format(i), "instances": i} for i in range(3)], "nextCursor": "/app2"}
+        self.assertEqual(expected, json.loads("".join(iter_json(body))))
+
+    def test_generates_the_same_bytes_as_codec_dumps(self):
+        body = {"apps": ({"id": "/app{}".format(i)} for i in range(2)), "nextCursor": "/app1"}
+        expected = {"apps": [{"id": "/app{}".format(i)} for i in range(2)], "nextCursor": "/app1"}
+        self.assertEqual(codec.dumps(expected), "".join(iter_json(body)))
+
+    def test_each_generator_item_is_a_separate_chunk(self):
+        chunks = list(iter_json({"tasks": (task for task in [{"id": "a"}, {"id": "b"}])}))
+        self.assertTrue(codec.dumps({"id": "a"}) in chunks)
+        self.assertTrue(codec.dumps({"id": "b"}) in chunks)
+
+    def test_nested_generators_and_marathon_objects(self):
+        body = {"id": "/", "apps": (app for app in [MarathonApp(id="/foo")]),
+                "groups": (group for group in [{"id": "/g", "apps": (app for app in []), "groups": []}])}
+        data = json.loads("".join(iter_json(body, cls=MarathonJsonEncoder)))
+        self.assertEqual("/foo", data["apps"][0]["id"])
+        self.assertEqual({"id": "/g", "apps": [], "groups": []}, data["groups"][0])
+
+    def test_empty_generator(self):
+        self.assertEqual({"apps": []}, json.loads("".join(iter_json({"apps": (app for app in [])}))))
+
+
+class BufferedTest(unittest.TestCase):
+
+    def test_joins_chunks_until_chunk_size(self):
+        self.assertEqual(["abcd", "ef"], list(buffered(["ab", "cd", "e", "f"], 4)))
+
+    def test_no_chunks(self):
+        self.assertEqual([], list(buffered([], 4)))
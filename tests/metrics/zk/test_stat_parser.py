@@ -1,6 +1,6 @@
 
 from unittest import TestCase
-from hollowman.metrics.zk.parser import parse_stat_output
+from hollowman.metrics.zk.parser import parse_stat_output, parse_mntr_output
 
 class TestStatCommandOutputParser(TestCase):
 
@@ -27,3 +27,31 @@ Zookeeper version: 3.4.10-39d3a4f269333c922ed3db283be479f9deacaa0f, built on 03/
 
     def test_parse_node_count(self):
         self.assertEqual(932, self.parsed['node_count'])
+
+
+class TestMntrCommandOutputParser(TestCase):
+
+    def setUp(self):
+        self.raw_output = (
+            "zk_version\t3.4.10-39d3a4f269333c922ed3db283be479f9deacaa0f, built on 03/23/2017 10:13 GMT\n"
+            "zk_avg_latency\t16\nzk_max_latency\t3208\nzk_min_latency\t0\n"
+            "zk_packets_received\t4228466\nzk_num_alive_connections\t11\nzk_outstanding_requests\t0\n"
+            "zk_server_state\tleader\nzk_znode_count\t932\nzk_approximate_data_size\t81287\n"
+            "zk_followers\t2\nzk_synced_followers\t2\nzk_avg_request_latency\t0.5\n"
+        )
+        self.parsed = parse_mntr_output(self.raw_output)
+
+    def test_parse_integer_values(self):
+        self.assertEqual(16, self.parsed['zk_avg_latency'])
+        self.assertEqual(932, self.parsed['zk_znode_count'])
+        self.assertEqual(2, self.parsed['zk_synced_followers'])
+
+    def test_parse_float_values(self):
+        self.assertEqual(0.5, self.parsed['zk_avg_request_latency'])
+
+    def test_parse_string_values(self):
+        self.assertEqual("leader", self.parsed['zk_server_state'])
+        self.assertTrue(self.parsed['zk_version'].startswith("3.4.10"))
+
+    def test_ignore_lines_without_values(self):
+        self.assertEqual({}, parse_mntr_output("This ZooKeeper instance is not currently serving requests\n"))
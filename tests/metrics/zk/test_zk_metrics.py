@@ -1,63 +1,190 @@
-
 import os
 import json
+import socket
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 
 from hollowman.app import application
-from hollowman.metrics.zk import routes
+from hollowman.metrics.zk import collector, telnet
 
 
+def _stat_output(mode):
+    return "Latency min/avg/max: 0/16/3208\nConnections: 11\nOutstanding: 0\nMode: {}\nNode count: 932\n".format(mode).encode("utf8")
 
-class TestZKMetrics(TestCase):
 
-    def setUp(self):
-        self.send_command_patcher = patch.object(routes, 'send_command')
-        self.send_command_patcher.start()
+def _mntr_output(mode):
+    return "zk_avg_latency\t16\nzk_server_state\t{}\nzk_znode_count\t932\n".format(mode).encode("utf8")
+
 
-        self.parse_stat_output_patcher = patch.object(routes, "parse_stat_output")
-        self.parse_stat_output_mock = self.parse_stat_output_patcher.start()
+class ZKTestCase(TestCase):
+
+    def setUp(self):
+        collector.zk_metrics_collector.clear()
+        self.outputs = {
+            ("10.0.0.1", "stat"): _stat_output("follower"),
+            ("10.0.0.1", "mntr"): _mntr_output("follower"),
+            ("10.0.0.2", "stat"): _stat_output("leader"),
+            ("10.0.0.2", "mntr"): _mntr_output("leader"),
+            ("10.0.0.3", "stat"): _stat_output("follower"),
+            ("10.0.0.3", "mntr"): _mntr_output("follower"),
+        }
+        self.send_command_patcher = patch.object(collector, 'send_command', side_effect=self._send_command)
+        self.send_command_mock = self.send_command_patcher.start()
+        self.env_patcher = patch.dict(os.environ,
+                                      HOLLOWMAN_METRICS_ZK_ID_0="10.0.0.1",
+                                      HOLLOWMAN_METRICS_ZK_ID_1="10.0.0.2",
+                                      HOLLOWMAN_METRICS_ZK_ID_2="10.0.0.3")
+        self.env_patcher.start()
 
     def tearDown(self):
         self.send_command_patcher.stop()
-        self.parse_stat_output_patcher.stop()
+        self.env_patcher.stop()
+        collector.zk_metrics_collector.clear()
+
+    def _send_command(self, ip, port, command, **kwargs):
+        output = self.outputs[(ip, command)]
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+    def _get_json(self, client, path, status=200):
+        res = client.get(path)
+        self.assertEqual(status, res.status_code)
+        return json.loads(res.data.decode("utf8"))
+
+
+class TestZKMetrics(ZKTestCase):
 
     def test_zk_metrics_server_not_found(self):
         with application.test_client() as client:
-            res = client.get("/_cat/metrics/zk/1")
+            res = client.get("/_cat/metrics/zk/4")
             self.assertEqual(404, res.status_code)
             self.assertEqual(b"{}", res.data)
 
     def test_zk_metrics_server_found(self):
         with application.test_client() as client:
-            with patch.dict(os.environ, HOLLOWMAN_METRICS_ZK_ID_0="127.0.0.1"):
-                expected_return = {"connections": 10, "is_leader": 0}
-                self.parse_stat_output_mock.return_value = expected_return
-                res = client.get("/_cat/metrics/zk/1")
-                self.assertEqual(200, res.status_code)
-                self.assertEqual(expected_return, json.loads(res.data.decode("utf8")))
+            data = self._get_json(client, "/_cat/metrics/zk/2")
+            self.assertEqual("leader", data["mode"])
+            self.assertEqual(1, data["is_leader"])
+            self.assertEqual(11, data["connections"])
+            self.assertEqual({"zk_avg_latency": 16, "zk_server_state": "leader", "zk_znode_count": 932}, data["mntr"])
+            self.assertIn("age", data)
+
+    def test_zk_metrics_uses_timeouts(self):
+        with application.test_client() as client, \
+                patch.object(collector.conf, "ASGARD_METRICS_ZK_CONNECT_TIMEOUT", 1), \
+                patch.object(collector.conf, "ASGARD_METRICS_ZK_READ_TIMEOUT", 2):
+            client.get("/_cat/metrics/zk/1")
+            self.send_command_mock.assert_any_call("10.0.0.1", 2181, "stat", connect_timeout=1, read_timeout=2)
+            self.send_command_mock.assert_any_call("10.0.0.1", 2181, "mntr", connect_timeout=1, read_timeout=2)
+
+    def test_zk_metrics_server_timeout(self):
+        self.outputs[("10.0.0.1", "stat")] = socket.timeout("timed out")
+        with application.test_client() as client:
+            data = self._get_json(client, "/_cat/metrics/zk/1", status=502)
+            self.assertEqual("timed out", data["error"])
+
+    def test_zk_metrics_mntr_not_allowed(self):
+        """
+        Se o `mntr` não está liberado no ZK, o `stat` continua sendo retornado
+        """
+        self.outputs[("10.0.0.1", "mntr")] = b"mntr is not executed because it is not in the whitelist.\n"
+        with application.test_client() as client:
+            data = self._get_json(client, "/_cat/metrics/zk/1")
+            self.assertEqual("follower", data["mode"])
+            self.assertEqual({"error": "mntr is not executed because it is not in the whitelist."}, data["mntr"])
+
+    def test_zk_metrics_all(self):
+        with application.test_client() as client:
+            data = self._get_json(client, "/_cat/metrics/zk/all")
+            self.assertEqual([1, 2, 3], [node["id"] for node in data["nodes"]])
+            self.assertEqual(["follower", "leader", "follower"], [node["stat"]["mode"] for node in data["nodes"]])
+            self.assertEqual("leader", data["nodes"][1]["mntr"]["zk_server_state"])
+            for node in data["nodes"]:
+                self.assertIn("age", node)
+                self.assertIn("collected_at", node)
+
+    def test_zk_metrics_served_from_last_collection(self):
+        """
+        Vários requests dentro de ASGARD_METRICS_ZK_SNAPSHOT_MAX_AGE usam a mesma coleta
+        """
+        with application.test_client() as client:
+            self._get_json(client, "/_cat/metrics/zk/1")
+            self._get_json(client, "/_cat/metrics/zk/2")
+            self._get_json(client, "/_cat/metrics/zk/all")
+            self._get_json(client, "/_cat/metrics/zk/leader")
+            self.assertEqual(6, self.send_command_mock.call_count)
+
+
+class TestZKLeader(ZKTestCase):
 
     def test_zk_leader_with_leader(self):
         with application.test_client() as client:
-            with patch.dict(os.environ,
-                            HOLLOWMAN_METRICS_ZK_ID_0="127.0.0.1",
-                            HOLLOWMAN_METRICS_ZK_ID_1="127.0.0.1",
-                            HOLLOWMAN_METRICS_ZK_ID_2="127.0.0.1"):
-                expected_return = [{"mode": "follower"}, {"mode": "leader"}, {"mode": "follower"}]
-                self.parse_stat_output_mock.side_effect = expected_return
-                res = client.get("/_cat/metrics/zk/leader")
-                self.assertEqual(200, res.status_code)
-                self.assertEqual({"leader": 2}, json.loads(res.data.decode("utf8")))
+            data = self._get_json(client, "/_cat/metrics/zk/leader")
+            self.assertEqual(2, data["leader"])
+            self.assertEqual([1, 2, 3], [node["id"] for node in data["nodes"]])
+            self.assertEqual(["follower", "leader", "follower"], [node["mode"] for node in data["nodes"]])
 
     def test_zk_leader_no_leader(self):
+        self.outputs[("10.0.0.2", "stat")] = _stat_output("follower")
+        self.outputs[("10.0.0.2", "mntr")] = _mntr_output("follower")
+        with application.test_client() as client:
+            self.assertEqual(0, self._get_json(client, "/_cat/metrics/zk/leader")["leader"])
+
+    def test_zk_leader_from_mntr_when_stat_fails(self):
+        self.outputs[("10.0.0.2", "stat")] = socket.timeout("timed out")
+        with application.test_client() as client:
+            self.assertEqual(2, self._get_json(client, "/_cat/metrics/zk/leader")["leader"])
+
+    def test_zk_leader_partial_result_when_node_fails(self):
+        """
+        Um server que não responde não impede o resultado dos outros; o erro vem no próprio node
+        """
+        self.outputs[("10.0.0.1", "stat")] = socket.timeout("timed out")
+        self.outputs[("10.0.0.3", "stat")] = ConnectionRefusedError("Connection refused")
         with application.test_client() as client:
-            with patch.dict(os.environ,
-                            HOLLOWMAN_METRICS_ZK_ID_0="127.0.0.1",
-                            HOLLOWMAN_METRICS_ZK_ID_1="127.0.0.1",
-                            HOLLOWMAN_METRICS_ZK_ID_2="127.0.0.1"):
-                expected_return = [{"mode": "follower"}, {"mode": "follower"}, {"mode": "follower"}]
-                self.parse_stat_output_mock.side_effect = expected_return
-                res = client.get("/_cat/metrics/zk/leader")
-                self.assertEqual(200, res.status_code)
-                self.assertEqual({"leader": 0}, json.loads(res.data.decode("utf8")))
+            data = self._get_json(client, "/_cat/metrics/zk/leader")
+            self.assertEqual(2, data["leader"])
+            self.assertEqual({"id": 1, "error": "timed out"}, data["nodes"][0])
+            self.assertEqual("leader", data["nodes"][1]["mode"])
+            self.assertEqual({"id": 3, "error": "Connection refused"}, data["nodes"][2])
+
+
+class TestZKMetricsCollector(ZKTestCase):
+
+    def test_collect_again_when_stale(self):
+        zk_collector = collector.ZKMetricsCollector(max_age=10)
+        zk_collector.nodes()
+        self.outputs[("10.0.0.2", "stat")] = _stat_output("follower")
+        self.assertEqual("leader", zk_collector.get(2)["stat"]["mode"])
+
+        zk_collector.collected_at -= 11
+        self.assertEqual("follower", zk_collector.get(2)["stat"]["mode"])
+        self.assertEqual(12, self.send_command_mock.call_count)
+
+    def test_get_unknown_node(self):
+        zk_collector = collector.ZKMetricsCollector(max_age=10)
+        self.assertIsNone(zk_collector.get(4))
+
+    def test_no_nodes_configured(self):
+        zk_collector = collector.ZKMetricsCollector(max_age=10)
+        with patch.object(collector, "get_option", return_value=[]):
+            self.assertEqual([], zk_collector.nodes())
+        self.assertIsNotNone(zk_collector.collected_at)
+
+
+class TestTelnetReadTimeout(TestCase):
+
+    def test_read_all_until_eof(self):
+        conn = Mock(**{"read_some.side_effect": [b"Mode: ", b"leader\n", b""]})
+        self.assertEqual(b"Mode: leader\n", telnet._read_all(conn, deadline=telnet.time.monotonic() + 10))
 
+    def test_read_all_raises_after_deadline(self):
+        """
+        O timeout de leitura vale para a resposta inteira, mesmo que o server continue mandando dados
+        """
+        conn = Mock(**{"read_some.return_value": b"x"})
+        with patch.object(telnet.time, "monotonic", side_effect=[0, 1, 2, 11]):
+            with self.assertRaises(socket.timeout):
+                telnet._read_all(conn, deadline=10)
+        self.assertEqual(3, conn.read_some.call_count)
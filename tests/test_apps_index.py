@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import Mock, patch
+
+from marathon import MarathonApp
+
+from hollowman.marathon.index import AppsIndex, NamespaceIndexes, app_terms, LABEL, IMAGE, CONSTRAINT, ENV
+
+
+def _app(app_id, version="1", image="nginx:1.13", labels=None, constraints=None, env=None):
+    return MarathonApp.from_json({
+        "id": app_id,
+        "version": version,
+        "container": {"type": "DOCKER", "docker": {"image": image}},
+        "labels": labels or {},
+        "constraints": constraints or [],
+        "env": env or {},
+    })
+
+
+class AppTermsTest(unittest.TestCase):
+
+    def test_index_labels_image_constraints_and_env_keys(self):
+        app = _app("/dev/foo", image="registry:5000/org/foo:1.0",
+                   labels={"traefik.frontend": "foo"},
+                   constraints=[["hostname", "LIKE", "10.0.*"]],
+                   env={"DATABASE_URL": "postgres://"})
+        terms = app_terms(app)
+        self.assertTrue((LABEL, "traefik.frontend") in terms)
+        self.assertTrue((LABEL, "traefik.frontend=foo") in terms)
+        self.assertTrue((IMAGE, "registry:5000/org/foo:1.0") in terms)
+        self.assertTrue((IMAGE, "registry:5000/org/foo") in terms)
+        self.assertTrue((CONSTRAINT, "hostname") in terms)
+        self.assertTrue((CONSTRAINT, "hostname:LIKE:10.0.*") in terms)
+        self.assertTrue((ENV, "DATABASE_URL") in terms)
+        self.assertFalse((ENV, "postgres://") in terms)
+
+    def test_image_without_tag_is_not_truncated_on_registry_port(self):
+        terms = app_terms(_app("/dev/foo", image="registry:5000/org/foo"))
+        self.assertEqual({(IMAGE, "registry:5000/org/foo")}, {t for t in terms if t[0] == IMAGE})
+
+
+class AppsIndexTest(unittest.TestCase):
+
+    def test_search_returns_apps_with_all_terms(self):
+        index = AppsIndex()
+        index.update([
+            _app("/dev/foo", labels={"team": "a"}),
+            _app("/dev/bar", labels={"team": "a"}, image="redis:4"),
+            _app("/dev/baz", labels={"team": "b"}),
+        ])
+        self.assertEqual(["/dev/bar", "/dev/foo"], index.search([(LABEL, "team=a")]))
+        self.assertEqual(["/dev/foo"], index.search([(LABEL, "team=a"), (IMAGE, "nginx")]))
+        self.assertEqual([], index.search([(LABEL, "team=c")]))
+
+    def test_update_only_reindexes_changed_apps(self):
+        index = AppsIndex()
+        index.update([_app("/dev/foo"), _app("/dev/bar")])
+        changed, removed = index.update([_app("/dev/foo", version="2", image="redis:4"), _app("/dev/bar")])
+        self.assertEqual(["/dev/foo"], [app.id for app in changed])
+        self.assertEqual([], removed)
+        self.assertEqual(["/dev/foo"], index.search([(IMAGE, "redis")]))
+        self.assertEqual(["/dev/bar"], index.search([(IMAGE, "nginx")]))
+
+    def test_listeners_receive_changes_from_each_refresh(self):
+        marathon_client = Mock()
+        marathon_client.list_apps.return_value = [_app("/dev/foo")]
+        listener = Mock()
+        indexes = NamespaceIndexes(ttl=0, marathon_client=marathon_client)
+        indexes.add_listener(listener)
+        indexes.refresh("dev")
+        indexes.refresh("dev")
+        self.assertEqual(2, listener.call_count)
+        self.assertEqual([], listener.call_args[0][1])
+        self.assertEqual([], listener.call_args[0][2])
+
+    def test_update_removes_deleted_apps(self):
+        index = AppsIndex()
+        index.update([_app("/dev/foo"), _app("/dev/bar")])
+        changed, removed = index.update([_app("/dev/bar")])
+        self.assertEqual([], changed)
+        self.assertEqual(["/dev/foo"], removed)
+        self.assertEqual(["/dev/bar"], index.search([(IMAGE, "nginx")]))
+
+
+class NamespaceIndexesTest(unittest.TestCase):
+
+    def test_refresh_only_when_index_is_stale(self):
+        marathon_client = Mock()
+        marathon_client.list_apps.return_value = [_app("/dev/foo"), _app("/developers/bar")]
+        indexes = NamespaceIndexes(ttl=30, marathon_client=marathon_client)
+
+        self.assertEqual(["/dev/foo"], indexes.get("dev").search([(IMAGE, "nginx")]))
+        indexes.get("dev")
+        marathon_client.list_apps.assert_called_once_with(app_id="/dev/")
+
+        with patch("hollowman.marathon.index.time.time", return_value=indexes.get("dev").updated_at + 31):
+            indexes.get("dev")
+        self.assertEqual(2, marathon_client.list_apps.call_count)
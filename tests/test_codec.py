@@ -0,0 +1,53 @@
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from marathon import MarathonApp
+from marathon.util import MarathonJsonEncoder, MarathonMinimalJsonEncoder
+
+from hollowman import conf, codec
+
+
+class CodecTest(unittest.TestCase):
+
+    def _backends(self):
+        backends = [False]
+        if codec.orjson is not None:
+            backends.append(True)
+        for enabled in backends:
+            with patch.object(conf, "ASGARD_FAST_JSON_ENABLED", enabled):
+                yield enabled
+
+    def test_dumps_with_marathon_encoders_is_equivalent_to_stdlib(self):
+        apps = [MarathonApp(id="/foo", instances=0, labels={"a": "b"}, env={})]
+        for _ in self._backends():
+            self.assertEqual(json.loads(json.dumps(apps, cls=MarathonJsonEncoder)),
+                             json.loads(codec.dumps(apps, cls=MarathonJsonEncoder)))
+            self.assertEqual(json.loads(json.dumps(apps, cls=MarathonMinimalJsonEncoder)),
+                             json.loads(codec.dumps(apps, cls=MarathonMinimalJsonEncoder)))
+
+    def test_datetimes_use_the_encoder_format(self):
+        data = {"version": datetime(2017, 10, 31, 13, 1, 7, 768000)}
+        for _ in self._backends():
+            self.assertEqual(json.loads(json.dumps(data, cls=MarathonJsonEncoder)),
+                             json.loads(codec.dumps(data, cls=MarathonJsonEncoder)))
+
+    def test_dumps_returns_str_and_supports_sort_keys_and_default(self):
+        for _ in self._backends():
+            self.assertEqual('{"a":1,"b":2}', codec.dumps({"b": 2, "a": 1}, sort_keys=True).replace(" ", ""))
+            self.assertEqual('["1"]', codec.dumps([object()], default=lambda o: "1"))
+
+    def test_both_backends_generate_the_same_json(self):
+        """
+        O body dos responses não pode depender de o orjson estar instalado: compacto e em UTF-8
+        """
+        data = {"id": "/ação", "labels": {"a": "b"}, "instances": [1, 2.5, None, True]}
+        for _ in self._backends():
+            self.assertEqual('{"id":"/ação","labels":{"a":"b"},"instances":[1,2.5,null,true]}', codec.dumps(data))
+
+    def test_loads_accepts_bytes_and_raises_value_error(self):
+        for _ in self._backends():
+            self.assertEqual({"a": 1}, codec.loads(b'{"a": 1}'))
+            with self.assertRaises(ValueError):
+                codec.loads(b"")
@@ -0,0 +1,33 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from marathon import MarathonClient
+
+from hollowman.marathon.client import AsgardMarathonClient
+
+
+class AsgardMarathonClientTest(TestCase):
+
+    def setUp(self):
+        self.client = AsgardMarathonClient(["http://127.0.0.1:8080"])
+
+    def test_get_requests_go_through_singleflight(self):
+        with patch.object(self.client, "_inflight_requests") as inflight_mock:
+            inflight_mock.do.return_value = "response"
+            self.assertEqual("response", self.client._do_request("GET", "/v2/apps//dev/foo"))
+            self.assertEqual(1, inflight_mock.do.call_count)
+
+    def test_write_requests_do_not_go_through_singleflight(self):
+        with patch.object(self.client, "_inflight_requests") as inflight_mock, \
+                patch.object(MarathonClient, "_do_request") as do_request_mock:
+            self.client._do_request("PUT", "/v2/apps//dev/foo", data="{}")
+            self.assertFalse(inflight_mock.do.called)
+            do_request_mock.assert_called_with("PUT", "/v2/apps//dev/foo", params=None, data="{}")
+
+    def test_singleflight_disabled(self):
+        client = AsgardMarathonClient(["http://127.0.0.1:8080"], singleflight=False)
+        with patch.object(client, "_inflight_requests") as inflight_mock, \
+                patch.object(MarathonClient, "_do_request") as do_request_mock:
+            client._do_request("GET", "/v2/apps")
+            self.assertFalse(inflight_mock.do.called)
+            self.assertTrue(do_request_mock.called)
@@ -0,0 +1,276 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+from responses import RequestsMock
+
+from hollowman.conf import DEFAULT_MESOS_ADDRESS
+from hollowman.mesos.agents import Agent, AgentsIndex
+from hollowman.mesos.client import MesosClient
+from hollowman.mesos.files import FileTail, grep_chunks, download_file
+from hollowman.mesos.sandbox import SandboxResolver, task_container_id, task_executor_id, sandbox_path
+
+
+AGENT_ID = "2084863b-12d1-4319-b515-992eab91a53d-S1"
+FRAMEWORK_ID = "27b52920-3899-4b90-a1d6-bf83a87f3612-0000"
+TASK_ID = "dev_infra_mysql.b331f6c9-fb9e-11e7-ab4b-faf0633ea91f"
+CONTAINER_ID = "e14d7537-c1d0-4846-a076-25d623d6a70f"
+SANDBOX_DIRECTORY = f"/tmp/mesos/slaves/{AGENT_ID}/frameworks/{FRAMEWORK_ID}/executors/{TASK_ID}/runs/{CONTAINER_ID}"
+
+
+def _slaves(*agent_ids):
+    return json.dumps({"slaves": [{"id": agent_id, "hostname": "127.0.0.1", "port": 5051} for agent_id in agent_ids]})
+
+
+def _task(container_id=CONTAINER_ID, executor_id=""):
+    statuses = [{"state": "TASK_STAGING"}]
+    if container_id:
+        statuses.append({"state": "TASK_RUNNING", "container_status": {"container_id": {"value": container_id}}})
+    return {"id": TASK_ID, "executor_id": executor_id, "slave_id": AGENT_ID,
+            "framework_id": FRAMEWORK_ID, "statuses": statuses}
+
+
+def _agent_state(directory=SANDBOX_DIRECTORY):
+    return json.dumps({"frameworks": [{"id": FRAMEWORK_ID,
+                                       "executors": [],
+                                       "completed_executors": [{"id": TASK_ID, "directory": directory}]}]})
+
+
+class MesosClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.masters = ["http://10.0.0.1:5050", "http://10.0.0.2:5050", "http://10.0.0.3:5050"]
+        self.client = MesosClient(addresses=self.masters, timeout=1)
+
+    def test_get_uses_first_master_and_remembers_it_as_leader(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://10.0.0.1:5050/slaves", body=_slaves(AGENT_ID), status=200)
+            response = self.client.get("/slaves")
+            self.assertEqual(AGENT_ID, response.json()["slaves"][0]["id"])
+            self.assertEqual("http://10.0.0.1:5050", self.client.leader)
+
+    def test_get_follows_redirect_to_leader(self):
+        """
+        Um master que não é o leader responde 307 apontando para o leader atual.
+        Os próximos requests já vão direto para o leader.
+        """
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://10.0.0.1:5050/slaves", status=307,
+                     headers={"Location": "//10.0.0.3:5050/slaves"})
+            rsps.add(method="GET", url="http://10.0.0.3:5050/slaves", body=_slaves(AGENT_ID), status=200)
+            self.assertEqual(200, self.client.get("/slaves").status_code)
+            self.assertEqual("http://10.0.0.3:5050", self.client.leader)
+
+            self.client.get("/slaves")
+            self.assertEqual(3, len(rsps.calls))
+            self.assertEqual("http://10.0.0.3:5050/slaves", rsps.calls[2].request.url)
+
+    def test_get_fails_over_to_next_master(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://10.0.0.1:5050/slaves", body=requests.exceptions.ConnectionError())
+            rsps.add(method="GET", url="http://10.0.0.2:5050/slaves", body=requests.exceptions.Timeout())
+            rsps.add(method="GET", url="http://10.0.0.3:5050/slaves", body=_slaves(AGENT_ID), status=200)
+            self.assertEqual(200, self.client.get("/slaves").status_code)
+            self.assertEqual("http://10.0.0.3:5050", self.client.leader)
+
+    def test_get_fails_over_on_server_error(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://10.0.0.1:5050/slaves", body="", status=503)
+            rsps.add(method="GET", url="http://10.0.0.2:5050/slaves", body=_slaves(AGENT_ID), status=200)
+            self.assertEqual(200, self.client.get("/slaves").status_code)
+            self.assertEqual("http://10.0.0.2:5050", self.client.leader)
+
+    def test_get_raises_if_no_master_responds(self):
+        with RequestsMock() as rsps:
+            for master in self.masters:
+                rsps.add(method="GET", url=f"{master}/slaves", body=requests.exceptions.ConnectionError())
+            with self.assertRaises(Exception):
+                self.client.get("/slaves")
+            self.assertIsNone(self.client.leader)
+
+    def test_get_passes_query_string(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://10.0.0.1:5050/tasks?task_id=my-task", body=json.dumps({"tasks": []}),
+                     status=200, match_querystring=True)
+            self.assertEqual({"tasks": []}, self.client.get("/tasks", params={"task_id": "my-task"}).json())
+
+    def test_get_agent(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://127.0.0.1:5051/flags", body=json.dumps({"flags": {}}), status=200)
+            self.assertEqual({"flags": {}}, self.client.get_agent("127.0.0.1:5051", "/flags").json())
+
+
+class AgentsIndexTest(unittest.TestCase):
+
+    def test_get_builds_index_from_master(self):
+        index = AgentsIndex(ttl=60)
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID, "other-agent"), status=200)
+            self.assertEqual(Agent(id=AGENT_ID, hostname="127.0.0.1", port=5051), index.get(AGENT_ID))
+            self.assertEqual("127.0.0.1:5051", index.get("other-agent").address)
+            self.assertEqual(1, len(rsps.calls))
+
+    def test_get_refreshes_stale_index(self):
+        index = AgentsIndex(ttl=60)
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID), status=200)
+            index.get(AGENT_ID)
+            index.get(AGENT_ID)
+            self.assertEqual(1, len(rsps.calls))
+
+            index.updated_at -= 61
+            index.get(AGENT_ID)
+            self.assertEqual(2, len(rsps.calls))
+
+    def test_get_unknown_agent_refreshes_index_once(self):
+        """
+        Um agent que não está no índice pode ter acabado de entrar no cluster, então
+        atualizamos o índice antes de desistir.
+        """
+        index = AgentsIndex(ttl=60)
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID), status=200)
+            index.get(AGENT_ID)
+            self.assertIsNone(index.get("new-agent"))
+            self.assertEqual(2, len(rsps.calls))
+
+    def test_clear(self):
+        index = AgentsIndex(ttl=60)
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID), status=200)
+            index.get(AGENT_ID)
+            index.clear()
+            self.assertFalse(AGENT_ID in index)
+            index.get(AGENT_ID)
+            self.assertEqual(2, len(rsps.calls))
+
+
+class SandboxResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agents = AgentsIndex(ttl=60)
+        self.resolver = SandboxResolver(self.agents, state_ttl=5)
+
+    def test_task_container_id_ignores_nested_containers(self):
+        task = _task()
+        task["statuses"][-1]["container_status"]["container_id"]["parent"] = {"value": "parent-id"}
+        self.assertIsNone(task_container_id(task))
+
+    def test_task_executor_id_defaults_to_task_id(self):
+        self.assertEqual(TASK_ID, task_executor_id(_task()))
+        self.assertEqual("my-executor", task_executor_id(_task(executor_id="my-executor")))
+
+    def test_sandbox_path(self):
+        self.assertEqual(SANDBOX_DIRECTORY, sandbox_path("/tmp/mesos/", AGENT_ID, FRAMEWORK_ID, TASK_ID, CONTAINER_ID))
+
+    def test_resolve_uses_agent_work_dir(self):
+        """
+        Com o id do container na task o sandbox é montado a partir do work_dir do agent,
+        sem baixar o /state. O work_dir é pedido apenas uma vez por agent.
+        """
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID), status=200)
+            rsps.add(method="GET", url="http://127.0.0.1:5051/flags",
+                     body=json.dumps({"flags": {"work_dir": "/tmp/mesos"}}), status=200)
+            agent, directory = self.resolver.resolve(_task())
+            self.assertEqual(AGENT_ID, agent.id)
+            self.assertEqual(SANDBOX_DIRECTORY, directory)
+
+            self.assertEqual((agent, directory), self.resolver.resolve(_task()))
+            self.assertEqual(2, len(rsps.calls))
+
+    def test_resolve_without_container_id_uses_agent_state(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID), status=200)
+            rsps.add(method="GET", url="http://127.0.0.1:5051/state", body=_agent_state(), status=200)
+            agent, directory = self.resolver.resolve(_task(container_id=None))
+            self.assertEqual(SANDBOX_DIRECTORY, directory)
+
+    def test_resolve_caches_agent_state_for_state_ttl(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves(AGENT_ID), status=200)
+            rsps.add(method="GET", url="http://127.0.0.1:5051/state", body=_agent_state(), status=200)
+            self.resolver.resolve(_task(container_id=None))
+            self.resolver.resolve(_task(container_id=None))
+            self.assertEqual(1, len([call for call in rsps.calls if call.request.url.endswith("/state")]))
+
+            self.resolver.state_ttl = -1
+            self.resolver.resolve(_task(container_id=None))
+            self.assertEqual(2, len([call for call in rsps.calls if call.request.url.endswith("/state")]))
+
+    def test_resolve_unknown_agent(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=f"{DEFAULT_MESOS_ADDRESS}/slaves", body=_slaves("other-agent"), status=200)
+            self.assertEqual((None, None), self.resolver.resolve(_task()))
+
+
+class FileTailTest(unittest.TestCase):
+
+    def _read_url(self, offset, length=10):
+        return f"http://127.0.0.1:5051/files/read?path={SANDBOX_DIRECTORY}/stdout&offset={offset}&length={length}"
+
+    def test_backoff_grows_while_file_is_idle_and_resets_on_new_data(self):
+        sleep_mock = mock.Mock()
+        file_tail = FileTail("127.0.0.1:5051", SANDBOX_DIRECTORY, "/stdout", offset=0, chunk_size=10,
+                             min_interval=1, max_interval=3, sleep=sleep_mock)
+        agent_responses = [(200, {}, json.dumps({"data": data, "offset": 0})) for data in ("", "", "", "ab")] + \
+            [(200, {}, json.dumps({"data": "", "offset": 2})), (404, {}, "")]
+        requested_offsets = []
+
+        def files_read(request):
+            requested_offsets.append(int(request.url.split("offset=")[1].split("&")[0]))
+            return agent_responses.pop(0)
+
+        with RequestsMock() as rsps:
+            rsps.add_callback(method="GET", url="http://127.0.0.1:5051/files/read", callback=files_read)
+            chunks = list(file_tail)
+
+        self.assertEqual([None, None, None, {"offset": 0, "data": "ab"}, None], chunks)
+        self.assertEqual([0, 0, 0, 0, 2, 2], requested_offsets)
+        self.assertEqual([mock.call(1), mock.call(2), mock.call(3), mock.call(1)], sleep_mock.call_args_list)
+        self.assertTrue(file_tail.gone)
+        self.assertEqual(2, file_tail.offset)
+
+    def test_offset_counts_bytes_of_multibyte_data(self):
+        file_tail = FileTail("127.0.0.1:5051", SANDBOX_DIRECTORY, "/stdout", offset=0, chunk_size=10)
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=self._read_url(0), body=json.dumps({"data": "ação", "offset": 0}),
+                     match_querystring=True)
+            rsps.add(method="GET", url=self._read_url(6), body="", status=404, match_querystring=True)
+            self.assertEqual([{"offset": 0, "data": "ação"}], list(file_tail))
+        self.assertEqual(6, file_tail.offset)
+
+    def test_stops_when_agent_is_unreachable(self):
+        file_tail = FileTail("127.0.0.1:5051", SANDBOX_DIRECTORY, "/stdout", offset=0, chunk_size=10)
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url=self._read_url(0), body=requests.exceptions.ConnectionError("agent is gone"))
+            self.assertEqual([], list(file_tail))
+        self.assertFalse(file_tail.gone)
+        self.assertEqual("agent is gone", file_tail.error)
+
+
+class GrepChunksTest(unittest.TestCase):
+
+    def test_long_lines_are_split(self):
+        result = grep_chunks([b"abcdefghij\nxyz"], lambda line: True, max_line_length=4)
+        self.assertEqual(["abcd", "efgh", "ij", "xyz"], [line["line"] for line in result["lines"]])
+        self.assertEqual([0, 4, 8, 11], [line["offset"] for line in result["lines"]])
+
+    def test_lines_split_across_chunks(self):
+        result = grep_chunks([b"err", b"or\nok\ner", b"ror"], lambda line: line == "error")
+        self.assertEqual([{"offset": 0, "line": "error", "match": True},
+                          {"offset": 9, "line": "error", "match": True}], result["lines"])
+
+    def test_stops_at_time_budget(self):
+        clock = mock.Mock(side_effect=[0, 1, 2, 30])
+        result = grep_chunks([b"a\nb\nc\n"], lambda line: True, max_seconds=20, clock=clock)
+        self.assertEqual(["a", "b"], [line["line"] for line in result["lines"]])
+        self.assertEqual("max_seconds", result["truncated"])
+        self.assertEqual(4, result["next_offset"])
+
+    def test_download_file_skips_start_when_agent_ignores_range(self):
+        with RequestsMock() as rsps:
+            rsps.add(method="GET", url="http://127.0.0.1:5051/files/download", body="0123456789", status=200)
+            chunks = download_file("127.0.0.1:5051", SANDBOX_DIRECTORY, "/stdout", offset=4, chunk_size=3)
+            self.assertEqual(b"456789", b"".join(chunks))
@@ -0,0 +1,83 @@
+import threading
+from unittest import TestCase
+
+from hollowman.singleflight import SingleFlight, request_key
+
+
+class SingleFlightTest(TestCase):
+
+    def setUp(self):
+        self.singleflight = SingleFlight()
+
+    def test_request_key_is_stable(self):
+        self.assertEqual(request_key("/v2/apps", [("a", "b")]), request_key("/v2/apps", [("a", "b")]))
+        self.assertNotEqual(request_key("/v2/apps", [("a", "b")]), request_key("/v2/apps", [("a", "c")]))
+
+    def test_do_returns_function_result(self):
+        self.assertEqual(42, self.singleflight.do("key", lambda x: x * 2, 21))
+
+    def test_do_does_not_keep_results_after_call_finishes(self):
+        """
+        SingleFlight não é um cache. Depois que a chamada termina,
+        uma nova chamada com a mesma chave executa a função novamente.
+        """
+        calls = []
+        self.singleflight.do("key", calls.append, 1)
+        self.singleflight.do("key", calls.append, 2)
+        self.assertEqual([1, 2], calls)
+
+    def test_concurrent_calls_with_same_key_run_function_once(self):
+        calls = []
+        leader_started = threading.Event()
+        release_leader = threading.Event()
+        results = []
+
+        def _slow_function():
+            calls.append(1)
+            leader_started.set()
+            release_leader.wait()
+            return "upstream-response"
+
+        leader = threading.Thread(target=lambda: results.append(self.singleflight.do("key", _slow_function)))
+        leader.start()
+        leader_started.wait()
+
+        followers = [threading.Thread(target=lambda: results.append(self.singleflight.do("key", _slow_function)))
+                     for _ in range(5)]
+        for follower in followers:
+            follower.start()
+
+        release_leader.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(["upstream-response"] * 6, results)
+
+    def test_concurrent_calls_receive_the_same_exception(self):
+        leader_started = threading.Event()
+        release_leader = threading.Event()
+        errors = []
+
+        def _failing_function():
+            leader_started.set()
+            release_leader.wait()
+            raise ValueError("upstream error")
+
+        def _call():
+            try:
+                self.singleflight.do("key", _failing_function)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=_call)
+        leader.start()
+        leader_started.wait()
+        follower = threading.Thread(target=_call)
+        follower.start()
+
+        release_leader.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(2, len(errors))
@@ -13,6 +13,7 @@ import responses
 from hollowman.app import application
 from hollowman.upstream import replay_request, _make_request
 import hollowman.conf
+import hollowman.upstream
 from tests import RequestStub
 
 
@@ -70,6 +71,16 @@ class UpstreamTest(TestCase):
             called_headers = mock_get.call_args[1]['data']
             self.assertEqual(called_headers, b"Request Data")
 
+    @patch.object(requests, 'put')
+    def test_str_payload_is_sent_as_utf8(self, mock_put):
+        """
+        Bodies montados com codec.dumps() são str e podem ter caracteres não-ASCII
+        """
+        with application.test_request_context("/v2/apps", method="PUT"):
+            flask.request.data = '[{"id":"/ação"}]'
+            replay_request(flask.request)
+            self.assertEqual('[{"id":"/ação"}]'.encode("utf-8"), mock_put.call_args[1]['data'])
+
     @patch.object(requests, 'get')
     def test_original_headers_to_upstream_request(self, mock_get):
         with application.test_request_context("/v2/apps", method="GET", headers={"X-Header-A": 42, "X-Header-B": 10}):
@@ -80,53 +91,17 @@ class UpstreamTest(TestCase):
             self.assertEqual(called_headers['X-Header-B'], "10")
 
     @patch.object(requests, 'put')
-    def test_remove_some_key_before_replay_put_request_data_is_a_list(self, mock_put):
-        """
-        A API aceita uma lista se o request for um PUT em /v2/apps.
-        O pop() da lista se comporta diferente do pop do dict. Temos que tratar isso.
-        """
-        with application.test_request_context("/v2/apps", method="PUT", data='[{"id": "/abc", "version": "0", "fetch": ["a", "b"], "secrets": {}}]', headers={'Content-Type': 'application/json'}):
-            replay_request(flask.request)
-            self.assertTrue(mock_put.called)
-            called_data_json = json.loads(mock_put.call_args[1]['data'])
-            self.assertFalse('version' in called_data_json[0])
-            self.assertFalse('fetch' in called_data_json[0])
-            self.assertFalse('secrets' in called_data_json[0])
-
-    @patch.object(requests, 'put')
-    def test_remove_some_key_before_replay_put_request(self, mock_put):
+    def test_replay_json_request_data_without_reserializing(self, mock_put):
         """
-        We must remove these keys:
-            * version
-            * fetch
-        When GETting an app, Marathon returns a JSON with these two keys, bus refuses to
-        accept a PUT/POST on this same app if these keys are present.
+        A remoção das keys que o Marathon não aceita (version, fetch, secrets)
+        é feita no Request.join(). O replay_request() envia o body exatamente
+        como recebeu, sem fazer um novo json.loads()/json.dumps().
         """
-        with application.test_request_context("/v2/apps", method="PUT", data='{"id": "/abc", "version": "0", "fetch": ["a", "b"], "secrets": {}}', headers={'Content-Type': 'application/json'}):
+        request_data = '[{"id": "/abc", "version": "0"}]'
+        with application.test_request_context("/v2/apps", method="PUT", data=request_data, headers={'Content-Type': 'application/json'}):
             replay_request(flask.request)
             self.assertTrue(mock_put.called)
-            called_data_json = json.loads(mock_put.call_args[1]['data'])
-            self.assertFalse('version' in called_data_json)
-            self.assertFalse('fetch' in called_data_json)
-            self.assertFalse('secrets' in called_data_json)
-
-    @patch.object(requests, 'post')
-    def test_remove_some_key_before_replay_post_request(self, mock_post):
-        """
-        We must remove these keys:
-            * version
-            * fetch
-        When GETting an app, Marathon returns a JSON with these two keys, bus refuses to
-        accept a PUT/POST on this same app if these keys are present.
-        """
-        with application.test_request_context("/v2/apps", method="POST", data='{"id": "/abc", "version": "0", "fetch": ["a", "b"], "secrets": {}}', headers={'Content-Type': 'application/json'}):
-            #flask.request.is_json = True
-            replay_request(flask.request)
-            self.assertTrue(mock_post.called)
-            called_data_json = json.loads(mock_post.call_args[1]['data'])
-            self.assertFalse('version' in called_data_json)
-            self.assertFalse('fetch' in called_data_json)
-            self.assertFalse('secrets' in called_data_json)
+            self.assertEqual(request_data.encode("utf-8"), mock_put.call_args[1]['data'])
 
     @patch.object(requests, 'post')
     def test_no_not_attempt_to_parse_a_non_json_body_post(self, mock_post):
@@ -198,3 +173,44 @@ class UpstreamTest(TestCase):
                 self.fail("Não deveria ter tentado conectar nos hosts invalidos")
             self.assertEqual(b"OK", response.content)
 
+    def test_make_request_returns_a_copy_of_the_response_for_each_caller(self):
+        """
+        Como o response de um GET pode ser compartilhado entre vários requests
+        que estavam em andamento ao mesmo tempo, cada chamador recebe sua própria cópia
+        e pode modificar os headers sem afetar os outros.
+        """
+        marathon_addresses = ["http://127.0.0.1:8080"]
+        with RequestsMock() as rsps, \
+                patch.multiple(hollowman.conf, MARATHON_ADDRESSES=marathon_addresses), \
+                patch.multiple(hollowman.conf, MARATHON_LEADER=marathon_addresses[0]):
+            rsps.add("GET", url=marathon_addresses[0] + "/v2/apps", status=200, body="OK", headers={"X-Header": "value"})
+            with patch.object(hollowman.upstream, "_inflight_requests") as inflight_mock:
+                upstream_response = requests.get(marathon_addresses[0] + "/v2/apps")
+                inflight_mock.do.return_value = upstream_response
+                response = _make_request("/v2/apps", "get")
+                response.headers.pop("X-Header")
+                self.assertEqual(b"OK", response.content)
+                self.assertEqual("value", upstream_response.headers["X-Header"])
+
+    @patch.multiple(hollowman.conf, ASGARD_UPSTREAM_SINGLEFLIGHT_ENABLED=False)
+    def test_make_request_does_not_use_singleflight_if_disabled(self):
+        marathon_addresses = ["http://127.0.0.1:8080"]
+        with RequestsMock() as rsps, \
+                patch.multiple(hollowman.conf, MARATHON_ADDRESSES=marathon_addresses), \
+                patch.multiple(hollowman.conf, MARATHON_LEADER=marathon_addresses[0]), \
+                patch.object(hollowman.upstream, "_inflight_requests") as inflight_mock:
+            rsps.add("GET", url=marathon_addresses[0] + "/v2/apps", status=200, body="OK")
+            response = _make_request("/v2/apps", "get")
+            self.assertEqual(b"OK", response.content)
+            self.assertFalse(inflight_mock.do.called)
+
+    def test_make_request_does_not_use_singleflight_for_write_requests(self):
+        marathon_addresses = ["http://127.0.0.1:8080"]
+        with RequestsMock() as rsps, \
+                patch.multiple(hollowman.conf, MARATHON_ADDRESSES=marathon_addresses), \
+                patch.multiple(hollowman.conf, MARATHON_LEADER=marathon_addresses[0]), \
+                patch.object(hollowman.upstream, "_inflight_requests") as inflight_mock:
+            rsps.add("PUT", url=marathon_addresses[0] + "/v2/apps", status=200, body="OK")
+            response = _make_request("/v2/apps", "put", data="[]")
+            self.assertEqual(b"OK", response.content)
+            self.assertFalse(inflight_mock.do.called)
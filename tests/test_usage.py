@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import Mock
+
+from marathon import MarathonApp
+
+from hollowman.marathon.index import NamespaceIndexes
+from hollowman.marathon.usage import NamespaceUsage, NamespacesUsage, app_groups
+
+
+def _app(app_id, instances=2, cpus=0.5, mem=256, version="1", tasks_running=None):
+    return MarathonApp.from_json({
+        "id": app_id, "instances": instances, "cpus": cpus, "mem": mem, "disk": 0,
+        "version": version,
+        "tasksRunning": instances if tasks_running is None else tasks_running,
+        "tasksStaged": 0,
+    })
+
+
+class AppGroupsTest(unittest.TestCase):
+
+    def test_all_parent_groups_of_an_app(self):
+        self.assertEqual(["/"], app_groups("/mysql"))
+        self.assertEqual(["/", "/infra", "/infra/db"], app_groups("/infra/db/mysql"))
+
+
+class NamespaceUsageTest(unittest.TestCase):
+
+    def test_totals_per_namespace_and_group(self):
+        usage = NamespaceUsage("dev")
+        usage.update([_app("/dev/infra/mysql"), _app("/dev/site", instances=1, cpus=1, mem=512)], [])
+        totals = usage.totals()
+        self.assertEqual("dev", totals["namespace"])
+        self.assertEqual({"apps": 2, "instances": 3, "cpus": 2.0, "mem": 1024, "disk": 0,
+                          "tasks_running": 3, "tasks_staged": 0}, totals["total"])
+        self.assertEqual({"apps": 1, "instances": 2, "cpus": 1.0, "mem": 512, "disk": 0,
+                          "tasks_running": 2, "tasks_staged": 0}, totals["groups"]["/infra"])
+
+    def test_changed_and_removed_apps_are_applied_incrementally(self):
+        usage = NamespaceUsage("dev")
+        usage.update([_app("/dev/infra/mysql"), _app("/dev/site")], [])
+        usage.update([_app("/dev/site", instances=4, version="2")], ["/dev/infra/mysql"])
+        totals = usage.totals()
+        self.assertEqual(1, totals["total"]["apps"])
+        self.assertEqual(4, totals["total"]["instances"])
+        self.assertEqual(2.0, totals["total"]["cpus"])
+        self.assertEqual({}, totals["groups"])
+
+
+class NamespacesUsageTest(unittest.TestCase):
+
+    def test_usage_is_fed_by_index_refreshes(self):
+        marathon_client = Mock()
+        marathon_client.list_apps.return_value = [_app("/dev/foo")]
+        indexes = NamespaceIndexes(ttl=0, marathon_client=marathon_client)
+        usages = NamespacesUsage(indexes)
+
+        self.assertEqual(2, usages.get("dev")["total"]["instances"])
+        marathon_client.list_apps.return_value = [_app("/dev/foo", tasks_running=1)]
+        self.assertEqual(1, usages.get("dev")["total"]["tasks_running"])
+        self.assertEqual(2, usages.get("dev")["total"]["instances"])